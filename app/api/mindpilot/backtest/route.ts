@@ -0,0 +1,55 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { callPythonWorker } from '@/lib/pythonWorker';
+
+/**
+ * 调用Python常驻进程对价格面板进行回测
+ * 输入为对齐后的价格面板 prices (T x N)，提供sweep时进行参数扫描
+ */
+async function runBacktest(params: any): Promise<any> {
+  console.log('🔍 调用Python常驻进程回测: baostock_data.py');
+
+  const result = await callPythonWorker('baostock_data.py', 'backtest', params, 120000);
+
+  if (!result || !result.success) {
+    console.error('❌ 回测失败:', result);
+    throw new Error(result?.error || '回测失败');
+  }
+
+  console.log('✅ 回测成功');
+  return result;
+}
+
+export async function POST(request: NextRequest) {
+  try {
+    const params = await request.json();
+
+    if (!Array.isArray(params?.prices) || params.prices.length < 2) {
+      return NextResponse.json(
+        { error: '缺少价格面板' },
+        { status: 400 }
+      );
+    }
+
+    try {
+      const result = await runBacktest(params);
+      return NextResponse.json(result);
+    } catch (error) {
+      console.error('❌ 回测失败:', error);
+
+      return NextResponse.json(
+        {
+          error: '回测失败',
+          details: error instanceof Error ? error.message : '未知错误'
+        },
+        { status: 500 }
+      );
+    }
+
+  } catch (error) {
+    console.error('❌ 回测API错误:', error);
+    return NextResponse.json(
+      { error: '服务器内部错误' },
+      { status: 500 }
+    );
+  }
+}
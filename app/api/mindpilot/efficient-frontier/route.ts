@@ -0,0 +1,59 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { callPythonWorker } from '@/lib/pythonWorker';
+
+/**
+ * 调用Python常驻进程求解有效前沿
+ * 输入为astock-data返回的portfolioData（expectedReturns / covarianceMatrix）
+ */
+async function getEfficientFrontier(params: any): Promise<any> {
+  console.log('🔍 调用Python常驻进程求解有效前沿: baostock_data.py');
+
+  const result = await callPythonWorker('baostock_data.py', 'efficient_frontier', params, 30000);
+
+  if (!result || !result.success) {
+    console.error('❌ 有效前沿求解失败:', result);
+    throw new Error(result?.error || '有效前沿求解失败');
+  }
+
+  console.log('✅ 有效前沿求解成功，方法:', result.method);
+  return result;
+}
+
+export async function POST(request: NextRequest) {
+  try {
+    const { portfolioData, riskFreeRate, points, longOnly, bounds } = await request.json();
+
+    if (
+      !portfolioData ||
+      !Array.isArray(portfolioData.expectedReturns) ||
+      !Array.isArray(portfolioData.covarianceMatrix)
+    ) {
+      return NextResponse.json(
+        { error: '缺少期望收益率或协方差矩阵' },
+        { status: 400 }
+      );
+    }
+
+    try {
+      const result = await getEfficientFrontier({ portfolioData, riskFreeRate, points, longOnly, bounds });
+      return NextResponse.json(result);
+    } catch (error) {
+      console.error('❌ 有效前沿求解失败:', error);
+
+      return NextResponse.json(
+        {
+          error: '有效前沿求解失败',
+          details: error instanceof Error ? error.message : '未知错误'
+        },
+        { status: 500 }
+      );
+    }
+
+  } catch (error) {
+    console.error('❌ 有效前沿API错误:', error);
+    return NextResponse.json(
+      { error: '服务器内部错误' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,86 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { callPythonWorker } from '@/lib/pythonWorker';
+
+/**
+ * 调用Python常驻进程求解带约束的均值-方差优化
+ * 输入为astock-data返回的portfolioData（expectedReturns / covarianceMatrix），
+ * 约束包括权重上下限、行业上下限、换手率、目标收益率或目标波动率；
+ * 常驻进程按资产列表和优化目标缓存上一次的最优权重用于热启动
+ */
+async function optimizePortfolio(params: any): Promise<any> {
+  console.log('🔍 调用Python常驻进程求解组合优化: baostock_data.py');
+
+  const result = await callPythonWorker('baostock_data.py', 'optimize_portfolio', params, 60000);
+
+  if (!result || !result.success) {
+    console.error('❌ 组合优化求解失败:', result);
+    throw new Error(result?.error || '组合优化求解失败');
+  }
+
+  console.log('✅ 组合优化求解成功');
+  return result;
+}
+
+export async function POST(request: NextRequest) {
+  try {
+    const {
+      portfolioData,
+      objective,
+      bounds,
+      sectors,
+      sectorCaps,
+      sectorFloors,
+      currentWeights,
+      maxTurnover,
+      targetReturn,
+      targetVolatility,
+      riskAversion,
+      riskFreeRate,
+      initialWeights
+    } = await request.json();
+
+    if (!portfolioData || !Array.isArray(portfolioData.expectedReturns) ||
+        !Array.isArray(portfolioData.covarianceMatrix)) {
+      return NextResponse.json(
+        { error: '缺少期望收益率或协方差矩阵' },
+        { status: 400 }
+      );
+    }
+
+    try {
+      const result = await optimizePortfolio({
+        portfolioData,
+        objective,
+        bounds,
+        sectors,
+        sectorCaps,
+        sectorFloors,
+        currentWeights,
+        maxTurnover,
+        targetReturn,
+        targetVolatility,
+        riskAversion,
+        riskFreeRate,
+        initialWeights
+      });
+      return NextResponse.json(result);
+    } catch (error) {
+      console.error('❌ 组合优化求解失败:', error);
+
+      return NextResponse.json(
+        {
+          error: '组合优化求解失败',
+          details: error instanceof Error ? error.message : '未知错误'
+        },
+        { status: 500 }
+      );
+    }
+
+  } catch (error) {
+    console.error('❌ 组合优化API错误:', error);
+    return NextResponse.json(
+      { error: '服务器内部错误' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,61 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { callPythonWorker } from '@/lib/pythonWorker';
+
+/**
+ * 调用Python常驻进程生成随机组合点云（可行集散点）
+ * 输入为astock-data返回的portfolioData（expectedReturns / covarianceMatrix）
+ */
+async function getPortfolioSamples(params: any): Promise<any> {
+  console.log('🔍 调用Python常驻进程生成随机组合: baostock_data.py');
+
+  const result = await callPythonWorker('baostock_data.py', 'sample_portfolios', params, 60000);
+
+  if (!result || !result.success) {
+    console.error('❌ 随机组合生成失败:', result);
+    throw new Error(result?.error || '随机组合生成失败');
+  }
+
+  console.log('✅ 随机组合生成成功，组合数:', result.samples);
+  return result;
+}
+
+export async function POST(request: NextRequest) {
+  try {
+    const { portfolioData, samples, method, alpha, bounds, seed, riskFreeRate } = await request.json();
+
+    if (
+      !portfolioData ||
+      !Array.isArray(portfolioData.expectedReturns) ||
+      !Array.isArray(portfolioData.covarianceMatrix)
+    ) {
+      return NextResponse.json(
+        { error: '缺少期望收益率或协方差矩阵' },
+        { status: 400 }
+      );
+    }
+
+    try {
+      const result = await getPortfolioSamples({
+        portfolioData, samples, method, alpha, bounds, seed, riskFreeRate
+      });
+      return NextResponse.json(result);
+    } catch (error) {
+      console.error('❌ 随机组合生成失败:', error);
+
+      return NextResponse.json(
+        {
+          error: '随机组合生成失败',
+          details: error instanceof Error ? error.message : '未知错误'
+        },
+        { status: 500 }
+      );
+    }
+
+  } catch (error) {
+    console.error('❌ 随机组合API错误:', error);
+    return NextResponse.json(
+      { error: '服务器内部错误' },
+      { status: 500 }
+    );
+  }
+}
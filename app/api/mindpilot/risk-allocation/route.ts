@@ -0,0 +1,55 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { callPythonWorker } from '@/lib/pythonWorker';
+
+/**
+ * 调用Python常驻进程计算风险平价和HRP权重
+ * 输入为astock-data返回的portfolioData（covarianceMatrix / correlationMatrix）
+ */
+async function getRiskAllocation(params: any): Promise<any> {
+  console.log('🔍 调用Python常驻进程计算风险预算配置: baostock_data.py');
+
+  const result = await callPythonWorker('baostock_data.py', 'risk_allocation', params, 60000);
+
+  if (!result || !result.success) {
+    console.error('❌ 风险预算配置计算失败:', result);
+    throw new Error(result?.error || '风险预算配置计算失败');
+  }
+
+  console.log('✅ 风险预算配置计算成功');
+  return result;
+}
+
+export async function POST(request: NextRequest) {
+  try {
+    const { portfolioData, allocators, budgets } = await request.json();
+
+    if (!portfolioData || !Array.isArray(portfolioData.covarianceMatrix)) {
+      return NextResponse.json(
+        { error: '缺少协方差矩阵' },
+        { status: 400 }
+      );
+    }
+
+    try {
+      const result = await getRiskAllocation({ portfolioData, allocators, budgets });
+      return NextResponse.json(result);
+    } catch (error) {
+      console.error('❌ 风险预算配置计算失败:', error);
+
+      return NextResponse.json(
+        {
+          error: '风险预算配置计算失败',
+          details: error instanceof Error ? error.message : '未知错误'
+        },
+        { status: 500 }
+      );
+    }
+
+  } catch (error) {
+    console.error('❌ 风险预算配置API错误:', error);
+    return NextResponse.json(
+      { error: '服务器内部错误' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,55 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { callPythonWorker } from '@/lib/pythonWorker';
+
+/**
+ * 调用Python常驻进程计算组合风险指标
+ * 输入为对齐后的价格面板 prices (T x N) 和组合权重，输出VaR/CVaR和风险贡献
+ */
+async function runRiskAnalytics(params: any): Promise<any> {
+  console.log('🔍 调用Python常驻进程风险分析: baostock_data.py');
+
+  const result = await callPythonWorker('baostock_data.py', 'risk_analytics', params, 120000);
+
+  if (!result || !result.success) {
+    console.error('❌ 风险分析失败:', result);
+    throw new Error(result?.error || '风险分析失败');
+  }
+
+  console.log('✅ 风险分析成功');
+  return result;
+}
+
+export async function POST(request: NextRequest) {
+  try {
+    const params = await request.json();
+
+    if (!Array.isArray(params?.prices) || params.prices.length < 2) {
+      return NextResponse.json(
+        { error: '缺少价格面板' },
+        { status: 400 }
+      );
+    }
+
+    try {
+      const result = await runRiskAnalytics(params);
+      return NextResponse.json(result);
+    } catch (error) {
+      console.error('❌ 风险分析失败:', error);
+
+      return NextResponse.json(
+        {
+          error: '风险分析失败',
+          details: error instanceof Error ? error.message : '未知错误'
+        },
+        { status: 500 }
+      );
+    }
+
+  } catch (error) {
+    console.error('❌ 风险分析API错误:', error);
+    return NextResponse.json(
+      { error: '服务器内部错误' },
+      { status: 500 }
+    );
+  }
+}
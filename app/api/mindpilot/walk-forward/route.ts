@@ -0,0 +1,55 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { callPythonWorker } from '@/lib/pythonWorker';
+
+/**
+ * 调用Python常驻进程进行滚动前推优化并回测
+ * 输入为对齐后的价格面板 prices (T x N)，每个调仓日增量更新估计并热启动优化
+ */
+async function runWalkForward(params: any): Promise<any> {
+  console.log('🔍 调用Python常驻进程滚动前推优化: baostock_data.py');
+
+  const result = await callPythonWorker('baostock_data.py', 'walk_forward', params, 120000);
+
+  if (!result || !result.success) {
+    console.error('❌ 滚动前推优化失败:', result);
+    throw new Error(result?.error || '滚动前推优化失败');
+  }
+
+  console.log('✅ 滚动前推优化成功');
+  return result;
+}
+
+export async function POST(request: NextRequest) {
+  try {
+    const params = await request.json();
+
+    if (!Array.isArray(params?.prices) || params.prices.length < 2) {
+      return NextResponse.json(
+        { error: '缺少价格面板' },
+        { status: 400 }
+      );
+    }
+
+    try {
+      const result = await runWalkForward(params);
+      return NextResponse.json(result);
+    } catch (error) {
+      console.error('❌ 滚动前推优化失败:', error);
+
+      return NextResponse.json(
+        {
+          error: '滚动前推优化失败',
+          details: error instanceof Error ? error.message : '未知错误'
+        },
+        { status: 500 }
+      );
+    }
+
+  } catch (error) {
+    console.error('❌ 滚动前推API错误:', error);
+    return NextResponse.json(
+      { error: '服务器内部错误' },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,140 @@
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import path from 'path';
+import readline from 'readline';
+
+export type PythonWorkerEventHandler = (event: string, data: any) => void;
+
+interface PendingRequest {
+  resolve: (value: any) => void;
+  reject: (reason: Error) => void;
+  timer: NodeJS.Timeout;
+  onEvent?: PythonWorkerEventHandler;
+}
+
+/**
+ * 常驻Python工作进程（python-api/*.py --worker）
+ * 使用JSON行协议：每行一个请求 {id, method, params}，每行一个响应 {id, result}；
+ * 最终响应之前可能有若干事件帧 {id, event, data}（如流式输出的单个资产数据）
+ */
+class PythonWorker {
+  private process: ChildProcessWithoutNullStreams;
+  private pending = new Map<number, PendingRequest>();
+  private nextId = 1;
+  private exited = false;
+
+  constructor(private scriptName: string, onExit: () => void) {
+    const scriptPath = path.join(process.cwd(), 'python-api', scriptName);
+    console.log('🚀 启动Python常驻进程:', scriptPath);
+
+    this.process = spawn('python3', [scriptPath, '--worker'], {
+      cwd: process.cwd(),
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+
+    readline.createInterface({ input: this.process.stdout }).on('line', (line) => {
+      this.handleLine(line);
+    });
+
+    this.process.stderr.on('data', (data) => {
+      console.log(`[${this.scriptName}]`, data.toString().trimEnd());
+    });
+
+    this.process.on('error', (error) => {
+      console.error('❌ 启动Python进程失败:', error);
+      this.shutdown(new Error(`启动Python进程失败: ${error.message}`));
+      onExit();
+    });
+
+    this.process.on('close', (code) => {
+      console.log(`⚠️ Python常驻进程退出 (${this.scriptName})，退出代码:`, code);
+      this.shutdown(new Error(`Python常驻进程退出，退出代码: ${code}`));
+      onExit();
+    });
+  }
+
+  private handleLine(line: string) {
+    const trimmed = line.trim();
+    if (!trimmed.startsWith('{')) {
+      return;
+    }
+
+    let frame: any;
+    try {
+      frame = JSON.parse(trimmed);
+    } catch (error) {
+      console.error('❌ 解析Python输出失败:', error);
+      return;
+    }
+
+    const request = this.pending.get(frame.id);
+    if (!request) {
+      return;
+    }
+
+    if (frame.event !== undefined) {
+      request.onEvent?.(frame.event, frame.data);
+      return;
+    }
+
+    this.pending.delete(frame.id);
+    clearTimeout(request.timer);
+    request.resolve(frame.result);
+  }
+
+  private shutdown(error: Error) {
+    this.exited = true;
+    this.pending.forEach((request) => {
+      clearTimeout(request.timer);
+      request.reject(error);
+    });
+    this.pending.clear();
+  }
+
+  get alive(): boolean {
+    return !this.exited;
+  }
+
+  call(method: string, params: any, timeoutMs: number, onEvent?: PythonWorkerEventHandler): Promise<any> {
+    return new Promise((resolve, reject) => {
+      if (this.exited) {
+        reject(new Error('Python常驻进程已退出'));
+        return;
+      }
+
+      const id = this.nextId++;
+      const timer = setTimeout(() => {
+        this.pending.delete(id);
+        reject(new Error(`Python请求超时: ${method}`));
+      }, timeoutMs);
+
+      this.pending.set(id, { resolve, reject, timer, onEvent });
+      this.process.stdin.write(JSON.stringify({ id, method, params }) + '\n');
+    });
+  }
+}
+
+const workers = new Map<string, PythonWorker>();
+
+/**
+ * 调用常驻Python进程中的方法，进程不存在或已退出时自动重新启动
+ * onEvent用于接收最终结果之前的事件帧（例如params.stream为true时逐个返回的资产数据）
+ */
+export function callPythonWorker(
+  scriptName: string,
+  method: string,
+  params: any,
+  timeoutMs: number = 120000,
+  onEvent?: PythonWorkerEventHandler
+): Promise<any> {
+  let worker = workers.get(scriptName);
+  if (!worker || !worker.alive) {
+    const created: PythonWorker = new PythonWorker(scriptName, () => {
+      if (workers.get(scriptName) === created) {
+        workers.delete(scriptName);
+      }
+    });
+    worker = created;
+    workers.set(scriptName, worker);
+  }
+  return worker.call(method, params, timeoutMs, onEvent);
+}
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多资产日期对齐 - 在统一的整数交易日历上合并各资产价格
+
+日期用距1970-01-01的天数（int64）表示，通过有序数组的searchsorted定位，
+输出一个连续的float64价格面板 (T x N)，供后续收益率、统计量等各阶段复用。
+"""
+import numpy as np
+import pandas as pd
+
+ALIGN_POLICIES = ('inner', 'ffill', 'drop')
+
+
+def to_day_ordinals(dates):
+    """将日期序列转换为距1970-01-01的天数（int64）"""
+    return np.asarray(pd.to_datetime(dates).values.astype('datetime64[D]').astype(np.int64))
+
+
+def day_ordinals_to_strings(ordinals):
+    """将天数数组转换为 YYYY-MM-DD 字符串列表"""
+    return np.asarray(ordinals, dtype='datetime64[D]').astype(str).tolist()
+
+
+class AlignedPanel:
+    """对齐后的价格面板"""
+
+    def __init__(self, assets, dates, prices, dropped=None):
+        self.assets = list(assets)
+        self.dates = dates
+        self.prices = np.ascontiguousarray(prices, dtype=np.float64)
+        self.dropped = list(dropped or [])
+
+    def __len__(self):
+        return len(self.dates)
+
+    def date_strings(self):
+        return day_ordinals_to_strings(self.dates)
+
+    def column(self, asset):
+        return self.prices[:, self.assets.index(asset)]
+
+
+def _forward_fill(panel):
+    """沿时间轴向前填充NaN"""
+    mask = np.isnan(panel)
+    idx = np.where(~mask, np.arange(panel.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    filled = panel[idx, np.arange(panel.shape[1])]
+    return filled
+
+
+def align_prices(assets, dates_list, values_list, policy='inner', min_coverage=0.9):
+    """
+    将多个资产的价格序列对齐到共同交易日历
+
+    Args:
+        assets: 资产名称列表
+        dates_list: 每个资产的日期天数数组（int64，可无序、不可重复）
+        values_list: 每个资产对应的价格数组
+        policy: 对齐方式
+            'inner' - 只保留所有资产都有数据的交易日
+            'ffill' - 使用所有交易日的并集，缺失值向前填充，丢弃开头仍有缺失的交易日
+            'drop'  - 先剔除覆盖率低于min_coverage的资产，再对剩余资产做inner对齐
+        min_coverage: 'drop'方式下资产需要覆盖的交易日比例
+
+    Returns:
+        AlignedPanel: 对齐后的价格面板
+    """
+    if policy not in ALIGN_POLICIES:
+        raise ValueError(f'不支持的对齐方式: {policy}')
+
+    assets = list(assets)
+    n_assets = len(assets)
+    if n_assets == 0:
+        return AlignedPanel([], np.empty(0, dtype=np.int64), np.empty((0, 0)))
+
+    dates_list = [np.asarray(d, dtype=np.int64) for d in dates_list]
+    calendar = np.unique(np.concatenate(dates_list))
+
+    panel = np.full((len(calendar), n_assets), np.nan)
+    for j, (dates, values) in enumerate(zip(dates_list, values_list)):
+        panel[np.searchsorted(calendar, dates), j] = np.asarray(values, dtype=np.float64)
+
+    dropped = []
+    if policy == 'drop' and len(calendar) > 0:
+        coverage = np.array([len(d) for d in dates_list]) / len(calendar)
+        keep = coverage >= min_coverage
+        dropped = [a for a, k in zip(assets, keep) if not k]
+        assets = [a for a, k in zip(assets, keep) if k]
+        panel = panel[:, keep]
+
+    if policy == 'ffill':
+        panel = _forward_fill(panel)
+
+    rows = ~np.isnan(panel).any(axis=1)
+    return AlignedPanel(assets, calendar[rows], panel[rows], dropped)
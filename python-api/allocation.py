@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+风险预算配置 - 风险平价（等风险贡献）和分层风险平价（HRP）
+
+风险平价：求 w 使各资产的风险贡献 w_i (Σw)_i 与风险预算 b_i 成比例。
+等价于凸问题 min 1/2 y'Σy - Σ b_i log(y_i)，y > 0，最优解归一化即为权重：
+    newton    - 牛顿法（Hessian为 Σ + diag(b / y^2)，带回溯线搜索），几次迭代即收敛
+    newton_cg - 牛顿方向由预条件共轭梯度法非精确求解，只需矩阵向量乘法，每步 O(N^2)，
+                不分解矩阵，适合资产数很多的情况
+HRP：由相关系数得到距离 d = sqrt((1 - ρ) / 2)，Prim算法求最小生成树得到单链接聚类的
+叶子顺序（准对角化），再按该顺序递归二分，两半之间按簇方差的倒数分配权重。
+全程 O(N^2)，不需要矩阵求逆。
+"""
+import numpy as np
+
+from optimizer import ConvergenceError
+
+RISK_PARITY_METHODS = ('newton', 'newton_cg')
+# 资产数超过该值时默认使用共轭梯度求牛顿方向
+NEWTON_MAX_ASSETS = 1000
+DEFAULT_TOLERANCE = 1e-10
+DEFAULT_MAX_ITER = 100
+
+
+def risk_contributions(weights, covariance_matrix):
+    """各资产的风险贡献占比 w_i (Σw)_i / w'Σw"""
+    weights = np.asarray(weights, dtype=np.float64)
+    contributions = weights * (np.asarray(covariance_matrix, dtype=np.float64) @ weights)
+    total = contributions.sum()
+    return contributions / total if total > 0 else np.zeros_like(weights)
+
+
+def _conjugate_gradient(cov, extra, rhs, tol, max_iter):
+    """
+    预条件共轭梯度法求解 (Σ + diag(extra)) x = rhs，只用矩阵向量乘法，每步 O(N^2)
+
+    以 diag(Σ) + extra 为Jacobi预条件子
+    """
+    preconditioner = 1.0 / (np.diag(cov) + extra)
+    x = np.zeros_like(rhs)
+    residual = rhs.copy()
+    z = preconditioner * residual
+    direction = z.copy()
+    rz = residual @ z
+    target = tol * np.linalg.norm(rhs)
+    for _ in range(max_iter):
+        product = cov @ direction + extra * direction
+        alpha = rz / (direction @ product)
+        x += alpha * direction
+        residual -= alpha * product
+        if np.linalg.norm(residual) <= target:
+            break
+        z = preconditioner * residual
+        rz_next = residual @ z
+        direction = z + (rz_next / rz) * direction
+        rz = rz_next
+    return x
+
+
+def _newton(cov, budgets, y, tol, max_iter, matrix_free=False):
+    def objective(x):
+        return 0.5 * x @ cov @ x - budgets @ np.log(x)
+
+    value = objective(y)
+    for iteration in range(1, max_iter + 1):
+        cov_y = cov @ y
+        gradient = cov_y - budgets / y
+        if np.abs(gradient * y).max() <= tol * budgets.sum():
+            return y, iteration
+        # Hessian为 Σ + diag(b / y^2)
+        extra = budgets / y ** 2
+        if matrix_free:
+            # 非精确牛顿：远离最优解时线性方程组只需粗略求解
+            forcing = min(0.5, np.sqrt(np.linalg.norm(gradient)))
+            step = _conjugate_gradient(cov, extra, -gradient, forcing, len(y))
+        else:
+            step = np.linalg.solve(cov + np.diag(extra), -gradient)
+        # 回溯线搜索，保持 y > 0 且目标函数下降
+        alpha = 1.0
+        negative = step < 0
+        if np.any(negative):
+            alpha = min(1.0, 0.99 * np.min(-y[negative] / step[negative]))
+        decrease = gradient @ step
+        while True:
+            candidate = y + alpha * step
+            candidate_value = objective(candidate)
+            # 接近最优解时目标函数的下降量低于舍入误差，按相对误差放宽
+            if (candidate_value <= value + 1e-4 * alpha * decrease + 1e-14 * abs(value)
+                    or alpha < 1e-12):
+                break
+            alpha *= 0.5
+        y, value = candidate, candidate_value
+    raise ConvergenceError(y / y.sum(), max_iter)
+
+
+def risk_parity_weights(covariance_matrix, budgets=None, method=None, tol=DEFAULT_TOLERANCE,
+                        max_iter=DEFAULT_MAX_ITER):
+    """
+    风险平价（风险预算）权重
+
+    Args:
+        covariance_matrix: 协方差矩阵 (N x N)
+        budgets: 风险预算 (N)，默认等风险贡献；内部归一化
+        method: 'newton' 或 'newton_cg'，默认资产数不超过 NEWTON_MAX_ASSETS 时用 'newton'
+        tol: 收敛容忍度（风险贡献与预算之差相对于预算总和）
+        max_iter: 牛顿法最大迭代次数
+
+    Returns:
+        tuple: (权重 (N)，只做多且和为1, 迭代次数)
+
+    Raises:
+        ValueError: 输入不合法；max_iter次迭代内没有收敛时为其子类 ConvergenceError，
+            weights为最后一次迭代归一化后的权重
+    """
+    cov = np.asarray(covariance_matrix, dtype=np.float64)
+    n_assets = cov.shape[0]
+    if n_assets == 0 or cov.shape != (n_assets, n_assets):
+        raise ValueError('协方差矩阵必须是方阵')
+    diagonal = np.diag(cov)
+    if np.any(diagonal <= 0):
+        raise ValueError('协方差矩阵对角线必须为正')
+    if budgets is None:
+        budgets = np.full(n_assets, 1.0 / n_assets)
+    budgets = np.asarray(budgets, dtype=np.float64)
+    if budgets.shape != (n_assets,) or np.any(budgets <= 0):
+        raise ValueError('风险预算必须为每个资产一个正数')
+    budgets = budgets / budgets.sum()
+    if method is None:
+        method = 'newton' if n_assets <= NEWTON_MAX_ASSETS else 'newton_cg'
+    if method not in RISK_PARITY_METHODS:
+        raise ValueError(f'不支持的风险平价求解方法: {method}')
+
+    # 初始点取波动率倒数，缩放到 y'Σy = 预算总和（最优解满足的等式）
+    y = 1.0 / np.sqrt(diagonal)
+    y *= np.sqrt(1.0 / (y @ cov @ y))
+    y, iterations = _newton(cov, budgets, y, tol, max_iter, matrix_free=method == 'newton_cg')
+    return y / y.sum(), iterations
+
+
+def _leaf_order(distance):
+    """
+    单链接聚类的叶子顺序
+
+    Prim算法求最小生成树（O(N^2)），按边长从小到大合并簇（即单链接聚类的合并顺序），
+    每次合并把两个簇的叶子序列首尾相接
+    """
+    n_assets = len(distance)
+    in_tree = np.zeros(n_assets, dtype=bool)
+    in_tree[0] = True
+    best = distance[0].copy()
+    parent = np.zeros(n_assets, dtype=np.int64)
+    edges = []
+    for _ in range(n_assets - 1):
+        candidates = np.where(in_tree, np.inf, best)
+        j = int(np.argmin(candidates))
+        edges.append((candidates[j], int(parent[j]), j))
+        in_tree[j] = True
+        closer = distance[j] < best
+        best = np.where(closer, distance[j], best)
+        parent = np.where(closer, j, parent)
+
+    root = list(range(n_assets))
+    members = {i: [i] for i in range(n_assets)}
+
+    def find(i):
+        while root[i] != i:
+            root[i] = root[root[i]]
+            i = root[i]
+        return i
+
+    for _, a, b in sorted(edges):
+        ra, rb = find(a), find(b)
+        # 较小的簇接到较大的簇后面
+        if len(members[ra]) < len(members[rb]):
+            ra, rb = rb, ra
+        members[ra].extend(members.pop(rb))
+        root[rb] = ra
+    return members[find(0)]
+
+
+def _cluster_variance(cov, diagonal, items):
+    """簇内按方差倒数加权时的簇方差"""
+    inverse = 1.0 / diagonal[items]
+    inverse /= inverse.sum()
+    return inverse @ cov[np.ix_(items, items)] @ inverse
+
+
+def hrp_weights(covariance_matrix, correlation_matrix=None):
+    """
+    分层风险平价权重
+
+    Args:
+        covariance_matrix: 协方差矩阵 (N x N)
+        correlation_matrix: 相关系数矩阵 (N x N)，默认由协方差矩阵计算
+
+    Returns:
+        tuple: (权重 (N)，只做多且和为1, 准对角化后的资产顺序)
+    """
+    cov = np.asarray(covariance_matrix, dtype=np.float64)
+    n_assets = cov.shape[0]
+    if n_assets == 0 or cov.shape != (n_assets, n_assets):
+        raise ValueError('协方差矩阵必须是方阵')
+    diagonal = np.diag(cov)
+    if np.any(diagonal <= 0):
+        raise ValueError('协方差矩阵对角线必须为正')
+    if correlation_matrix is None:
+        std = np.sqrt(diagonal)
+        correlation = cov / np.outer(std, std)
+    else:
+        correlation = np.asarray(correlation_matrix, dtype=np.float64)
+        if correlation.shape != cov.shape:
+            raise ValueError('相关系数矩阵与协方差矩阵维度不一致')
+
+    distance = np.sqrt(np.clip((1.0 - correlation) / 2.0, 0.0, 1.0))
+    order = _leaf_order(distance)
+
+    weights = np.ones(n_assets)
+    clusters = [order]
+    while clusters:
+        split = []
+        for items in clusters:
+            if len(items) < 2:
+                continue
+            half = len(items) // 2
+            left, right = items[:half], items[half:]
+            left_var = _cluster_variance(cov, diagonal, left)
+            right_var = _cluster_variance(cov, diagonal, right)
+            alpha = 1.0 - left_var / (left_var + right_var)
+            weights[left] *= alpha
+            weights[right] *= 1.0 - alpha
+            split.extend([left, right])
+        clusters = split
+    return weights, order
+
+
+def allocate(covariance_matrix, correlation_matrix=None, allocators=('risk_parity', 'hrp'),
+             budgets=None):
+    """
+    按多种风险预算方式计算权重
+
+    Args:
+        covariance_matrix: 协方差矩阵 (N x N)
+        correlation_matrix: 相关系数矩阵，HRP使用
+        allocators: 'risk_parity' 和/或 'hrp'
+        budgets: 风险平价的风险预算，默认等风险贡献
+
+    Returns:
+        dict: {'riskParity': {...}, 'hrp': {...}}，各含 weights 和 riskContributions
+
+    Raises:
+        ValueError: 输入不合法或风险平价没有收敛（ConvergenceError）
+    """
+    cov = np.asarray(covariance_matrix, dtype=np.float64)
+    result = {}
+    for allocator in allocators:
+        if allocator == 'risk_parity':
+            weights, iterations = risk_parity_weights(cov, budgets)
+            result['riskParity'] = {
+                'weights': weights,
+                'riskContributions': risk_contributions(weights, cov),
+                'iterations': iterations
+            }
+        elif allocator == 'hrp':
+            weights, order = hrp_weights(cov, correlation_matrix)
+            result['hrp'] = {
+                'weights': weights,
+                'riskContributions': risk_contributions(weights, cov),
+                'order': order
+            }
+        else:
+            raise ValueError(f'不支持的配置方式: {allocator}')
+    return result
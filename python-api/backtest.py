@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+组合回测 - 基于对齐后的价格面板 (T x N) 的向量化回测
+
+调仓日把组合权重设为目标权重，两次调仓之间持仓随价格漂移：
+    第k段内 t 时刻的净值 = 段初净值 x sum_i(w_i x P_i(t) / P_i(段初)) + 现金部分
+各段的相对增长一次性按段初价格索引计算，不逐日循环；各段段初净值为前几段
+期末增长的累乘。调仓时的换手率为目标权重与漂移后权重之差的绝对值之和，
+交易成本按换手率 x 费率从净值中扣除。
+
+权重方案：
+    static       - 固定目标权重（默认等权），rebalance_every为None时买入后持有
+    inverse_vol  - 按回看窗口波动率倒数分配
+    min_variance - 回看窗口估计的最小方差组合（临界线法，仅多头）
+    max_sharpe   - 回看窗口估计的切点组合，不存在时退化为最小方差组合
+任一方案都可叠加目标波动率（target_vol）：按回看窗口的组合波动率缩放风险资产仓位，
+剩余部分为现金，按无风险利率计息。
+
+参数扫描（调仓周期 x 回看窗口）在多个进程中并行执行。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from metrics import panel_metrics, TRADING_DAYS, RISK_FREE_RATE
+from portfolio_stats import compute_return_statistics
+from frontier import efficient_frontier
+
+WEIGHT_METHODS = ('static', 'inverse_vol', 'min_variance', 'max_sharpe')
+DEFAULT_LOOKBACK = 60
+# 目标波动率缩放后风险资产总仓位的上限
+DEFAULT_MAX_LEVERAGE = 1.0
+
+
+def rebalance_points(n_periods, start=0, every=None):
+    """调仓日下标：start开始每隔every期一次，every为None时只在start调仓"""
+    if every is None:
+        return np.array([start])
+    every = int(every)
+    if every <= 0:
+        raise ValueError('调仓周期必须为正整数')
+    return np.arange(start, n_periods - 1, every)
+
+
+def _target_weights(method, window_returns, static_weights, risk_free_rate, shrinkage):
+    """根据回看窗口的收益率计算一次目标权重"""
+    if method == 'static':
+        return static_weights
+    n_assets = window_returns.shape[1]
+    if method == 'inverse_vol':
+        vol = np.nanstd(window_returns, axis=0, ddof=1)
+        inverse = np.where(vol > 0, 1.0 / vol, 0.0)
+        if inverse.sum() <= 0:
+            return np.full(n_assets, 1.0 / n_assets)
+        return inverse / inverse.sum()
+
+    stats = compute_return_statistics(window_returns, shrinkage)
+    frontier = efficient_frontier(stats['expectedReturns'], stats['covarianceMatrix'],
+                                  risk_free_rate, n_points=2)
+    point = frontier['tangency'] if method == 'max_sharpe' else None
+    if point is None:
+        point = frontier['minVariance']
+    return np.asarray(point['weights'], dtype=np.float64)
+
+
+def build_schedule(prices, method='static', weights=None, rebalance_every=None,
+                   lookback=DEFAULT_LOOKBACK, target_vol=None, max_leverage=DEFAULT_MAX_LEVERAGE,
+                   risk_free_rate=RISK_FREE_RATE, shrinkage=None, periods_per_year=TRADING_DAYS):
+    """
+    生成调仓计划
+
+    Args:
+        prices: 价格面板 (T x N)
+        method: 权重方案，见 WEIGHT_METHODS
+        weights: static方案的目标权重，默认等权
+        rebalance_every: 调仓周期（期数），None表示只在起点调仓
+        lookback: 回看窗口（期数），static方案且不设目标波动率时不需要
+        target_vol: 年化目标波动率，None表示不缩放
+        max_leverage: 目标波动率缩放后风险资产总仓位的上限
+        risk_free_rate: max_sharpe方案使用的无风险利率
+        shrinkage: 协方差收缩方式，同 compute_return_statistics
+
+    Returns:
+        tuple: (调仓日下标 (K), 目标权重 (K x N))，权重之和小于1的部分为现金
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    n_periods, n_assets = prices.shape
+    if method not in WEIGHT_METHODS:
+        raise ValueError(f'不支持的权重方案: {method}')
+
+    if weights is None:
+        static_weights = np.full(n_assets, 1.0 / n_assets)
+    else:
+        static_weights = np.asarray(weights, dtype=np.float64)
+        if static_weights.shape != (n_assets,):
+            raise ValueError('目标权重数量与资产数量不一致')
+
+    needs_history = method != 'static' or target_vol is not None
+    start = int(lookback) if needs_history else 0
+    if needs_history and (lookback is None or start < 2):
+        raise ValueError('回看窗口至少为2期')
+    if start >= n_periods - 1:
+        raise ValueError('价格序列长度不足以覆盖回看窗口')
+
+    points = rebalance_points(n_periods, start, rebalance_every)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(prices, axis=0) / prices[:-1]
+
+    schedule = np.empty((len(points), n_assets))
+    for k, t in enumerate(points):
+        # 回看窗口为截至调仓日t的 lookback 期收益率，不使用未来数据
+        window = returns[max(t - start, 0):t] if needs_history else None
+        target = _target_weights(method, window, static_weights, risk_free_rate, shrinkage)
+        if target_vol is not None:
+            portfolio = window @ target
+            realized = np.std(portfolio, ddof=1) * np.sqrt(periods_per_year)
+            scale = min(target_vol / realized, max_leverage) if realized > 0 else max_leverage
+            target = target * scale
+        schedule[k] = target
+    return points, schedule
+
+
+def run_backtest(prices, points, schedule, cost_bps=0.0, risk_free_rate=RISK_FREE_RATE,
+                 periods_per_year=TRADING_DAYS):
+    """
+    按调仓计划计算净值、换手率和交易成本
+
+    Args:
+        prices: 价格面板 (T x N)，不能有缺失值
+        points: 调仓日下标 (K)，升序
+        schedule: 各调仓日的目标权重 (K x N)
+        cost_bps: 单边交易费率（基点），按换手率扣除
+        risk_free_rate: 现金部分的年化利率
+
+    Returns:
+        dict: nav (从第一个调仓日起，初始为1)、turnover (K)、costs (K)、
+            totalTurnover、totalCost
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    points = np.asarray(points, dtype=np.int64)
+    schedule = np.asarray(schedule, dtype=np.float64)
+    if not np.all(np.isfinite(prices)) or np.any(prices <= 0):
+        raise ValueError('价格面板不能包含缺失值或非正价格')
+
+    start = points[0]
+    panel = prices[start:]
+    offsets = points - start
+    n_periods = len(panel)
+
+    # 每期所属的调仓段，及相对于段初价格的增长
+    segment = np.searchsorted(offsets, np.arange(n_periods), side='right') - 1
+    growth = panel / panel[offsets][segment]
+    elapsed = np.arange(n_periods) - offsets[segment]
+    cash_growth = (1 + risk_free_rate / periods_per_year) ** elapsed
+    cash_weight = 1.0 - schedule.sum(axis=1)
+    relative = np.einsum('tn,tn->t', growth, schedule[segment]) + cash_weight[segment] * cash_growth
+
+    # 各段期末（即下一个调仓日调仓前）的增长和漂移权重，用于计算换手率
+    ends = np.r_[offsets[1:], n_periods - 1]
+    end_growth = panel[ends] / panel[offsets]
+    end_cash = (1 + risk_free_rate / periods_per_year) ** (ends - offsets)
+    end_value = np.einsum('kn,kn->k', end_growth, schedule) + cash_weight * end_cash
+    drifted = end_growth * schedule / end_value[:, None]
+    previous = np.vstack([np.zeros(schedule.shape[1]), drifted[:-1]])
+    turnover = np.abs(schedule - previous).sum(axis=1)
+    costs = turnover * cost_bps / 10000.0
+
+    # 段初净值 = 之前各段期末增长的累乘，扣除本段调仓成本
+    segment_start = np.cumprod(np.r_[1.0, end_value[:-1]]) * np.cumprod(1 - costs)
+    nav = segment_start[segment] * relative
+    return {
+        'nav': nav,
+        'turnover': turnover,
+        'costs': costs,
+        'totalTurnover': float(turnover.sum()),
+        'totalCost': float(1 - np.prod(1 - costs))
+    }
+
+
+def backtest(prices, method='static', weights=None, rebalance_every=None,
+             lookback=DEFAULT_LOOKBACK, target_vol=None, max_leverage=DEFAULT_MAX_LEVERAGE,
+             cost_bps=0.0, risk_free_rate=RISK_FREE_RATE, shrinkage=None,
+             periods_per_year=TRADING_DAYS):
+    """
+    回测一个权重方案
+
+    Args:
+        prices: 对齐后的价格面板 (T x N)
+        其余参数同 build_schedule 和 run_backtest
+
+    Returns:
+        dict: nav、returns、turnover、costs、rebalanceIndex（在prices中的下标）、weights (K x N)、
+            totalTurnover、totalCost、startIndex，以及与calculate_metrics相同的metrics
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim != 2 or prices.shape[1] == 0:
+        raise ValueError('价格面板必须是二维数组 (T x N)')
+    points, schedule = build_schedule(
+        prices, method, weights, rebalance_every, lookback, target_vol, max_leverage,
+        risk_free_rate, shrinkage, periods_per_year
+    )
+    result = run_backtest(prices, points, schedule, cost_bps, risk_free_rate, periods_per_year)
+    nav = result['nav']
+    metrics = panel_metrics(nav, periods_per_year, risk_free_rate)
+    result.update({
+        'returns': nav[1:] / nav[:-1] - 1,
+        'rebalanceIndex': points,
+        'weights': schedule,
+        'startIndex': int(points[0]),
+        'metrics': {key: float(values[0]) for key, values in metrics.items()}
+    })
+    return result
+
+
+_SWEEP_PRICES = None
+
+
+def _init_sweep(prices):
+    global _SWEEP_PRICES
+    _SWEEP_PRICES = prices
+
+
+def _sweep_one(args):
+    rebalance_every, lookback, options = args
+    try:
+        result = backtest(_SWEEP_PRICES, rebalance_every=rebalance_every, lookback=lookback, **options)
+        return {
+            'metrics': result['metrics'],
+            'totalTurnover': result['totalTurnover'],
+            'totalCost': result['totalCost']
+        }
+    except ValueError as e:
+        return {'error': str(e)}
+
+
+def sweep(prices, rebalance_values, lookback_values, max_workers=None, **options):
+    """
+    参数扫描：对 调仓周期 x 回看窗口 的每个组合回测一次，多个进程并行
+
+    Args:
+        prices: 对齐后的价格面板 (T x N)
+        rebalance_values: 调仓周期列表
+        lookback_values: 回看窗口列表
+        max_workers: 最大进程数，默认CPU核数；为1时在当前进程顺序执行
+        options: 传给 backtest 的其余参数
+
+    Returns:
+        list: 每个组合一个字典 {rebalanceEvery, lookback, metrics, totalTurnover, totalCost}，
+            参数不可行时为 {rebalanceEvery, lookback, error}
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    grid = [(r, l) for r in rebalance_values for l in lookback_values]
+    tasks = [(r, l, options) for r, l in grid]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        _init_sweep(prices)
+        outcomes = [_sweep_one(task) for task in tasks]
+    else:
+        # 价格面板在每个进程初始化时传递一次，不随每个任务重复序列化
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)),
+                                 initializer=_init_sweep, initargs=(prices,)) as pool:
+            outcomes = list(pool.map(_sweep_one, tasks))
+
+    return [dict(rebalanceEvery=r, lookback=l, **outcome) for (r, l), outcome in zip(grid, outcomes)]
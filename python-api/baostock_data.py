@@ -7,31 +7,37 @@ import sys
 import json
 import numpy as np
 import pandas as pd
-import baostock as bs
-from datetime import datetime, timedelta
 import warnings
-import json
-import os
+import contextlib
+from collections import OrderedDict
+from log_utils import get_logger
+from data_access import (login_baostock, logout_baostock, fetch_bars, default_window,
+                         get_index_data, get_stock_universe, get_universe_index)
+from stock_resolver import StockNameResolver
+from stock_dict import get_stock_dictionary
+from resolution_cache import get_cached, put_cached
+from fetch_pool import iter_bars_parallel
+from metrics import panel_metrics, rolling_metrics, RISK_FREE_RATE
+from frontier import efficient_frontier, DEFAULT_POINTS
+from portfolio_sampler import (iter_portfolio_samples, sample_portfolios, DEFAULT_SAMPLES,
+                               DEFAULT_CHUNK_SIZE)
+from portfolio_stats import compute_return_statistics, simple_returns
+from backtest import backtest, sweep
+from walk_forward import walk_forward, DEFAULT_REBALANCE_EVERY, DEFAULT_WINDOW, DEFAULT_HALFLIFE
+from optimizer import optimize_portfolio, DEFAULT_RISK_AVERSION
+from risk import risk_report, DEFAULT_LEVELS
+from allocation import allocate
+from alignment import align_prices, to_day_ordinals
+from serialization import (build_price_rows, build_price_columns, encode_response,
+                           check_encoding, OUTPUT_FORMATS)
 warnings.filterwarnings('ignore')
 
-def load_stock_mapping():
-    """从字典文件加载股票映射"""
-    try:
-        # 尝试加载最新的股票字典
-        dict_file = os.path.join(os.path.dirname(__file__), 'stock_dict_latest.json')
-        if os.path.exists(dict_file):
-            with open(dict_file, 'r', encoding='utf-8') as f:
-                stock_dict = json.load(f)
-                name_to_code = stock_dict.get('name_to_code', {})
-                print(f"成功从字典文件加载 {len(name_to_code)} 支股票映射")
-                return name_to_code
-        else:
-            print(f"股票字典文件不存在: {dict_file}")
-            # 返回一个基本的映射表作为备选
-            return get_fallback_mapping()
-    except Exception as e:
-        print(f"加载股票字典时出错: {e}")
-        return get_fallback_mapping()
+logger = get_logger('baostock_data')
+
+# 组合优化的热启动缓存：(资产列表, 优化目标) -> 上一次的 (最优权重, 风险厌恶系数)，
+# 超过容量时淘汰最久未使用的条目
+WARM_START_SIZE = 64
+_WARM_STARTS = OrderedDict()
 
 def get_fallback_mapping():
     """备用的基本股票映射表"""
@@ -55,25 +61,30 @@ def get_fallback_mapping():
         '时代万恒': 'sz.002057'
     }
 
-# 加载完整的股票映射字典
-STOCK_MAPPING = load_stock_mapping()
+_STOCK_RESOLVER = None
+_RESOLVER_SOURCE = None
 
-def login_baostock():
-    """登录baostock系统"""
-    try:
-        lg = bs.login()
-        if lg.error_code != '0':
-            return False
-        return True
-    except Exception as e:
-        return False
+# 单次请求最多生成的随机组合数
+MAX_SAMPLES = 1000000
 
-def logout_baostock():
-    """登出baostock系统"""
-    try:
-        bs.logout()
-    except Exception as e:
-        pass
+def get_stock_resolver():
+    """获取基于股票字典构建的名称解析索引（首次使用时构建，字典刷新后重建）"""
+    global _STOCK_RESOLVER, _RESOLVER_SOURCE
+    dictionary = get_stock_dictionary()
+    if _STOCK_RESOLVER is None or dictionary is not _RESOLVER_SOURCE:
+        if dictionary is None:
+            _STOCK_RESOLVER = StockNameResolver(get_fallback_mapping())
+        else:
+            _STOCK_RESOLVER = StockNameResolver(dictionary.name_to_code(), dictionary.clean_names())
+        _RESOLVER_SOURCE = dictionary
+    return _STOCK_RESOLVER
+
+def lookup_stock_code(asset_name):
+    """按名称精确查找股票代码，找不到返回None"""
+    dictionary = get_stock_dictionary()
+    if dictionary is None:
+        return get_fallback_mapping().get(asset_name)
+    return dictionary.code_for(asset_name)
 
 def search_stock_by_name(asset_name):
     """
@@ -87,31 +98,21 @@ def search_stock_by_name(asset_name):
     """
     try:
         # 首先检查是否有精确匹配的映射
-        if asset_name in STOCK_MAPPING:
-            return STOCK_MAPPING[asset_name]
-        
-        # 获取所有A股股票基本信息
-        rs = bs.query_all_stock(day=datetime.now().strftime('%Y-%m-%d'))
-        if rs.error_code != '0':
-            print(f'查询股票列表失败: {rs.error_msg}')
-            return None
+        code = lookup_stock_code(asset_name)
+        if code:
+            return code
         
-        stock_list = []
-        while (rs.error_code == '0') & rs.next():
-            stock_list.append(rs.get_row_data())
-        
-        if not stock_list:
+        # 获取所有A股股票基本信息（按交易日缓存）
+        df = get_stock_universe()
+        if df is None or df.empty:
             return None
         
-        # 转换为DataFrame
-        df = pd.DataFrame(stock_list, columns=rs.fields)
-        
         # 搜索逻辑：
         # 1. 精确匹配股票名称
         exact_match = df[df['code_name'] == asset_name]
         if not exact_match.empty:
             stock_code = exact_match.iloc[0]['code']
-            print(f'✅ 精确匹配找到: {asset_name} -> {stock_code}')
+            logger.info(f'✅ 精确匹配找到: {asset_name} -> {stock_code}')
             return stock_code
         
         # 2. 部分匹配股票名称（包含关键词）
@@ -120,7 +121,7 @@ def search_stock_by_name(asset_name):
             # 选择第一个匹配的股票
             stock_code = partial_matches.iloc[0]['code']
             matched_name = partial_matches.iloc[0]['code_name']
-            print(f'📊 部分匹配找到: {asset_name} -> {matched_name} ({stock_code})')
+            logger.info(f'📊 部分匹配找到: {asset_name} -> {matched_name} ({stock_code})')
             return stock_code
         
         # 3. 关键词匹配（去掉常见后缀如ETF、基金等）
@@ -130,19 +131,21 @@ def search_stock_by_name(asset_name):
             if not keyword_matches.empty:
                 stock_code = keyword_matches.iloc[0]['code']
                 matched_name = keyword_matches.iloc[0]['code_name']
-                print(f'🔍 关键词匹配找到: {asset_name} -> {matched_name} ({stock_code})')
+                logger.info(f'🔍 关键词匹配找到: {asset_name} -> {matched_name} ({stock_code})')
                 return stock_code
         
-        print(f'⚠️ 未找到匹配的股票: {asset_name}')
+        logger.warning(f'⚠️ 未找到匹配的股票: {asset_name}')
         return None
         
     except Exception as e:
-        print(f'搜索股票异常 {asset_name}: {str(e)}')
+        logger.error(f'搜索股票异常 {asset_name}: {str(e)}')
         return None
 
 def search_stock_by_name_enhanced(asset_name):
     """
     增强的股票搜索函数，返回详细的匹配信息
+
+    先查名称解析缓存，未命中时再查字典索引和全市场列表，结果写回缓存。
     
     Args:
         asset_name: 用户输入的资产名称
@@ -150,72 +153,25 @@ def search_stock_by_name_enhanced(asset_name):
     Returns:
         dict: 包含匹配结果和详细信息的字典
     """
+    # 缓存键就是原始输入，与未命中时解析的字符串一致
+    cached = get_cached(asset_name)
+    if cached is not None:
+        return cached
+    result = _search_stock_by_name_uncached(asset_name)
+    put_cached(asset_name, result)
+    return result
+
+def _search_stock_by_name_uncached(asset_name):
+    """不经过缓存的名称解析，返回格式同 search_stock_by_name_enhanced"""
     try:
-        # 首先检查是否有精确匹配的映射
-        if asset_name in STOCK_MAPPING:
-            return {
-                'found': True,
-                'stock_code': STOCK_MAPPING[asset_name],
-                'matched_name': asset_name,
-                'match_type': 'exact_mapping',
-                'confidence': 1.0,
-                'note': '精确映射匹配'
-            }
+        # 在字典索引中查找（精确、包含、关键词和字符修正匹配，不访问网络）
+        result = get_stock_resolver().resolve(asset_name)
+        if result is not None:
+            return result
         
-        # 在字典中进行模糊匹配
-        for stock_name, stock_code in STOCK_MAPPING.items():
-            # 字符替换匹配
-            if '华运' in asset_name and '华远' in stock_name:
-                return {
-                    'found': True,
-                    'stock_code': stock_code,
-                    'matched_name': stock_name,
-                    'match_type': 'dictionary_fuzzy',
-                    'confidence': 0.9,
-                    'note': f'字典模糊匹配: {asset_name} -> {stock_name}'
-                }
-            
-            # 包含匹配
-            if asset_name in stock_name or stock_name in asset_name:
-                return {
-                    'found': True,
-                    'stock_code': stock_code,
-                    'matched_name': stock_name,
-                    'match_type': 'dictionary_contains',
-                    'confidence': 0.8,
-                    'note': f'字典包含匹配: {asset_name} -> {stock_name}'
-                }
-            
-            # 关键词匹配
-            clean_asset_name = asset_name.replace('控股', '').replace('集团', '').replace('股份', '').strip()
-            clean_stock_name = stock_name.replace('控股', '').replace('集团', '').replace('股份', '').strip()
-            if len(clean_asset_name) >= 2 and clean_asset_name in clean_stock_name:
-                return {
-                    'found': True,
-                    'stock_code': stock_code,
-                    'matched_name': stock_name,
-                    'match_type': 'dictionary_keyword',
-                    'confidence': 0.7,
-                    'note': f'字典关键词匹配: {clean_asset_name} -> {stock_name}'
-                }
-        
-        # 获取所有A股股票基本信息
-        rs = bs.query_all_stock(day=datetime.now().strftime('%Y-%m-%d'))
-        if rs.error_code != '0':
-            return {
-                'found': False,
-                'stock_code': None,
-                'matched_name': None,
-                'match_type': 'error',
-                'confidence': 0.0,
-                'note': f'查询股票列表失败: {rs.error_msg}'
-            }
-        
-        stock_list = []
-        while (rs.error_code == '0') & rs.next():
-            stock_list.append(rs.get_row_data())
-        
-        if not stock_list:
+        # 获取所有A股股票基本信息（按交易日缓存）
+        df = get_stock_universe()
+        if df is None or df.empty:
             return {
                 'found': False,
                 'stock_code': None,
@@ -225,9 +181,6 @@ def search_stock_by_name_enhanced(asset_name):
                 'note': '无法获取股票列表数据'
             }
         
-        # 转换为DataFrame
-        df = pd.DataFrame(stock_list, columns=rs.fields)
-        
         # 1. 精确匹配股票名称
         exact_match = df[df['code_name'] == asset_name]
         if not exact_match.empty:
@@ -320,22 +273,12 @@ def search_stock_by_name_enhanced(asset_name):
                             'note': f'字符修正包含匹配: {asset_name} -> {corrected_name} -> {matched_row["code_name"]}'
                         }
         
-        # 5. 模糊匹配（字符相似度）
-        best_match = None
-        best_score = 0.0
+        # 5. 模糊匹配（字符相似度，一次对全部股票名称打分）
+        best = get_universe_index(df).top_k(asset_name, k=1, threshold=0.6)
         
-        for _, row in df.iterrows():
-            stock_name = row['code_name']
-            if pd.isna(stock_name):
-                continue
-                
-            # 计算相似度
-            similarity = calculate_string_similarity(asset_name, stock_name)
-            if similarity > 0.6 and similarity > best_score:
-                best_match = row
-                best_score = similarity
-        
-        if best_match is not None:
+        if best:
+            best_idx, best_score = best[0]
+            best_match = df.iloc[best_idx]
             return {
                 'found': True,
                 'stock_code': best_match['code'],
@@ -365,123 +308,7 @@ def search_stock_by_name_enhanced(asset_name):
             'note': f'搜索异常: {str(e)}'
         }
 
-def calculate_string_similarity(str1, str2):
-    """
-    计算两个字符串的相似度
-    """
-    if not str1 or not str2:
-        return 0.0
-    
-    # 转换为小写并去除空格
-    s1 = str1.lower().replace(' ', '')
-    s2 = str2.lower().replace(' ', '')
-    
-    # 计算最长公共子序列长度
-    def lcs_length(x, y):
-        m, n = len(x), len(y)
-        dp = [[0] * (n + 1) for _ in range(m + 1)]
-        
-        for i in range(1, m + 1):
-            for j in range(1, n + 1):
-                if x[i-1] == y[j-1]:
-                    dp[i][j] = dp[i-1][j-1] + 1
-                else:
-                    dp[i][j] = max(dp[i-1][j], dp[i][j-1])
-        
-        return dp[m][n]
-    
-    # 计算相似度
-    lcs_len = lcs_length(s1, s2)
-    max_len = max(len(s1), len(s2))
-    
-    if max_len == 0:
-        return 1.0
-    
-    return lcs_len / max_len
-
-def get_index_data(index_codes, start_date=None, end_date=None):
-    """
-    获取多个指数的历史数据
-    
-    Args:
-        index_codes: 指数代码列表 (如: ['sh.000001', 'sz.399300'])
-        start_date: 开始日期 (如: 2023-01-01)
-        end_date: 结束日期 (如: 2024-01-01)
-    
-    Returns:
-        dict: 包含各指数历史数据的字典
-    """
-    if not start_date:
-        start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
-    if not end_date:
-        end_date = datetime.now().strftime('%Y-%m-%d')
-    
-    index_data = {}
-    
-    for index_code in index_codes:
-        try:
-            print(f'正在获取指数数据: {index_code}')
-            
-            # 查询指数历史数据
-            rs = bs.query_history_k_data_plus(
-                index_code,
-                "date,code,open,high,low,close,preclose,volume,amount,pctChg",
-                start_date=start_date, 
-                end_date=end_date, 
-                frequency="d"
-            )
-            
-            if rs.error_code != '0':
-                print(f'查询指数数据失败 {index_code}: {rs.error_msg}')
-                continue
-            
-            # 获取数据列表
-            data_list = []
-            while (rs.error_code == '0') & rs.next():
-                data_list.append(rs.get_row_data())
-            
-            if not data_list:
-                print(f'指数 {index_code} 没有数据')
-                continue
-            
-            # 转换为DataFrame
-            df = pd.DataFrame(data_list, columns=rs.fields)
-            
-            # 数据类型转换
-            df['date'] = pd.to_datetime(df['date'])
-            numeric_columns = ['open', 'high', 'low', 'close', 'preclose', 'volume', 'amount', 'pctChg']
-            for col in numeric_columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # 去除空值
-            df = df.dropna()
-            
-            # 按日期排序
-            df = df.sort_values('date').reset_index(drop=True)
-            
-            if len(df) > 0:
-                # 计算归一化收益率（以第一个交易日为基准）
-                base_price = df['close'].iloc[0]
-                normalized_returns = ((df['close'] / base_price - 1) * 100).tolist()
-                
-                index_data[index_code] = {
-                    'dates': df['date'].dt.strftime('%Y-%m-%d').tolist(),
-                    'prices': df['close'].tolist(),
-                    'returns': normalized_returns,
-                    'data_points': len(df)
-                }
-                
-                print(f'✅ 成功获取指数 {index_code} 数据: {len(df)} 个数据点')
-            else:
-                print(f'⚠️ 指数 {index_code} 数据为空')
-                
-        except Exception as e:
-            print(f'获取指数数据异常 {index_code}: {str(e)}')
-            continue
-    
-    return index_data
-
-def get_stock_data(stock_code, start_date=None, end_date=None):
+def get_stock_data(stock_code, start_date=None, end_date=None, frequency='d', adjustflag='3'):
     """
     获取单个股票的历史数据
     
@@ -489,57 +316,26 @@ def get_stock_data(stock_code, start_date=None, end_date=None):
         stock_code: 股票代码 (如: sz.000001)
         start_date: 开始日期 (如: 2023-01-01)
         end_date: 结束日期 (如: 2024-01-01)
+        frequency: K线频率 ('d'、'w'、'm' 或 '5'、'15'、'30'、'60' 分钟)
+        adjustflag: 复权类型 ('1' 后复权，'2' 前复权，'3' 不复权)
     
     Returns:
         DataFrame: 包含历史数据的DataFrame
     """
-    if not start_date:
-        start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
-    if not end_date:
-        end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date, end_date = default_window(start_date, end_date)
     
     try:
-        # 查询历史K线数据
-        rs = bs.query_history_k_data_plus(
-            stock_code,
-            "date,code,open,high,low,close,preclose,volume,amount,pctChg",
-            start_date=start_date, 
-            end_date=end_date, 
-            frequency="d"
-        )
-        
-        if rs.error_code != '0':
-            print(f'查询股票数据失败 {stock_code}: {rs.error_msg}')
-            return None
-        
-        # 获取数据列表
-        data_list = []
-        while (rs.error_code == '0') & rs.next():
-            data_list.append(rs.get_row_data())
+        # 查询历史K线数据（优先使用本地K线缓存，只下载缺失的日期区间）
+        df = fetch_bars(stock_code, start_date, end_date, frequency, adjustflag)
         
-        if not data_list:
-            print(f'股票 {stock_code} 没有数据')
+        if df is None or len(df) == 0:
+            logger.warning(f'股票 {stock_code} 没有数据')
             return None
         
-        # 转换为DataFrame
-        df = pd.DataFrame(data_list, columns=rs.fields)
-        
-        # 数据类型转换
-        df['date'] = pd.to_datetime(df['date'])
-        numeric_columns = ['open', 'high', 'low', 'close', 'preclose', 'volume', 'amount', 'pctChg']
-        for col in numeric_columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # 去除空值
-        df = df.dropna()
-        
-        # 按日期排序
-        df = df.sort_values('date').reset_index(drop=True)
-        
         return df
         
     except Exception as e:
-        print(f'获取股票数据异常 {stock_code}: {str(e)}')
+        logger.error(f'获取股票数据异常 {stock_code}: {str(e)}')
         return None
 
 def calculate_metrics(prices):
@@ -552,74 +348,58 @@ def calculate_metrics(prices):
     Returns:
         dict: 包含各种金融指标的字典
     """
-    if len(prices) < 2:
-        return {
-            'returnRate': 0,
-            'volatility': 0,
-            'sharpeRatio': 0,
-            'maxDrawdown': 0
-        }
-    
-    prices = np.array(prices)
-    
-    # 计算日收益率
-    returns = np.diff(prices) / prices[:-1]
-    returns = returns[~np.isnan(returns)]  # 去除NaN值
-    
-    if len(returns) == 0:
-        return {
-            'returnRate': 0,
-            'volatility': 0,
-            'sharpeRatio': 0,
-            'maxDrawdown': 0
+    metrics = panel_metrics(prices)
+    return {key: float(values[0]) for key, values in metrics.items()}
+
+def build_rolling_metrics(asset_names, price_matrix, window):
+    """
+    对对齐后的价格面板计算滚动指标，输出为 {指标: {资产: 序列}}，缺失值为None
+    """
+    rolling = rolling_metrics(price_matrix, window)
+    output = {'window': window}
+    for key, panel in rolling.items():
+        values = panel.astype(object)
+        values[np.isnan(panel)] = None
+        output[key] = {
+            asset_name: values[:, j].tolist()
+            for j, asset_name in enumerate(asset_names)
         }
-    
-    # 年化收益率
-    total_return = (prices[-1] - prices[0]) / prices[0]
-    trading_days = len(prices)
-    annualized_return = (1 + total_return) ** (252 / trading_days) - 1
-    
-    # 波动率（年化）
-    volatility = np.std(returns) * np.sqrt(252)
-    
-    # 夏普比率（假设无风险利率为3%）
-    risk_free_rate = 0.03
-    sharpe_ratio = (annualized_return - risk_free_rate) / volatility if volatility > 0 else 0
-    
-    # 最大回撤
-    peak = prices[0]
-    max_drawdown = 0
-    for price in prices:
-        if price > peak:
-            peak = price
-        else:
-            drawdown = (peak - price) / peak
-            max_drawdown = max(max_drawdown, drawdown)
-    
-    return {
-        'returnRate': float(annualized_return),
-        'volatility': float(volatility),
-        'sharpeRatio': float(sharpe_ratio),
-        'maxDrawdown': float(max_drawdown)
-    }
+    return output
 
-def generate_portfolio_data(assets):
+def iter_portfolio_data(assets, manage_session=True, max_workers=None, shrinkage=None,
+                        align_policy='inner', output_format='rows', rolling_window=None,
+                        adjustflag='3', allocators=None):
     """
-    生成投资组合数据（基于baostock真实A股数据）
+    逐个产出投资组合数据帧（基于baostock真实A股数据）
+    
+    每个资产获取并计算完成后立即产出一个asset帧（按完成顺序），所有资产完成后
+    产出一个result帧，包含投资组合统计数据但不再重复包含各资产的K线数据。
+    生成器内部只保留各资产的日期和收盘价，不持有已产出的K线数据。
     
     Args:
         assets: 资产名称列表
+        manage_session: 是否在函数内登录/登出baostock（常驻进程中由调用方维护会话）
+        max_workers: 并行获取K线的最大进程数，默认取BAOSTOCK_FETCH_CONCURRENCY
+        shrinkage: 协方差收缩方式（None、'ledoit_wolf'或 [0, 1] 之间的收缩强度）
+        align_policy: 多资产日期对齐方式（'inner'、'ffill'或'drop'）
+        output_format: K线输出格式，'rows'为每根K线一个字典，'columnar'为每个字段一个数组
+        rolling_window: 滚动指标窗口长度（交易日），为None时不计算滚动指标
+        adjustflag: 复权类型（'1' 后复权，'2' 前复权，'3' 不复权），由本地复权因子计算
+        allocators: 风险预算配置方式列表（'risk_parity'、'hrp'），为None时不计算；计算失败时
+            allocations 为 {'error': 错误信息}
     
-    Returns:
-        dict: 投资组合数据
+    Yields:
+        dict: {'type': 'asset', 'data': {'index': 资产下标, 'stock': 资产数据}}，
+            最后为 {'type': 'result', 'data': 投资组合结果}，失败时data为None
     """
-    if not login_baostock():
-        return None
+    if manage_session and not login_baostock():
+        yield {'type': 'result', 'data': None}
+        return
     
     try:
-        stock_data_list = []
-        all_historical_data = {}
-        common_dates = None
+        # 各资产的日期天数和收盘价，用于日期对齐
+        aligned_dates = []
+        aligned_closes = []
         
         # 动态搜索在baostock中存在的资产
         available_assets = []
@@ -627,54 +407,44 @@ def generate_portfolio_data(assets):
         asset_match_info = {}  # 存储匹配信息用于标记
         
         for asset_name in assets:
-            print(f'🔍 搜索资产: {asset_name}')
+            logger.info(f'🔍 搜索资产: {asset_name}')
             result = search_stock_by_name_enhanced(asset_name)
             asset_match_info[asset_name] = result
             
             if result['found']:
                 available_assets.append(asset_name)
                 asset_stock_mapping[asset_name] = result['stock_code']
-                print(f'✅ 找到股票: {asset_name} -> {result["stock_code"]} ({result["matched_name"]}) [{result["match_type"]}] 置信度: {result["confidence"]:.2f}')
+                logger.info(f'✅ 找到股票: {asset_name} -> {result["stock_code"]} ({result["matched_name"]}) [{result["match_type"]}] 置信度: {result["confidence"]:.2f}')
             else:
-                print(f'⚠️ 跳过未找到的资产: {asset_name} - {result["note"]}')
+                logger.warning(f'⚠️ 跳过未找到的资产: {asset_name} - {result["note"]}')
         
         if not available_assets:
-            print('❌ 没有找到任何可用的资产')
-            return {
+            logger.error('❌ 没有找到任何可用的资产')
+            yield {'type': 'result', 'data': {
                 'success': False,
                 'error': '没有找到任何可用的资产',
-                'data': [],
                 'portfolioData': None,
                 'assetMatchInfo': asset_match_info
-            }
+            }}
+            return
         
-        print(f'✅ 找到 {len(available_assets)} 个可用资产: {available_assets}')
+        logger.info(f'✅ 找到 {len(available_assets)} 个可用资产: {available_assets}')
         
-        # 获取每个可用股票的数据
-        for asset_name in available_assets:
-            stock_code = asset_stock_mapping[asset_name]
-            
-            print(f'正在获取 {asset_name} ({stock_code}) 的A股数据...')
-            df = get_stock_data(stock_code)
-            
+        # 并行获取每个可用股票的数据，按完成顺序产出，组合统计仍按资产顺序计算
+        start_date, end_date = default_window()
+        stock_codes = [asset_stock_mapping[asset_name] for asset_name in available_assets]
+        logger.info(f'正在获取 {len(stock_codes)} 个资产的A股数据...')
+        
+        slots = [None] * len(stock_codes)
+        for i, df in iter_bars_parallel(stock_codes, start_date, end_date, max_workers, adjustflag):
+            asset_name = available_assets[i]
+            stock_code = stock_codes[i]
             if df is None or len(df) == 0:
-                print(f'⚠️ 无法获取 {asset_name} 的数据，跳过此资产')
+                logger.warning(f'⚠️ 无法获取 {asset_name} 的数据，跳过此资产')
                 continue
             
-            # 提取数据（包含OHLC）
+            # 提取数据（包含OHLC），按输出格式构建行式或列式价格数据
             current_price = float(df['close'].iloc[-1])
-            historical_prices = []
-            
-            for _, row in df.iterrows():
-                historical_prices.append({
-                    'date': row['date'].strftime('%Y-%m-%d'),
-                    'open': float(row['open']) if pd.notna(row['open']) else float(row['close']),
-                    'high': float(row['high']) if pd.notna(row['high']) else float(row['close']),
-                    'low': float(row['low']) if pd.notna(row['low']) else float(row['close']),
-                    'close': float(row['close']),
-                    'price': float(row['close']),  # 保持兼容性
-                    'volume': int(row['volume']) if pd.notna(row['volume']) else 0
-                })
             
             # 计算指标
             prices = df['close'].values
@@ -684,106 +454,53 @@ def generate_portfolio_data(assets):
                 'symbol': stock_code,
                 'name': asset_name,
                 'currentPrice': current_price,
-                'historicalPrices': historical_prices,
                 'metrics': metrics
             }
+            if output_format == 'columnar':
+                stock_info['historicalColumns'] = build_price_columns(df)
+            else:
+                stock_info['historicalPrices'] = build_price_rows(df)
             
-            stock_data_list.append(stock_info)
-            
-            # 保存历史数据用于投资组合计算
-            dates = [item['date'] for item in historical_prices]
-            prices = [item['price'] for item in historical_prices]
-            all_historical_data[asset_name] = {'dates': dates, 'prices': prices}
+            # 只保存日期和收盘价用于投资组合计算
+            slots[i] = (asset_name, to_day_ordinals(df['date']), df['close'].values)
             
-            # 设置共同日期
-            if common_dates is None:
-                common_dates = dates
-            else:
-                # 取交集
-                common_dates = list(set(common_dates) & set(dates))
+            yield {'type': 'asset', 'data': {'index': i, 'stock': stock_info}}
         
-        if not stock_data_list:
-            print('没有获取到任何股票数据')
-            return None
+        fetched_names = []
+        for slot in slots:
+            if slot is not None:
+                fetched_names.append(slot[0])
+                aligned_dates.append(slot[1])
+                aligned_closes.append(slot[2])
         
-        # 确保日期排序
-        common_dates.sort()
+        if not fetched_names:
+            logger.error('没有获取到任何股票数据')
+            yield {'type': 'result', 'data': None}
+            return
         
-        # 计算期望收益率和协方差矩阵
-        returns_matrix = []
-        asset_names = []
+        # 在统一交易日历上对齐所有资产，得到价格面板 (T x N)
+        panel = align_prices(fetched_names, aligned_dates, aligned_closes, policy=align_policy)
+        if panel.dropped:
+            logger.warning(f'⚠️ 以下资产数据覆盖不足，未参与组合计算: {panel.dropped}')
+        asset_names = panel.assets
+        common_dates = panel.date_strings()
+        price_matrix = panel.prices
         
-        for stock in stock_data_list:
-            asset_name = stock['name']
-            asset_names.append(asset_name)
-            
-            # 获取共同日期的价格
-            price_dict = {item['date']: item['price'] for item in stock['historicalPrices']}
-            common_prices = [price_dict.get(date, stock['currentPrice']) for date in common_dates]
-            
-            # 计算收益率
-            if len(common_prices) > 1:
-                asset_returns = []
-                for i in range(1, len(common_prices)):
-                    if common_prices[i-1] > 0:
-                        ret = (common_prices[i] - common_prices[i-1]) / common_prices[i-1]
-                        asset_returns.append(ret)
-                    else:
-                        asset_returns.append(0)
-                returns_matrix.append(asset_returns)
-            else:
-                returns_matrix.append([0])
-        
-        # 计算期望收益率（年化）
-        expected_returns = []
-        for returns in returns_matrix:
-            if len(returns) > 0:
-                avg_return = np.mean(returns)
-                expected_returns.append(avg_return * 252)  # 年化
-            else:
-                expected_returns.append(0.08)  # 默认8%
-        
-        # 计算协方差矩阵
-        num_assets = len(asset_names)
-        covariance_matrix = np.zeros((num_assets, num_assets))
-        
-        for i in range(num_assets):
-            for j in range(num_assets):
-                if len(returns_matrix[i]) > 1 and len(returns_matrix[j]) > 1:
-                    # 确保两个序列长度相同
-                    min_len = min(len(returns_matrix[i]), len(returns_matrix[j]))
-                    returns_i = returns_matrix[i][:min_len]
-                    returns_j = returns_matrix[j][:min_len]
-                    
-                    cov = np.cov(returns_i, returns_j)[0, 1] * 252  # 年化协方差
-                    covariance_matrix[i, j] = cov
-                else:
-                    covariance_matrix[i, j] = 0.04 if i == j else 0.01  # 默认值
-        
-        # 计算相关系数矩阵
-        correlation_matrix = np.zeros((num_assets, num_assets))
-        for i in range(num_assets):
-            for j in range(num_assets):
-                std_i = np.sqrt(abs(covariance_matrix[i, i]))
-                std_j = np.sqrt(abs(covariance_matrix[j, j]))
-                if std_i > 0 and std_j > 0:
-                    correlation_matrix[i, j] = covariance_matrix[i, j] / (std_i * std_j)
-                else:
-                    correlation_matrix[i, j] = 1 if i == j else 0
+        # 一次性计算年化期望收益率、协方差矩阵和相关系数矩阵
+        statistics = compute_return_statistics(simple_returns(price_matrix), shrinkage=shrinkage)
+        expected_returns = statistics['expectedReturns'].tolist()
+        covariance_matrix = statistics['covarianceMatrix']
+        correlation_matrix = statistics['correlationMatrix']
         
         # 构建历史数据
         historical_data = {
             'dates': common_dates,
-            'prices': {}
+            'prices': {
+                asset_name: price_matrix[:, j].tolist()
+                for j, asset_name in enumerate(asset_names)
+            }
         }
         
-        for stock in stock_data_list:
-            asset_name = stock['name']
-            price_dict = {item['date']: item['price'] for item in stock['historicalPrices']}
-            historical_data['prices'][asset_name] = [
-                price_dict.get(date, stock['currentPrice']) for date in common_dates
-            ]
-        
         portfolio_data = {
             'assets': asset_names,
             'expectedReturns': expected_returns,
@@ -791,66 +508,559 @@ def generate_portfolio_data(assets):
             'correlationMatrix': correlation_matrix.tolist(),
             'historicalData': historical_data
         }
+        if rolling_window:
+            portfolio_data['rollingMetrics'] = build_rolling_metrics(
+                asset_names, price_matrix, int(rolling_window)
+            )
+        if allocators:
+            try:
+                portfolio_data['allocations'] = build_allocations(
+                    covariance_matrix, correlation_matrix, allocators
+                )
+            except ValueError as e:
+                logger.warning(f'⚠️ 风险预算配置计算失败: {e}')
+                portfolio_data['allocations'] = {'error': str(e)}
         
-        return {
+        yield {'type': 'result', 'data': {
             'success': True,
-            'data': stock_data_list,
+            'format': output_format,
             'portfolioData': portfolio_data,
             'assetMatchInfo': asset_match_info,
             'message': 'A股真实数据获取成功'
-        }
+        }}
         
     except Exception as e:
-        print(f'生成投资组合数据异常: {str(e)}')
-        return None
+        logger.error(f'生成投资组合数据异常: {str(e)}')
+        yield {'type': 'result', 'data': None}
     finally:
-        logout_baostock()
+        if manage_session:
+            logout_baostock()
 
-def main():
-    """主函数 - 处理命令行参数"""
+def generate_portfolio_data(assets, manage_session=True, max_workers=None, shrinkage=None,
+                            align_policy='inner', output_format='rows', rolling_window=None,
+                            on_asset=None, adjustflag='3', allocators=None):
+    """
+    生成投资组合数据（基于baostock真实A股数据），在iter_portfolio_data之上收集全部资产
+    
+    Args:
+        assets: 资产名称列表
+        manage_session: 是否在函数内登录/登出baostock（常驻进程中由调用方维护会话）
+        max_workers: 并行获取K线的最大进程数，默认取BAOSTOCK_FETCH_CONCURRENCY
+        shrinkage: 协方差收缩方式（None、'ledoit_wolf'或 [0, 1] 之间的收缩强度）
+        align_policy: 多资产日期对齐方式（'inner'、'ffill'或'drop'）
+        output_format: K线输出格式，'rows'为每根K线一个字典，'columnar'为每个字段一个数组
+        rolling_window: 滚动指标窗口长度（交易日），为None时不计算滚动指标
+        on_asset: 可选回调 on_asset(资产下标, 资产数据)，每个资产处理完成时立即调用
+        adjustflag: 复权类型（'1' 后复权，'2' 前复权，'3' 不复权）
+        allocators: 风险预算配置方式列表（'risk_parity'、'hrp'），为None时不计算
+    
+    Returns:
+        dict: 投资组合数据，失败时为None
+    """
+    slots = {}
+    result = None
+    for frame in iter_portfolio_data(assets, manage_session, max_workers, shrinkage,
+                                     align_policy, output_format, rolling_window, adjustflag,
+                                     allocators):
+        if frame['type'] == 'asset':
+            index = frame['data']['index']
+            slots[index] = frame['data']['stock']
+            if on_asset is not None:
+                on_asset(index, slots[index])
+        else:
+            result = frame['data']
+    
+    if result is None:
+        return None
+    # 各资产数据按资产顺序排列
+    return {'success': result['success'], 'data': [slots[i] for i in sorted(slots)], **result}
+
+def build_allocations(covariance_matrix, correlation_matrix, allocators, budgets=None):
+    """风险平价 / HRP 权重转换为可序列化的字典"""
+    allocations = allocate(covariance_matrix, correlation_matrix, allocators, budgets)
+    return {
+        name: {key: value.tolist() if isinstance(value, np.ndarray) else value
+               for key, value in allocation.items()}
+        for name, allocation in allocations.items()
+    }
+
+def build_portfolio_response(result):
+    """将generate_portfolio_data的结果转换为输出给API的JSON对象"""
+    if result is None:
+        return {
+            'success': False,
+            'error': '获取A股数据失败'
+        }
+    return result
+
+def stream_portfolio_frames(assets, emit, **kwargs):
+    """
+    流式输出投资组合数据：每个资产完成后调用 emit('asset', {...})，返回最终结果
+    
+    各资产数据已逐个输出，最终结果不再包含data，也不在内存中累积各资产的K线数据。
+    """
+    result = None
+    for frame in iter_portfolio_data(assets, **kwargs):
+        if frame['type'] == 'asset':
+            emit('asset', frame['data'])
+        else:
+            result = frame['data']
+    return build_portfolio_response(result)
+
+def build_frontier_response(params):
+    """
+    由 expectedReturns / covarianceMatrix 求解有效前沿并转换为API输出
+
+    Args:
+        params: 包含 expectedReturns、covarianceMatrix（或 portfolioData），
+            可选 riskFreeRate、points、longOnly、bounds
+    """
+    source = params.get('portfolioData') or params
+    expected_returns = source.get('expectedReturns')
+    covariance_matrix = source.get('covarianceMatrix')
+    if not expected_returns or not covariance_matrix:
+        return {'success': False, 'error': '缺少期望收益率或协方差矩阵'}
     try:
-        if len(sys.argv) < 2:
-            print('错误: 缺少资产参数')
-            sys.exit(1)
+        frontier = efficient_frontier(
+            expected_returns, covariance_matrix,
+            risk_free_rate=params.get('riskFreeRate', RISK_FREE_RATE),
+            n_points=params.get('points', DEFAULT_POINTS),
+            long_only=params.get('longOnly', True),
+            bounds=params.get('bounds')
+        )
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    return {
+        'success': True,
+        'assets': source.get('assets'),
+        **frontier
+    }
+
+def build_samples_response(params, emit=None):
+    """
+    由 expectedReturns / covarianceMatrix 生成随机组合点云并转换为API输出
+
+    Args:
+        params: 包含 expectedReturns、covarianceMatrix（或 portfolioData），
+            可选 samples、method、alpha、bounds、seed、chunkSize、riskFreeRate、includeWeights
+        emit: 提供时每批组合完成后调用 emit('samples', 批次数据)，最终结果不再包含点云
+    """
+    source = params.get('portfolioData') or params
+    expected_returns = source.get('expectedReturns')
+    covariance_matrix = source.get('covarianceMatrix')
+    if not expected_returns or not covariance_matrix:
+        return {'success': False, 'error': '缺少期望收益率或协方差矩阵'}
+    n_samples = int(params.get('samples', DEFAULT_SAMPLES))
+    if n_samples <= 0 or n_samples > MAX_SAMPLES:
+        return {'success': False, 'error': f'组合数须在 1 到 {MAX_SAMPLES} 之间'}
+
+    options = {
+        'method': params.get('method', 'uniform'),
+        'alpha': params.get('alpha', 1.0),
+        'bounds': params.get('bounds'),
+        'seed': params.get('seed'),
+        'chunk_size': params.get('chunkSize', DEFAULT_CHUNK_SIZE),
+        'risk_free_rate': params.get('riskFreeRate', RISK_FREE_RATE),
+        'include_weights': bool(params.get('includeWeights'))
+    }
+    try:
+        if emit is not None:
+            for chunk in iter_portfolio_samples(expected_returns, covariance_matrix, n_samples, **options):
+                emit('samples', chunk)
+            return {'success': True, 'assets': source.get('assets'), 'samples': n_samples}
+        samples = sample_portfolios(expected_returns, covariance_matrix, n_samples, **options)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    return {
+        'success': True,
+        'assets': source.get('assets'),
+        'samples': n_samples,
+        **samples
+    }
+
+def _price_panel(params):
+    """读取请求中的价格面板 prices (T x N)，无效时返回错误信息"""
+    prices = params.get('prices')
+    if not isinstance(prices, list) or len(prices) < 2:
+        return None, '价格面板至少需要2期数据'
+    try:
+        return np.asarray(prices, dtype=np.float64), None
+    except (TypeError, ValueError):
+        return None, '价格面板必须是数值矩阵'
+
+def _backtest_payload(result, params):
+    """回测结果转换为API输出，提供 dates 时附带对应的日期"""
+    dates = params.get('dates')
+    start = result['startIndex']
+    has_dates = isinstance(dates, list)
+    return {
+        'success': True,
+        'assets': params.get('assets'),
+        'dates': dates[start:] if has_dates else None,
+        'rebalanceDates': [dates[i] for i in result['rebalanceIndex']] if has_dates else None,
+        'nav': result['nav'].tolist(),
+        'returns': result['returns'].tolist(),
+        'turnover': result['turnover'].tolist(),
+        'costs': result['costs'].tolist(),
+        'weights': result['weights'].tolist(),
+        'rebalanceIndex': result['rebalanceIndex'].tolist(),
+        'startIndex': start,
+        'totalTurnover': result['totalTurnover'],
+        'totalCost': result['totalCost'],
+        'metrics': result['metrics']
+    }
+
+def build_backtest_response(params):
+    """
+    对价格面板回测一个权重方案，提供 sweep 时改为参数扫描
+
+    Args:
+        params: 包含 prices（对齐后的价格面板 T x N），可选 assets、dates、method、weights、
+            rebalanceEvery、lookback、targetVol、maxLeverage、costBps、riskFreeRate、shrinkage、
+            sweep（{rebalanceEvery: [...], lookback: [...]}）、maxWorkers
+    """
+    prices, error = _price_panel(params)
+    if error:
+        return {'success': False, 'error': error}
+
+    options = {
+        'method': params.get('method', 'static'),
+        'weights': params.get('weights'),
+        'target_vol': params.get('targetVol'),
+        'max_leverage': params.get('maxLeverage', 1.0),
+        'cost_bps': float(params.get('costBps', 0.0)),
+        'risk_free_rate': params.get('riskFreeRate', RISK_FREE_RATE),
+        'shrinkage': params.get('shrinkage')
+    }
+    grid = params.get('sweep')
+    try:
+        if grid:
+            results = sweep(prices, grid.get('rebalanceEvery') or [None],
+                            grid.get('lookback') or [params.get('lookback', 60)],
+                            max_workers=params.get('maxWorkers'), **options)
+            return {'success': True, 'assets': params.get('assets'), 'sweep': results}
+        result = backtest(prices, rebalance_every=params.get('rebalanceEvery'),
+                          lookback=params.get('lookback', 60), **options)
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    return _backtest_payload(result, params)
+
+def build_walk_forward_response(params):
+    """
+    滚动前推优化并回测
+
+    Args:
+        params: 包含 prices（对齐后的价格面板 T x N），可选 assets、dates、method、
+            rebalanceEvery、estimator（rolling/expanding/ewma）、window、halflife、minPeriods、
+            maxWeight、riskAversion、shrinkage、costBps、riskFreeRate
+    """
+    prices, error = _price_panel(params)
+    if error:
+        return {'success': False, 'error': error}
+    try:
+        result = walk_forward(
+            prices,
+            cost_bps=float(params.get('costBps', 0.0)),
+            risk_free_rate=params.get('riskFreeRate', RISK_FREE_RATE),
+            method=params.get('method', 'min_variance'),
+            rebalance_every=params.get('rebalanceEvery', DEFAULT_REBALANCE_EVERY),
+            estimator=params.get('estimator', 'rolling'),
+            window=params.get('window', DEFAULT_WINDOW),
+            halflife=params.get('halflife', DEFAULT_HALFLIFE),
+            min_periods=params.get('minPeriods'),
+            max_weight=params.get('maxWeight'),
+            risk_aversion=params.get('riskAversion', DEFAULT_RISK_AVERSION),
+            shrinkage=params.get('shrinkage')
+        )
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    payload = _backtest_payload(result, params)
+    payload['expectedReturns'] = result['expectedReturns'].tolist()
+    payload['iterations'] = result['iterations'].tolist()
+    payload['converged'] = result['converged'].tolist()
+    return payload
+
+def build_risk_response(params):
+    """
+    组合风险分析（历史、正态、Cornish-Fisher和蒙特卡洛VaR/CVaR，风险贡献）
+
+    Args:
+        params: 包含 prices（对齐后的价格面板 T x N），可选 assets、weights、levels、horizon、
+            mcPaths、seed、chunkSize、maxWorkers
+    """
+    prices, error = _price_panel(params)
+    if error:
+        return {'success': False, 'error': error}
+    try:
+        report = risk_report(
+            prices,
+            weights=params.get('weights'),
+            levels=params.get('levels', DEFAULT_LEVELS),
+            horizon=params.get('horizon', 1),
+            mc_paths=params.get('mcPaths', 0),
+            seed=params.get('seed'),
+            chunk_size=params.get('chunkSize'),
+            max_workers=params.get('maxWorkers')
+        )
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    return {
+        'success': True,
+        'assets': params.get('assets'),
+        **report
+    }
+
+def build_allocation_response(params):
+    """
+    由 covarianceMatrix / correlationMatrix 计算风险平价和HRP权重
+
+    Args:
+        params: 包含 covarianceMatrix（或 portfolioData），可选 correlationMatrix、
+            allocators（默认 ['risk_parity', 'hrp']）、budgets
+    """
+    source = params.get('portfolioData') or params
+    covariance_matrix = source.get('covarianceMatrix')
+    if not covariance_matrix:
+        return {'success': False, 'error': '缺少协方差矩阵'}
+    try:
+        allocations = build_allocations(
+            covariance_matrix, source.get('correlationMatrix'),
+            params.get('allocators') or ('risk_parity', 'hrp'), params.get('budgets')
+        )
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+    return {
+        'success': True,
+        'assets': source.get('assets'),
+        'allocations': allocations
+    }
+
+def build_optimizer_response(params):
+    """
+    带约束的均值-方差优化（权重上下限、行业上下限、换手率、目标收益率或目标波动率）
+
+    常驻进程内按资产列表和优化目标缓存上一次的最优权重和搜索得到的风险厌恶系数，
+    下一次请求未给出 initialWeights / riskAversion 时以其热启动
+
+    Args:
+        params: 包含 expectedReturns、covarianceMatrix（或 portfolioData），可选 objective、
+            bounds（每个资产 [下限, 上限]）、sectors、sectorCaps、sectorFloors、currentWeights、
+            maxTurnover、targetReturn、targetVolatility、riskAversion、riskFreeRate、initialWeights
+    """
+    source = params.get('portfolioData') or params
+    expected_returns = source.get('expectedReturns')
+    covariance_matrix = source.get('covarianceMatrix')
+    if not expected_returns or not covariance_matrix:
+        return {'success': False, 'error': '缺少期望收益率或协方差矩阵'}
+    assets = source.get('assets')
+    objective = params.get('objective', 'min_variance')
+    key = (tuple(assets), objective) if isinstance(assets, list) else None
+
+    w0 = params.get('initialWeights')
+    risk_aversion = params.get('riskAversion')
+    warm = w0 is None and key in _WARM_STARTS
+    if warm:
+        w0, previous_gamma = _WARM_STARTS[key]
+        _WARM_STARTS.move_to_end(key)
+        if risk_aversion is None and objective != 'mean_variance':
+            risk_aversion = previous_gamma
+    try:
+        result = optimize_portfolio(
+            expected_returns, covariance_matrix,
+            objective=objective,
+            bounds=params.get('bounds'),
+            sectors=params.get('sectors'),
+            sector_caps=params.get('sectorCaps'),
+            sector_floors=params.get('sectorFloors'),
+            current_weights=params.get('currentWeights'),
+            max_turnover=params.get('maxTurnover'),
+            target_return=params.get('targetReturn'),
+            target_volatility=params.get('targetVolatility'),
+            risk_aversion=DEFAULT_RISK_AVERSION if risk_aversion is None else risk_aversion,
+            risk_free_rate=params.get('riskFreeRate', RISK_FREE_RATE),
+            w0=w0
+        )
+    except ValueError as e:
+        return {'success': False, 'error': str(e)}
+
+    if key is not None:
+        _WARM_STARTS[key] = (result['weights'], result['riskAversion'])
+        _WARM_STARTS.move_to_end(key)
+        while len(_WARM_STARTS) > WARM_START_SIZE:
+            _WARM_STARTS.popitem(last=False)
+    return {
+        'success': True,
+        'assets': assets,
+        **result,
+        'weights': result['weights'].tolist(),
+        'warmStart': warm or params.get('initialWeights') is not None
+    }
+
+def run_worker():
+    """常驻进程模式：保持baostock会话和股票字典，循环处理请求"""
+    from worker import serve
+    from get_index_data import build_index_response, stream_index_frames
+
+    def handle_portfolio(params, emit):
+        assets = params.get('assets')
+        if not isinstance(assets, list) or len(assets) == 0:
+            return {'success': False, 'error': '资产列表不能为空'}
+        
+        options = {
+            'manage_session': False,
+            'max_workers': params.get('maxWorkers'),
+            'shrinkage': params.get('shrinkage'),
+            'align_policy': params.get('alignPolicy', 'inner'),
+            'output_format': params.get('format', 'rows'),
+            'rolling_window': params.get('rollingWindow'),
+            'adjustflag': str(params.get('adjustflag', '3')),
+            'allocators': params.get('allocators')
+        }
+        # stream为真时每个资产完成后立即输出一个asset事件帧
+        if params.get('stream'):
+            return stream_portfolio_frames(assets, emit, **options)
+        return build_portfolio_response(generate_portfolio_data(assets, **options))
+
+    def handle_index(params, emit):
+        index_codes = params.get('indexCodes')
+        if not isinstance(index_codes, list) or len(index_codes) == 0:
+            return {'success': False, 'error': '指数代码列表不能为空'}
+        if params.get('stream'):
+            return stream_index_frames(
+                index_codes, emit, params.get('startDate'), params.get('endDate')
+            )
+        return build_index_response(get_index_data(
+            index_codes, params.get('startDate'), params.get('endDate')
+        ))
+
+    def handle_frontier(params, emit):
+        return build_frontier_response(params)
+
+    def handle_samples(params, emit):
+        # stream为真时每批组合输出一个samples事件帧
+        return build_samples_response(params, emit if params.get('stream') else None)
+
+    def handle_backtest(params, emit):
+        return build_backtest_response(params)
+
+    def handle_walk_forward(params, emit):
+        return build_walk_forward_response(params)
+
+    def handle_risk(params, emit):
+        return build_risk_response(params)
+
+    def handle_allocation(params, emit):
+        return build_allocation_response(params)
+
+    def handle_optimizer(params, emit):
+        return build_optimizer_response(params)
+
+    serve({
+        'generate_portfolio_data': handle_portfolio,
+        'get_index_data': handle_index,
+        'efficient_frontier': handle_frontier,
+        'sample_portfolios': handle_samples,
+        'backtest': handle_backtest,
+        'walk_forward': handle_walk_forward,
+        'risk_analytics': handle_risk,
+        'risk_allocation': handle_allocation,
+        'optimize_portfolio': handle_optimizer
+    }, offline=('efficient_frontier', 'sample_portfolios', 'backtest', 'walk_forward',
+                'risk_analytics', 'risk_allocation', 'optimize_portfolio'))
+
+def parse_output_options(args):
+    """解析命令行中的输出格式、编码和协议选项"""
+    options = {'format': 'rows', 'encoding': 'json', 'protocol': 'json'}
+    for i in range(0, len(args) - 1, 2):
+        key = args[i].lstrip('-')
+        if key in options:
+            options[key] = args[i + 1]
+    if options['format'] not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {options['format']}")
+    if options['protocol'] not in ('json', 'ndjson'):
+        raise ValueError(f"不支持的输出协议: {options['protocol']}")
+    check_encoding(options['encoding'])
+    if options['protocol'] == 'ndjson' and options['encoding'] == 'msgpack':
+        raise ValueError('ndjson协议只支持JSON编码')
+    return options
+
+def write_output(result, stream, encoding='json'):
+    """按指定编码将结果写到输出流，JSON编码以换行结尾"""
+    payload = encode_response(result, encoding)
+    stream.flush()
+    stream.buffer.write(payload)
+    if encoding != 'msgpack':
+        stream.buffer.write(b'\n')
+    stream.buffer.flush()
+
+def write_frame(frame_type, data, stream, encoding='json'):
+    """ndjson协议：输出一行 {"type": ..., "data": ...} 帧"""
+    write_output({'type': frame_type, 'data': data}, stream, encoding)
+
+def run_cli(args, stream):
+    """
+    命令行模式：获取数据并将结果写到stream
+
+    协议:
+        json   - 只输出一个JSON文档（默认）
+        ndjson - 每个资产完成后输出一行asset帧，最后输出一行result帧
+    
+    Returns:
+        int: 进程退出代码
+    """
+    options = {'format': 'rows', 'encoding': 'json', 'protocol': 'json'}
+    try:
+        if len(args) < 1:
+            write_output({'success': False, 'error': '缺少资产参数'}, stream)
+            return 1
         
         # 解析JSON参数
-        assets_json = sys.argv[1]
-        assets = json.loads(assets_json)
+        assets = json.loads(args[0])
         
         if not isinstance(assets, list) or len(assets) == 0:
-            print('错误: 资产列表不能为空')
-            sys.exit(1)
+            write_output({'success': False, 'error': '资产列表不能为空'}, stream)
+            return 1
         
-        # 获取数据
-        result = generate_portfolio_data(assets)
+        # 可选参数: --format rows|columnar  --encoding json|orjson|msgpack  --protocol json|ndjson
+        options = parse_output_options(args[1:])
+        streaming = options['protocol'] == 'ndjson'
         
-        if result is None:
-            print(json.dumps({
-                'success': False,
-                'error': '获取A股数据失败'
-            }, ensure_ascii=False))
-            sys.exit(1)
+        # 获取数据
+        if streaming:
+            emit = lambda event, data: write_frame(event, data, stream, options['encoding'])
+            result = stream_portfolio_frames(assets, emit, output_format=options['format'])
+            write_frame('result', result, stream, options['encoding'])
+        else:
+            result = build_portfolio_response(
+                generate_portfolio_data(assets, output_format=options['format'])
+            )
+            write_output(result, stream, options['encoding'])
         
         # 即使部分资产不可用，只要有可用资产就返回成功
-        if result.get('success') == False and result.get('data') == []:
-            print(json.dumps(result, ensure_ascii=False))
-            sys.exit(1)
-        
-        # 输出JSON结果
-        print(json.dumps(result, ensure_ascii=False, default=str))
+        return 0 if result.get('success') else 1
         
     except json.JSONDecodeError:
-        print(json.dumps({
-            'success': False,
-            'error': '无效的JSON参数'
-        }, ensure_ascii=False))
-        sys.exit(1)
+        error = {'success': False, 'error': '无效的JSON参数'}
     except Exception as e:
-        print(json.dumps({
-            'success': False,
-            'error': f'处理异常: {str(e)}'
-        }, ensure_ascii=False))
-        sys.exit(1)
+        error = {'success': False, 'error': f'处理异常: {str(e)}'}
+    
+    if options['protocol'] == 'ndjson':
+        write_frame('result', error, stream)
+    else:
+        write_output(error, stream)
+    return 1
+
+def main():
+    """主函数 - 处理命令行参数"""
+    if len(sys.argv) >= 2 and sys.argv[1] == '--worker':
+        run_worker()
+        return
+    
+    # 诊断信息（包括baostock登录/登出提示）全部写到stderr，stdout只输出结果
+    stdout = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        exit_code = run_cli(sys.argv[1:], stdout)
+    sys.exit(exit_code)
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,662 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线本地缓存 - 按 (代码, 频率, 复权类型) 持久化的列式存储
+
+日线、周线、月线：每个键对应一个 (字段数 x 交易日数) 的float64 .npy文件
+（每行一列，可mmap读取），以及一个记录已查询日期区间的 .json 文件。请求时只从
+baostock补齐缺失的首尾日期区间，昨天及以前的K线不会重复下载。
+日线缓存覆盖所需区间的起点时，周线和月线由日线合成，不再单独下载。
+
+分钟线（5/15/30/60分钟）：数据量比日线大两个数量级，按 代码/月份 分区存储，
+每个分区是一个 (字段数 x K线数) 的.npy文件，coverage.json 记录每个月已查询到的日期。
+较粗的分钟线优先由已缓存的较细分钟线合成（如60分钟线由5分钟线合成）。
+
+复权：本地只保存不复权K线（adjustflag='3'）和每个证券的复权因子
+（adjust/<代码>.json，每天最多更新一次）。后复权价 = 不复权价 x 后复权因子，
+前复权价 = 后复权价 / 最新后复权因子，切换复权方式不需要重新下载K线。
+
+多个进程同时请求同一个键时，通过文件锁串行执行：后到的进程等待先到的进程
+写完缓存后直接读取，不重复下载相同的历史区间。
+"""
+import os
+import json
+import contextlib
+import numpy as np
+import pandas as pd
+import baostock as bs
+from datetime import datetime, timedelta, date
+from log_utils import get_logger
+from ingest import read_result_set, valid_rows
+
+try:
+    import fcntl
+except ImportError:  # Windows下没有fcntl，退化为不加锁
+    fcntl = None
+
+logger = get_logger('bar_store')
+
+BAR_STORE_DIR = os.environ.get(
+    'BAR_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bar_cache')
+)
+
+KLINE_FIELDS = "date,code,open,high,low,close,preclose,volume,amount,pctChg"
+# 周线、月线没有preclose字段，由pctChg反推
+PERIOD_FIELDS = "date,code,open,high,low,close,volume,amount,adjustflag,turn,pctChg"
+MINUTE_FIELDS = "date,time,code,open,high,low,close,volume,amount,adjustflag"
+NUMERIC_COLUMNS = ['open', 'high', 'low', 'close', 'preclose', 'volume', 'amount', 'pctChg']
+MINUTE_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'amount']
+
+# baostock复权类型：1 后复权，2 前复权，3 不复权
+ADJUSTFLAGS = ('1', '2', '3')
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'preclose']
+
+PERIOD_FREQUENCIES = ('w', 'm')
+MINUTE_FREQUENCIES = ('5', '15', '30', '60')
+FREQUENCIES = ('d',) + PERIOD_FREQUENCIES + MINUTE_FREQUENCIES
+
+# 存储文件中各行的含义：第0行为日期（距1970-01-01的天数），其余为数值列
+STORED_COLUMNS = ['date'] + NUMERIC_COLUMNS
+# 分钟线第0行为K线结束时间（距1970-01-01的分钟数，北京时间）
+MINUTE_STORED_COLUMNS = ['time'] + MINUTE_COLUMNS
+
+# 上午、下午开盘时间（当天的分钟数），分钟线按交易时段对齐合成
+MORNING_OPEN = 9 * 60 + 30
+MORNING_CLOSE = 11 * 60 + 30
+AFTERNOON_OPEN = 13 * 60
+
+EPOCH = date(1970, 1, 1)
+
+# 需要重新登录的baostock错误码：10001001 用户未登录，10002xxx 网络错误（连接已断开）
+NOT_LOGGED_IN = '10001001'
+NETWORK_ERROR_PREFIX = '10002'
+
+
+class SessionError(RuntimeError):
+    """baostock会话失效（未登录、登录过期或连接断开），重新登录后可以重试"""
+
+
+def _check_session(rs, what):
+    """查询因会话失效而失败时抛出 SessionError，其余错误由调用方处理"""
+    if rs.error_code == NOT_LOGGED_IN or str(rs.error_code).startswith(NETWORK_ERROR_PREFIX):
+        raise SessionError(f'{what}: {rs.error_msg}')
+
+
+def _to_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _paths(code, frequency, adjustflag):
+    directory = os.path.join(BAR_STORE_DIR, frequency, str(adjustflag))
+    return (
+        os.path.join(directory, f'{code}.npy'),
+        os.path.join(directory, f'{code}.json')
+    )
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """以 path.lock 文件实现的跨进程互斥锁"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.lock', 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _key_lock(code, frequency, adjustflag):
+    """同一个键的跨进程互斥锁"""
+    data_path, _ = _paths(code, frequency, adjustflag)
+    return file_lock(data_path)
+
+
+def _read_store(code, frequency, adjustflag):
+    """读取缓存，返回 (数据矩阵, 元数据)，不存在时返回 (None, None)"""
+    data_path, meta_path = _paths(code, frequency, adjustflag)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return None, None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        matrix = np.load(data_path, mmap_mode='r')
+        if matrix.ndim != 2 or matrix.shape[0] != len(STORED_COLUMNS):
+            return None, None
+        return matrix, meta
+    except Exception:
+        return None, None
+
+
+def _save_matrix(path, matrix):
+    """原子地写入.npy文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(matrix, dtype=np.float64))
+    os.replace(tmp_path, path)
+
+
+def _save_json(path, data):
+    """原子地写入.json文件"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _write_store(code, frequency, adjustflag, matrix, meta):
+    """原子地写入缓存：先写数据再写元数据，中途失败最多导致重复下载"""
+    data_path, meta_path = _paths(code, frequency, adjustflag)
+    _save_matrix(data_path, matrix)
+    _save_json(meta_path, meta)
+
+
+def _query_columns(code, fields, start_date, end_date, frequency, adjustflag):
+    """
+    从baostock查询K线
+
+    Returns:
+        dict: 字段名 -> 类型化数组（可能为空）；查询失败时返回None
+
+    Raises:
+        SessionError: baostock会话失效
+    """
+    rs = bs.query_history_k_data_plus(
+        code,
+        fields,
+        start_date=start_date.strftime('%Y-%m-%d'),
+        end_date=end_date.strftime('%Y-%m-%d'),
+        frequency=frequency,
+        adjustflag=str(adjustflag)
+    )
+
+    if rs.error_code != '0':
+        _check_session(rs, f'查询K线数据失败 {code}')
+        logger.error(f'查询K线数据失败 {code}: {rs.error_msg}')
+        return None
+    return read_result_set(rs)
+
+
+def _query_bars(code, start_date, end_date, frequency, adjustflag):
+    """
+    从baostock查询日线、周线或月线并转换为存储矩阵
+
+    Returns:
+        ndarray: (字段数 x 行数) 矩阵；查询失败时返回None
+    """
+    fields = KLINE_FIELDS if frequency == 'd' else PERIOD_FIELDS
+    columns = _query_columns(code, fields, start_date, end_date, frequency, adjustflag)
+    if columns is None:
+        return None
+
+    matrix = np.full((len(STORED_COLUMNS), len(columns['date'])), np.nan)
+    matrix[0] = columns['date']
+    for i, col in enumerate(NUMERIC_COLUMNS, start=1):
+        if col in columns:
+            matrix[i] = columns[col]
+    if 'preclose' not in columns:
+        close, pct = matrix[STORED_COLUMNS.index('close')], matrix[STORED_COLUMNS.index('pctChg')]
+        matrix[STORED_COLUMNS.index('preclose')] = close / (1 + pct / 100)
+    # 日期为空的行无法定位，直接丢弃
+    return matrix[:, valid_rows(columns, ['date'])]
+
+
+def _query_minute_bars(code, start_date, end_date, frequency, adjustflag):
+    """
+    从baostock查询分钟线并转换为存储矩阵
+
+    Returns:
+        ndarray: (字段数 x K线数) 矩阵；查询失败时返回None
+    """
+    columns = _query_columns(code, MINUTE_FIELDS, start_date, end_date, frequency, adjustflag)
+    if columns is None:
+        return None
+
+    matrix = np.empty((len(MINUTE_STORED_COLUMNS), len(columns['time'])))
+    matrix[0] = columns['time']
+    for i, col in enumerate(MINUTE_COLUMNS, start=1):
+        matrix[i] = columns[col]
+    return matrix[:, columns['time'] > 0]
+
+
+def _merge(*matrices, rows=len(STORED_COLUMNS)):
+    """按第0行（日期或时间）合并多个矩阵，同一时间保留最后出现的数据"""
+    parts = [m for m in matrices if m is not None and m.shape[1] > 0]
+    if not parts:
+        return np.empty((rows, 0))
+    combined = np.concatenate(parts, axis=1)
+    # 反转后取唯一值，使较新的数据覆盖旧数据
+    reversed_dates = combined[0, ::-1]
+    _, first_idx = np.unique(reversed_dates, return_index=True)
+    keep = combined.shape[1] - 1 - first_idx
+    return combined[:, keep]
+
+
+def _to_frame(matrix, code):
+    """将存储矩阵（已按日期排序）转换为与原get_stock_data一致的DataFrame，丢弃有空值的行"""
+    matrix = matrix[:, ~np.isnan(matrix).any(axis=0)]
+    data = {
+        'date': pd.to_datetime(matrix[0].astype(np.int64), unit='D'),
+        'code': np.full(matrix.shape[1], code, dtype=object)
+    }
+    for i, col in enumerate(NUMERIC_COLUMNS, start=1):
+        data[col] = matrix[i]
+    return pd.DataFrame(data)
+
+
+def _to_minute_frame(matrix, code, adjustflag):
+    """将分钟线存储矩阵转换为DataFrame（date为交易日，time为K线结束时间）"""
+    matrix = matrix[:, ~np.isnan(matrix).any(axis=0)]
+    minutes = matrix[0].astype(np.int64)
+    data = {
+        'date': pd.to_datetime(minutes // 1440, unit='D'),
+        'time': pd.to_datetime(minutes, unit='m'),
+        'code': np.full(len(minutes), code, dtype=object)
+    }
+    for i, col in enumerate(MINUTE_COLUMNS, start=1):
+        data[col] = matrix[i]
+    data['adjustflag'] = np.full(len(minutes), str(adjustflag), dtype=object)
+    return pd.DataFrame(data)
+
+
+def _segments(keys):
+    """已排序分组键的各组起止下标"""
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    return starts, ends
+
+
+def resample_period(matrix, frequency):
+    """
+    由日线存储矩阵合成周线（'w'）或月线（'m'）
+
+    日期为每周/每月最后一个交易日；开盘价取第一天，收盘价取最后一天，
+    最高/最低价取极值，成交量和成交额求和，前收盘价取第一天的前收盘价。
+    """
+    days = matrix[0].astype(np.int64)
+    if days.size == 0:
+        return np.empty((len(STORED_COLUMNS), 0))
+    if frequency == 'w':
+        # 1970-01-01是星期四，(天数+3)//7 在每个星期一递增
+        keys = (days + 3) // 7
+    else:
+        keys = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    starts, ends = _segments(keys)
+
+    column = {name: matrix[i] for i, name in enumerate(STORED_COLUMNS)}
+    out = np.empty((len(STORED_COLUMNS), len(starts)))
+    out[0] = days[ends]
+    out[STORED_COLUMNS.index('open')] = column['open'][starts]
+    out[STORED_COLUMNS.index('high')] = np.fmax.reduceat(column['high'], starts)
+    out[STORED_COLUMNS.index('low')] = np.fmin.reduceat(column['low'], starts)
+    out[STORED_COLUMNS.index('close')] = column['close'][ends]
+    out[STORED_COLUMNS.index('preclose')] = column['preclose'][starts]
+    out[STORED_COLUMNS.index('volume')] = np.add.reduceat(column['volume'], starts)
+    out[STORED_COLUMNS.index('amount')] = np.add.reduceat(column['amount'], starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[STORED_COLUMNS.index('pctChg')] = (
+            out[STORED_COLUMNS.index('close')] / out[STORED_COLUMNS.index('preclose')] - 1
+        ) * 100
+    return out
+
+
+def resample_minutes(matrix, frequency):
+    """
+    由较细的分钟线存储矩阵合成较粗的分钟线（如5分钟线合成60分钟线）
+
+    按上午、下午交易时段分别对齐，与baostock的K线结束时间一致
+    （60分钟线为 10:30、11:30、14:00、15:00）。
+    """
+    minutes = matrix[0].astype(np.int64)
+    if minutes.size == 0:
+        return np.empty((len(MINUTE_STORED_COLUMNS), 0))
+    step = int(frequency)
+    minute_of_day = minutes % 1440
+    session_open = np.where(minute_of_day <= MORNING_CLOSE, MORNING_OPEN, AFTERNOON_OPEN)
+    bucket_end = session_open - (-(minute_of_day - session_open) // step) * step
+    keys = minutes - minute_of_day + bucket_end
+    starts, ends = _segments(keys)
+
+    out = np.empty((len(MINUTE_STORED_COLUMNS), len(starts)))
+    out[0] = keys[starts]
+    out[1] = matrix[1][starts]
+    out[2] = np.fmax.reduceat(matrix[2], starts)
+    out[3] = np.fmin.reduceat(matrix[3], starts)
+    out[4] = matrix[4][ends]
+    out[5] = np.add.reduceat(matrix[5], starts)
+    out[6] = np.add.reduceat(matrix[6], starts)
+    return out
+
+
+def load_bars(code, start_date, end_date, frequency='d', adjustflag='3'):
+    """
+    获取K线数据，优先读取本地缓存，只从baostock补齐缺失的日期区间
+
+    已查询过的区间即使没有K线（节假日、停牌）也会记录在元数据中，不会重复请求。
+    当天的K线可能尚未收盘，只返回不落盘。
+
+    Args:
+        code: 证券代码 (如: sh.600000)
+        start_date: 开始日期 (如: 2023-01-01)
+        end_date: 结束日期 (如: 2024-01-01)
+        frequency: K线频率（'d'、'w'、'm' 或 '5'、'15'、'30'、'60' 分钟）
+        adjustflag: 复权类型
+
+    Returns:
+        DataFrame: 包含历史数据的DataFrame，无法获取任何数据时返回None；
+            分钟线另有time（K线结束时间）和adjustflag列
+    """
+    frequency = str(frequency)
+    adjustflag = str(adjustflag)
+    if frequency not in FREQUENCIES:
+        raise ValueError(f'不支持的K线频率: {frequency}')
+    if adjustflag not in ADJUSTFLAGS:
+        raise ValueError(f'不支持的复权类型: {adjustflag}')
+    if adjustflag != '3':
+        return _load_adjusted(code, start_date, end_date, frequency, adjustflag)
+    with _key_lock(code, frequency, adjustflag):
+        if frequency in MINUTE_FREQUENCIES:
+            return _load_minute_bars(code, start_date, end_date, frequency, adjustflag)
+        if frequency in PERIOD_FREQUENCIES:
+            derived = _period_from_daily(code, start_date, end_date, frequency, adjustflag)
+            if derived is not None:
+                return derived
+        return _load_bars(code, start_date, end_date, frequency, adjustflag)
+
+
+def _period_start(day, frequency):
+    """day所在周（星期一）或月（1日）的第一天"""
+    if frequency == 'w':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _period_from_daily(code, start_date, end_date, frequency, adjustflag):
+    """
+    日线缓存已覆盖所需区间的起点时由日线合成周线/月线（日线尾部缺失的部分照常补齐）
+
+    Returns:
+        DataFrame: 合成的周线/月线；日线缓存不足时返回None
+    """
+    start = _to_date(start_date)
+    first = _period_start(start, frequency)
+    _, meta = _read_store(code, 'd', adjustflag)
+    if meta is None or _to_date(meta['start']) > first:
+        return None
+
+    with _key_lock(code, 'd', adjustflag):
+        daily = _load_bars(code, first, end_date, 'd', adjustflag)
+    return _periods_from_daily(daily, code, start, frequency)
+
+
+def _periods_from_daily(daily, code, start, frequency):
+    """将从周期起点开始的日线DataFrame合成周线/月线，只保留start之后的周期"""
+    if daily is None:
+        return None
+    # 日线DataFrame包含当天尚未落盘的K线
+    matrix = np.vstack([daily['date'].values.astype('datetime64[D]').astype(np.int64)] +
+                       [daily[col].values for col in NUMERIC_COLUMNS]).astype(np.float64)
+    periods = resample_period(matrix, frequency)
+    window = periods[:, periods[0] >= (start - EPOCH).days]
+    if window.shape[1] == 0:
+        return None
+    return _to_frame(window, code)
+
+
+def _factor_path(code):
+    return os.path.join(BAR_STORE_DIR, 'adjust', f'{code}.json')
+
+
+def _query_adjust_factors(code):
+    """从baostock查询全部复权因子，查询失败时返回None，会话失效时抛出 SessionError"""
+    rs = bs.query_adjust_factor(code=code, start_date='1990-01-01',
+                                end_date=date.today().strftime('%Y-%m-%d'))
+    if rs.error_code != '0':
+        _check_session(rs, f'查询复权因子失败 {code}')
+        logger.error(f'查询复权因子失败 {code}: {rs.error_msg}')
+        return None
+    columns = read_result_set(rs)
+    order = np.argsort(columns['dividOperateDate'], kind='stable')
+    days = columns['dividOperateDate'][order].astype(np.int64)
+    return {
+        'dates': days.astype('datetime64[D]').astype(str).tolist(),
+        'backAdjustFactor': columns['backAdjustFactor'][order].tolist()
+    }
+
+
+def load_adjust_factors(code):
+    """
+    获取证券的后复权因子序列（本地缓存，每天最多查询一次）
+
+    Returns:
+        tuple: (除权除息日的天数数组, 对应的后复权因子数组)，没有可用因子时返回None
+    """
+    path = _factor_path(code)
+    today = date.today().strftime('%Y-%m-%d')
+    with file_lock(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            cached = None
+        if cached is None or cached.get('fetched_on') != today:
+            fresh = _query_adjust_factors(code)
+            if fresh is not None:
+                fresh['fetched_on'] = today
+                _save_json(path, fresh)
+                cached = fresh
+    if cached is None:
+        return None
+    days = np.array(cached['dates'], dtype='datetime64[D]').astype(np.int64)
+    return days, np.asarray(cached['backAdjustFactor'], dtype=np.float64)
+
+
+def adjust_factor_series(days, factor_days, back_factors, adjustflag):
+    """
+    每个交易日的复权因子
+
+    因子在除权除息日当天生效，第一个除权除息日之前的后复权因子为1；
+    前复权因子为后复权因子除以最新的后复权因子。
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if len(factor_days) == 0:
+        return np.ones(len(days))
+    idx = np.searchsorted(factor_days, days, side='right') - 1
+    factors = np.where(idx >= 0, back_factors[np.maximum(idx, 0)], 1.0)
+    if str(adjustflag) == '2':
+        factors = factors / back_factors[-1]
+    return factors
+
+
+def _load_adjusted(code, start_date, end_date, frequency, adjustflag):
+    """由不复权K线和复权因子计算复权K线"""
+    if frequency in PERIOD_FREQUENCIES:
+        # 周期内可能有除权除息，由复权日线合成
+        start = _to_date(start_date)
+        daily = _load_adjusted(code, _period_start(start, frequency), end_date, 'd', adjustflag)
+        return _periods_from_daily(daily, code, start, frequency)
+
+    df = load_bars(code, start_date, end_date, frequency, '3')
+    if df is None:
+        return None
+    factors = load_adjust_factors(code)
+    if factors is None:
+        logger.error(f'没有可用的复权因子，无法计算复权价格: {code}')
+        return None
+
+    days = df['date'].values.astype('datetime64[D]').astype(np.int64)
+    multiplier = adjust_factor_series(days, *factors, adjustflag)
+    columns = [col for col in PRICE_COLUMNS if col in df]
+    df[columns] = df[columns].values * multiplier[:, None]
+    if 'adjustflag' in df:
+        df['adjustflag'] = adjustflag
+    return df
+
+
+def _minute_paths(code, frequency, adjustflag, month=None):
+    """分区文件路径；month为None时返回coverage.json路径"""
+    directory = os.path.join(BAR_STORE_DIR, frequency, str(adjustflag), code)
+    if month is None:
+        return os.path.join(directory, 'coverage.json')
+    return os.path.join(directory, f'{month}.npy')
+
+
+def _read_coverage(code, frequency, adjustflag):
+    try:
+        with open(_minute_paths(code, frequency, adjustflag), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _read_partition(code, frequency, adjustflag, month):
+    try:
+        matrix = np.load(_minute_paths(code, frequency, adjustflag, month))
+    except (OSError, ValueError):
+        return None
+    if matrix.ndim != 2 or matrix.shape[0] != len(MINUTE_STORED_COLUMNS):
+        return None
+    return matrix
+
+
+def _months(start, end):
+    """start到end之间每个月的 (月份标识, 月初, 月末)"""
+    month = start.replace(day=1)
+    while month <= end:
+        following = (month + timedelta(days=32)).replace(day=1)
+        yield month.strftime('%Y-%m'), month, following - timedelta(days=1)
+        month = following
+
+
+def _derive_minutes(code, frequency, adjustflag, month, need_end):
+    """
+    由已缓存的较细分钟线合成某个月的分区
+
+    Returns:
+        tuple: (合成的矩阵, 覆盖到的日期)；没有可用的较细分钟线时返回None
+    """
+    step = int(frequency)
+    finer = [f for f in MINUTE_FREQUENCIES if int(f) < step and step % int(f) == 0]
+    # 优先使用最粗的可用分钟线，需要合并的K线最少
+    for source in reversed(finer):
+        covered = _read_coverage(code, source, adjustflag).get(month)
+        if covered is None or _to_date(covered) < need_end:
+            continue
+        matrix = _read_partition(code, source, adjustflag, month)
+        if matrix is not None:
+            return resample_minutes(matrix, frequency), covered
+    return None
+
+
+def _load_minute_bars(code, start_date, end_date, frequency, adjustflag):
+    start = _to_date(start_date)
+    end = _to_date(end_date)
+    yesterday = date.today() - timedelta(days=1)
+    coverage = _read_coverage(code, frequency, adjustflag)
+    coverage_changed = False
+    parts = []
+
+    for month, month_start, month_end in _months(start, end):
+        need_end = min(end, month_end)
+        covered = coverage.get(month)
+        matrix = _read_partition(code, frequency, adjustflag, month) if covered else None
+        if matrix is None:
+            covered = None
+
+        if covered is None or _to_date(covered) < need_end:
+            derived = _derive_minutes(code, frequency, adjustflag, month, need_end)
+            if derived is not None:
+                matrix, covered = derived
+                _save_matrix(_minute_paths(code, frequency, adjustflag, month), matrix)
+                coverage[month] = covered
+                coverage_changed = True
+            else:
+                # 分区总是从月初开始，只补齐已覆盖日期之后的部分
+                fetch_start = month_start if covered is None else _to_date(covered) + timedelta(days=1)
+                fetched = _query_minute_bars(code, fetch_start, need_end, frequency, adjustflag)
+                if fetched is not None:
+                    matrix = _merge(matrix, fetched, rows=len(MINUTE_STORED_COLUMNS))
+                    # 昨天及以前的分钟线已经定型，可以安全落盘
+                    new_covered = min(need_end, yesterday)
+                    if new_covered >= month_start and (covered is None or new_covered > _to_date(covered)):
+                        limit = (new_covered - EPOCH).days * 1440 + 1440
+                        _save_matrix(_minute_paths(code, frequency, adjustflag, month),
+                                     matrix[:, matrix[0] < limit])
+                        coverage[month] = new_covered.strftime('%Y-%m-%d')
+                        coverage_changed = True
+
+        if matrix is not None:
+            parts.append(matrix)
+
+    if coverage_changed:
+        _save_json(_minute_paths(code, frequency, adjustflag), coverage)
+
+    if not parts:
+        return None
+    merged = np.concatenate(parts, axis=1)
+    lo, hi = (start - EPOCH).days * 1440, (end - EPOCH).days * 1440 + 1440
+    window = merged[:, (merged[0] >= lo) & (merged[0] < hi)]
+    if window.shape[1] == 0:
+        return None
+    return _to_minute_frame(window, code, adjustflag)
+
+
+def _load_bars(code, start_date, end_date, frequency, adjustflag):
+    start = _to_date(start_date)
+    end = _to_date(end_date)
+    # 昨天及以前的日线已经定型，可以安全落盘
+    finalized_end = min(end, date.today() - timedelta(days=1))
+
+    cached, meta = _read_store(code, frequency, adjustflag)
+    if cached is not None:
+        cached = np.array(cached)
+        covered_start = _to_date(meta['start'])
+        covered_end = _to_date(meta['end'])
+    else:
+        covered_start = covered_end = None
+
+    fetched = []
+    new_start, new_end = covered_start, covered_end
+
+    if covered_start is None:
+        matrix = _query_bars(code, start, end, frequency, adjustflag)
+        if matrix is not None:
+            fetched.append(matrix)
+            new_start, new_end = start, finalized_end
+    else:
+        if start < covered_start:
+            matrix = _query_bars(code, start, covered_start - timedelta(days=1), frequency, adjustflag)
+            if matrix is not None:
+                fetched.append(matrix)
+                new_start = start
+        if end > covered_end:
+            matrix = _query_bars(code, covered_end + timedelta(days=1), end, frequency, adjustflag)
+            if matrix is not None:
+                fetched.append(matrix)
+                new_end = max(covered_end, finalized_end)
+
+    if cached is None and not fetched:
+        return None
+
+    merged = _merge(cached, *fetched)
+
+    coverage_changed = (new_start, new_end) != (covered_start, covered_end)
+    if coverage_changed and new_start is not None and new_start <= new_end:
+        persisted = merged[:, merged[0] <= (new_end - EPOCH).days]
+        _write_store(code, frequency, adjustflag, persisted, {
+            'start': new_start.strftime('%Y-%m-%d'),
+            'end': new_end.strftime('%Y-%m-%d')
+        })
+
+    lo, hi = (start - EPOCH).days, (end - EPOCH).days
+    window = merged[:, (merged[0] >= lo) & (merged[0] <= hi)]
+    if window.shape[1] == 0:
+        return None
+    return _to_frame(window, code)
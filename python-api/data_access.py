@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据访问层 - baostock会话、K线获取和指数数据，供 baostock_data.py 与 get_index_data.py 共用
+
+同一进程内对相同 (代码, 日期区间, 频率, 复权类型) 的请求会合并：
+    - 正在获取时，其他请求等待同一次获取的结果，不重复查询；
+    - 获取完成后结果缓存 BAR_CACHE_TTL 秒（当天K线未收盘，缓存时间不宜过长），
+      缓存条目数超过 BAR_CACHE_SIZE 时淘汰最久未使用的条目。
+baostock客户端不是线程安全的，所有查询在同一把锁内串行执行。
+并行获取时父进程先用 claim_bars 查缓存和正在进行的获取，只把需要获取的资产交给进程池，
+结果以 publish_bars 写回父进程的缓存；子进程各自的缓存只在子进程内有效。
+跨进程的重复下载由 bar_store 的文件锁避免。
+
+全市场股票列表（query_all_stock）按交易日缓存：每个自然日最多下载一次，
+持久化到 BAR_STORE_DIR/universe.json 供其他请求和进程共用；
+周末、节假日或当天数据尚未生成时使用最近一个有数据的交易日。
+名称模糊匹配用的相似度索引按快照的交易日缓存，快照更换前只编码一次。
+"""
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+import baostock as bs
+import numpy as np
+import pandas as pd
+from bar_store import load_bars, file_lock, BAR_STORE_DIR
+from ingest import read_result_set
+from log_utils import get_logger
+from similarity import SimilarityIndex
+
+logger = get_logger('data_access')
+
+BAR_CACHE_TTL = float(os.environ.get('BAR_CACHE_TTL', '60'))
+BAR_CACHE_SIZE = int(os.environ.get('BAR_CACHE_SIZE', '256'))
+
+_CACHE = OrderedDict()  # 键 -> (过期时间, DataFrame)
+_IN_FLIGHT = {}         # 键 -> Future
+_LOCK = threading.Lock()
+_SESSION_LOCK = threading.Lock()
+_STATS = {'hits': 0, 'coalesced': 0, 'fetches': 0}
+
+UNIVERSE_PATH = os.path.join(BAR_STORE_DIR, 'universe.json')
+# 当天没有数据时最多向前回退的交易日数
+UNIVERSE_LOOKBACK = 5
+_UNIVERSE = None  # (获取日期, DataFrame)
+_UNIVERSE_INDEX = None  # (快照交易日, SimilarityIndex)
+
+
+def login_baostock():
+    """登录baostock系统"""
+    try:
+        lg = bs.login()
+        if lg.error_code != '0':
+            return False
+        return True
+    except Exception:
+        return False
+
+
+def logout_baostock():
+    """登出baostock系统"""
+    try:
+        bs.logout()
+    except Exception:
+        pass
+
+
+def default_window(start_date=None, end_date=None):
+    """默认日期区间：最近一年"""
+    if not start_date:
+        start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
+    if not end_date:
+        end_date = datetime.now().strftime('%Y-%m-%d')
+    return start_date, end_date
+
+
+def _copy(df):
+    return None if df is None else df.copy()
+
+
+def bar_key(code, start_date, end_date, frequency='d', adjustflag='3'):
+    """K线请求的缓存键"""
+    return (code, str(start_date), str(end_date), str(frequency), str(adjustflag))
+
+
+def claim_bars(key):
+    """
+    登记一次K线请求：命中缓存、加入正在进行的获取，或由调用方负责获取
+
+    Returns:
+        tuple: (Future, 是否由调用方获取)。命中缓存时Future已完成；由调用方获取时，
+            完成后必须以 publish_bars 发布结果，等待同一键的请求随之返回。
+            Future的结果是共享的DataFrame，调用方需自行复制
+    """
+    now = time.monotonic()
+    with _LOCK:
+        entry = _CACHE.get(key)
+        if entry is not None and entry[0] > now:
+            _CACHE.move_to_end(key)
+            _STATS['hits'] += 1
+            future = Future()
+            future.set_result(entry[1])
+            return future, False
+        future = _IN_FLIGHT.get(key)
+        if future is not None:
+            _STATS['coalesced'] += 1
+            return future, False
+        future = Future()
+        _IN_FLIGHT[key] = future
+        _STATS['fetches'] += 1
+        return future, True
+
+
+def publish_bars(key, future, df=None, error=None):
+    """发布 claim_bars 登记的获取结果：成功时写入缓存，失败时等待的请求收到同一异常"""
+    with _LOCK:
+        if error is None and df is not None and BAR_CACHE_TTL > 0:
+            _CACHE[key] = (time.monotonic() + BAR_CACHE_TTL, df)
+            _CACHE.move_to_end(key)
+            while len(_CACHE) > BAR_CACHE_SIZE:
+                _CACHE.popitem(last=False)
+        if _IN_FLIGHT.get(key) is future:
+            _IN_FLIGHT.pop(key)
+    if error is None:
+        future.set_result(df)
+    else:
+        future.set_exception(error)
+
+
+def fetch_bars(code, start_date, end_date, frequency='d', adjustflag='3'):
+    """
+    获取K线数据（合并并发请求、短期缓存结果），参数与返回值同 bar_store.load_bars
+
+    每次返回独立的DataFrame副本，调用方可以自由修改。
+    """
+    key = bar_key(code, start_date, end_date, frequency, adjustflag)
+    future, owner = claim_bars(key)
+    if not owner:
+        return _copy(future.result())
+
+    try:
+        with _SESSION_LOCK:
+            df = load_bars(code, start_date, end_date, str(frequency), adjustflag)
+    except Exception as e:
+        publish_bars(key, future, error=e)
+        raise
+    publish_bars(key, future, df)
+    return _copy(df)
+
+
+def cache_stats():
+    """缓存命中、合并和实际获取次数"""
+    with _LOCK:
+        return dict(_STATS, size=len(_CACHE))
+
+
+def clear_cache():
+    """清空进程内的K线结果缓存"""
+    with _LOCK:
+        _CACHE.clear()
+
+
+def recent_trading_days(end_date=None, count=UNIVERSE_LOOKBACK):
+    """
+    截至end_date（含）最近的若干个交易日，从近到远排列
+
+    交易日历查询失败时退化为最近的工作日。
+    """
+    end = end_date or datetime.now().strftime('%Y-%m-%d')
+    start = (datetime.strptime(end, '%Y-%m-%d') - timedelta(days=count * 2 + 15)).strftime('%Y-%m-%d')
+    with _SESSION_LOCK:
+        rs = bs.query_trade_dates(start_date=start, end_date=end)
+        columns = read_result_set(rs)
+    if rs.error_code != '0' or not len(columns['calendar_date']):
+        logger.warning(f'查询交易日历失败，按工作日估计: {rs.error_msg}')
+        days = pd.bdate_range(end=end, periods=count)
+        return [day.strftime('%Y-%m-%d') for day in days[::-1]]
+    days = columns['calendar_date'][columns['is_trading_day'] == '1']
+    return np.datetime_as_string(days[::-1][:count].astype('datetime64[D]')).tolist()
+
+
+def _fetch_universe(day):
+    """下载某一交易日的全市场股票列表，没有数据时返回None"""
+    with _SESSION_LOCK:
+        rs = bs.query_all_stock(day=day)
+        columns = read_result_set(rs)
+    if rs.error_code != '0':
+        logger.error(f'查询股票列表失败: {rs.error_msg}')
+        return None
+    if not len(columns['code']):
+        return None
+    return {'day': day, 'columns': {field: column.tolist() for field, column in columns.items()}}
+
+
+def _read_universe():
+    try:
+        with open(UNIVERSE_PATH, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # 旧版本按行保存的快照视为不存在，重新下载
+    return snapshot if 'columns' in snapshot else None
+
+
+def _write_universe(snapshot):
+    tmp_path = f'{UNIVERSE_PATH}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, UNIVERSE_PATH)
+
+
+def get_stock_universe():
+    """
+    获取全市场股票列表（需已登录baostock）
+
+    同一自然日内只下载一次：优先使用进程内缓存，其次使用持久化的快照，
+    最后按交易日历从最近的交易日开始向前查找有数据的一天。
+
+    Returns:
+        DataFrame: 列为 code / tradeStatus / code_name（调用方不应修改），
+            获取失败且没有任何快照时返回None
+    """
+    global _UNIVERSE
+    today = datetime.now().strftime('%Y-%m-%d')
+    with _LOCK:
+        if _UNIVERSE is not None and _UNIVERSE[0] == today:
+            return _UNIVERSE[1]
+
+    with file_lock(UNIVERSE_PATH):
+        snapshot = _read_universe()
+        if snapshot is None or snapshot.get('fetched_on') != today:
+            fresh = None
+            try:
+                trading_days = recent_trading_days(today)
+                if snapshot is not None and trading_days and snapshot.get('day') == trading_days[0]:
+                    # 最近交易日的快照已存在（如周末），不需要重新下载
+                    fresh = snapshot
+                else:
+                    for day in trading_days:
+                        logger.info(f'正在获取全市场股票列表: {day}')
+                        fresh = _fetch_universe(day)
+                        if fresh is not None:
+                            break
+            except Exception as e:
+                logger.error(f'获取全市场股票列表异常: {e}')
+            if fresh is not None:
+                fresh['fetched_on'] = today
+                _write_universe(fresh)
+                snapshot = fresh
+            elif snapshot is not None:
+                logger.warning(f'使用 {snapshot.get("day")} 的股票列表快照')
+
+    if snapshot is None:
+        return None
+    df = pd.DataFrame(snapshot['columns'])
+    df.attrs['day'] = snapshot['day']
+    if snapshot.get('fetched_on') == today:
+        with _LOCK:
+            _UNIVERSE = (today, df)
+    logger.info(f'全市场股票列表: {snapshot["day"]}，共 {len(df)} 只')
+    return df
+
+
+def get_universe_index(universe):
+    """
+    全市场股票名称的相似度索引（按code_name顺序预先编码）
+
+    同一交易日的快照只构建一次，快照的交易日变化后重建。
+
+    Args:
+        universe: get_stock_universe 返回的DataFrame
+
+    Returns:
+        SimilarityIndex: 下标与universe的行号一致
+    """
+    global _UNIVERSE_INDEX
+    day = universe.attrs.get('day')
+    with _LOCK:
+        if _UNIVERSE_INDEX is not None and day is not None and _UNIVERSE_INDEX[0] == day:
+            return _UNIVERSE_INDEX[1]
+    index = SimilarityIndex(universe['code_name'].tolist())
+    if day is not None:
+        with _LOCK:
+            _UNIVERSE_INDEX = (day, index)
+    return index
+
+
+def iter_index_data(index_codes, start_date=None, end_date=None):
+    """
+    逐个产出指数的历史数据，每个指数获取完成后立即产出
+
+    Args:
+        index_codes: 指数代码列表 (如: ['sh.000001', 'sz.399300'])
+        start_date: 开始日期 (如: 2023-01-01)
+        end_date: 结束日期 (如: 2024-01-01)
+
+    Yields:
+        tuple: (指数代码, 指数历史数据)，没有数据的指数不产出
+    """
+    start_date, end_date = default_window(start_date, end_date)
+
+    for index_code in index_codes:
+        try:
+            logger.info(f'正在获取指数数据: {index_code}')
+
+            # 查询指数历史数据（优先使用本地K线缓存）
+            df = fetch_bars(index_code, start_date, end_date)
+
+            if df is None or len(df) == 0:
+                logger.warning(f'⚠️ 指数 {index_code} 没有数据')
+                continue
+
+            # 计算归一化收益率（以第一个交易日为基准）
+            base_price = df['close'].iloc[0]
+            normalized_returns = ((df['close'] / base_price - 1) * 100).tolist()
+
+            logger.info(f'✅ 成功获取指数 {index_code} 数据: {len(df)} 个数据点')
+            yield index_code, {
+                'dates': df['date'].dt.strftime('%Y-%m-%d').tolist(),
+                'prices': df['close'].tolist(),
+                'returns': normalized_returns,
+                'data_points': len(df)
+            }
+
+        except Exception as e:
+            logger.error(f'获取指数数据异常 {index_code}: {str(e)}')
+            continue
+
+
+def get_index_data(index_codes, start_date=None, end_date=None):
+    """
+    获取多个指数的历史数据
+
+    Args:
+        index_codes: 指数代码列表 (如: ['sh.000001', 'sz.399300'])
+        start_date: 开始日期 (如: 2023-01-01)
+        end_date: 结束日期 (如: 2024-01-01)
+
+    Returns:
+        dict: 包含各指数历史数据的字典
+    """
+    return dict(iter_index_data(index_codes, start_date, end_date))
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多资产并行获取 - 进程池，每个子进程维护各自的baostock会话
+
+baostock客户端使用全局socket，不是线程安全的，因此用多进程重叠各资产的网络等待。
+结果顺序与输入顺序一致。
+
+子进程的K线缓存只在子进程内有效，因此请求的合并在父进程中完成：同一请求中重复的资产
+只获取一次，父进程缓存中已有或其他请求正在获取的资产不再提交给进程池，进程池的结果
+写回父进程的缓存（见 data_access.claim_bars / publish_bars）。
+
+子进程的会话与常驻进程的会话一样按 worker.BaostockSession 管理：空闲过久时重新登录，
+查询因会话失效（bar_store.SessionError）失败时重新登录后重试一次；没有数据（停牌、退市、
+区间内无交易）是正常结果，不重新登录。进程池空闲超过 SESSION_IDLE_SECONDS 后整体重建，
+子进程由 multiprocessing 以 os._exit 退出，不会执行 atexit 注册的登出。
+"""
+import os
+import sys
+import time
+import atexit
+import functools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from data_access import fetch_bars, bar_key, claim_bars, publish_bars
+from bar_store import SessionError
+from log_utils import get_logger
+from worker import BaostockSession, SESSION_IDLE_SECONDS
+
+logger = get_logger('fetch_pool')
+
+# 默认并发进程数，可通过环境变量调整
+FETCH_CONCURRENCY = int(os.environ.get('BAOSTOCK_FETCH_CONCURRENCY', '4'))
+
+_POOL = None
+_POOL_SIZE = 0
+_POOL_LAST_USED = 0.0
+_SESSION = None
+
+
+def _init_worker():
+    """子进程初始化：诊断输出转到stderr，并登录独立的baostock会话，登录失败时抛出异常"""
+    global _SESSION
+    sys.stdout = sys.stderr
+    _SESSION = BaostockSession()
+    if not _SESSION.login():
+        raise RuntimeError('子进程登录baostock失败')
+
+
+def _fetch_one(args):
+    code, start_date, end_date, adjustflag = args
+    try:
+        return fetch_bars(code, start_date, end_date, 'd', adjustflag)
+    except Exception as e:
+        logger.error(f'获取K线数据异常 {code}: {str(e)}')
+        return None
+
+
+def _fetch_in_worker(args):
+    """子进程中获取一个资产：确保会话可用，会话失效时重新登录并重试一次"""
+    code, start_date, end_date, adjustflag = args
+    if not _SESSION.ensure():
+        logger.error(f'子进程登录baostock失败，跳过 {code}')
+        return None
+    try:
+        return fetch_bars(code, start_date, end_date, 'd', adjustflag)
+    except SessionError as e:
+        logger.warning(f'子进程baostock会话失效，重新登录后重试 {code}: {e}')
+    except Exception as e:
+        logger.error(f'获取K线数据异常 {code}: {str(e)}')
+        return None
+    _SESSION.logout()
+    if not _SESSION.login():
+        logger.error(f'子进程重新登录baostock失败，跳过 {code}')
+        return None
+    return _fetch_one(args)
+
+
+def _publish(key, future, pool_future):
+    """进程池任务完成时把结果写回父进程的缓存，等待同一资产的请求随之返回"""
+    try:
+        df = pool_future.result()
+    except Exception as e:
+        publish_bars(key, future, error=e)
+    else:
+        publish_bars(key, future, df)
+
+
+def _get_pool(max_workers):
+    """获取（必要时创建）常驻进程池，常驻进程模式下可跨请求复用"""
+    global _POOL, _POOL_SIZE
+    idle = time.time() - _POOL_LAST_USED > SESSION_IDLE_SECONDS
+    if _POOL is not None and (_POOL_SIZE != max_workers or idle):
+        shutdown_pool()
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+        _POOL_SIZE = max_workers
+    _touch_pool()
+    return _POOL
+
+
+def _touch_pool():
+    global _POOL_LAST_USED
+    _POOL_LAST_USED = time.time()
+
+
+def shutdown_pool():
+    """关闭进程池"""
+    global _POOL, _POOL_SIZE
+    if _POOL is not None:
+        _POOL.shutdown(wait=True)
+    _POOL = None
+    _POOL_SIZE = 0
+
+
+atexit.register(shutdown_pool)
+
+
+def iter_bars_parallel(codes, start_date, end_date, max_workers=None, adjustflag='3'):
+    """
+    并行获取多个证券的K线数据，按完成顺序逐个返回
+
+    Args:
+        codes: 证券代码列表
+        start_date: 开始日期 (如: 2023-01-01)
+        end_date: 结束日期 (如: 2024-01-01)
+        max_workers: 最大并发进程数，默认FETCH_CONCURRENCY；为1时在当前进程顺序获取
+        adjustflag: 复权类型（'1' 后复权，'2' 前复权，'3' 不复权）
+
+    Yields:
+        tuple: (在codes中的下标, DataFrame)，获取失败时DataFrame为None
+    """
+    if max_workers is None:
+        max_workers = FETCH_CONCURRENCY
+    tasks = [(code, start_date, end_date, str(adjustflag)) for code in codes]
+
+    # 单个资产或禁用并发时直接使用当前进程的会话
+    if max_workers <= 1 or len(tasks) <= 1:
+        for i, task in enumerate(tasks):
+            yield i, _fetch_one(task)
+        return
+
+    # 重复的资产只获取一次
+    positions = {}
+    for i, task in enumerate(tasks):
+        positions.setdefault(task, []).append(i)
+
+    waiting = {}
+    submitted = set()
+    for task in positions:
+        key = bar_key(task[0], start_date, end_date, 'd', task[3])
+        future, owner = claim_bars(key)
+        if owner:
+            submitted.add(future)
+            try:
+                pool = _get_pool(max_workers)
+                pool.submit(_fetch_in_worker, task).add_done_callback(
+                    functools.partial(_publish, key, future))
+            except Exception as e:
+                publish_bars(key, future, error=e)
+        waiting[future] = task
+
+    for future in as_completed(waiting):
+        task = waiting[future]
+        try:
+            df = future.result()
+        except Exception as e:
+            logger.error(f'并行获取失败，改为顺序获取 {task[0]}: {str(e)}')
+            if future in submitted:
+                shutdown_pool()
+            df = _fetch_one(task)
+        _touch_pool()
+        for i in positions[task]:
+            yield i, None if df is None else df.copy()
+
+
+def fetch_bars_parallel(codes, start_date, end_date, max_workers=None, adjustflag='3'):
+    """
+    并行获取多个证券的K线数据
+
+    Returns:
+        list: 与codes顺序一致的DataFrame列表，获取失败的位置为None
+    """
+    results = [None] * len(codes)
+    for i, df in iter_bars_parallel(codes, start_date, end_date, max_workers, adjustflag):
+        results[i] = df
+    return results
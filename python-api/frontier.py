@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+有效前沿 - 基于期望收益率和协方差矩阵求解整条有效前沿
+
+输入为 generate_portfolio_data 输出的 expectedReturns / covarianceMatrix：
+    允许卖空（只有预算约束）时使用闭式解；
+    有权重上下限（默认只做多）时使用临界线算法（Critical Line Algorithm），
+    一次求出所有拐点组合，拐点之间的前沿是相邻拐点的线性组合，
+    不再对每个目标收益率单独冷启动求解。
+
+输出最小方差组合、切点组合（最大夏普比率）和资本市场线。
+"""
+import numpy as np
+
+from metrics import RISK_FREE_RATE
+
+DEFAULT_POINTS = 100
+# 数值误差容忍度
+TOLERANCE = 1e-10
+
+
+def _inverse(matrix):
+    """矩阵求逆，奇异时退化为伪逆"""
+    try:
+        return np.linalg.inv(matrix)
+    except np.linalg.LinAlgError:
+        return np.linalg.pinv(matrix)
+
+
+def _portfolio_point(weights, mean, cov, risk_free_rate):
+    """组合的收益率、波动率、夏普比率和权重"""
+    ret = float(weights @ mean)
+    volatility = float(np.sqrt(max(weights @ cov @ weights, 0.0)))
+    sharpe = (ret - risk_free_rate) / volatility if volatility > 0 else 0.0
+    return {
+        'return': ret,
+        'volatility': volatility,
+        'sharpeRatio': sharpe,
+        'weights': weights
+    }
+
+
+def _degenerate(c, first, second):
+    """
+    c = second - first 是否只是舍入误差：自由资产的期望收益率都相等时c理论上为0，
+    此时自由资产权重不随lambda变化，对应的事件不存在
+    """
+    return np.abs(c) <= 1e-9 * (np.abs(first) + np.abs(second))
+
+
+class CriticalLine:
+    """
+    临界线算法求带上下限约束的均值-方差有效前沿拐点
+
+    Args:
+        mean: 期望收益率 (N)
+        cov: 协方差矩阵 (N x N)
+        lower: 权重下限 (N)
+        upper: 权重上限 (N)
+    """
+
+    def __init__(self, mean, cov, lower, upper):
+        self.mean = mean
+        self.cov = cov
+        self.lower = lower
+        self.upper = upper
+        self.weights = []
+        self.lambdas = []
+
+    def _initial(self):
+        """
+        从期望收益率最高的资产开始，依次把资产推到上限，直到权重之和达到1
+
+        最后一个资产与其他资产期望收益率相等时，这些资产的任意组合收益率都最高，
+        lambda趋于无穷时的拐点是其中方差最小的组合，在这组资产内求最小方差组合作为起点
+        """
+        order = np.argsort(-self.mean, kind='stable')
+        w = self.lower.copy()
+        for i in order:
+            w[i] = self.upper[i]
+            excess = w.sum() - 1
+            if excess >= 0:
+                w[i] -= excess
+                break
+        else:
+            raise ValueError('权重上限之和小于1，约束不可行')
+        scale = max(1.0, np.abs(self.mean).max())
+        tied = np.flatnonzero(np.abs(self.mean - self.mean[i]) <= TOLERANCE * scale)
+        if len(tied) == 1:
+            return [int(i)], w
+        return self._min_variance([int(i)], w, movable=tied)
+
+    def _matrices(self, free, w):
+        """自由资产的协方差子矩阵、与边界资产的协方差、期望收益率和边界资产权重"""
+        bounded = [i for i in range(len(self.mean)) if i not in free]
+        cov_f = self.cov[np.ix_(free, free)]
+        cov_fb = self.cov[np.ix_(free, bounded)]
+        return cov_f, cov_fb, self.mean[free], w[bounded]
+
+    @staticmethod
+    def _free_weights(cov_f_inv, cov_fb, mean_f, w_b, lam):
+        """自由资产在给定lambda下的权重"""
+        ones_f = np.ones(len(mean_f))
+        g1 = ones_f @ cov_f_inv @ mean_f
+        g2 = ones_f @ cov_f_inv @ ones_f
+        if len(w_b) == 0:
+            g = -lam * g1 / g2 + 1 / g2
+            w1 = np.zeros(len(mean_f))
+        else:
+            w1 = cov_f_inv @ cov_fb @ w_b
+            g = -lam * g1 / g2 + (1 - w_b.sum() + ones_f @ w1) / g2
+        return -w1 + g * (cov_f_inv @ ones_f) + lam * (cov_f_inv @ mean_f)
+
+    def _bound_lambdas(self, free, w):
+        """
+        每个自由资产到达边界时的lambda（向量化），返回 (lambda数组, 对应边界)
+
+        c为0的资产无法到达边界，lambda记为NaN
+        """
+        cov_f, cov_fb, mean_f, w_b = self._matrices(free, w)
+        inv = _inverse(cov_f)
+        ones_f = np.ones(len(free))
+        c4 = inv @ ones_f
+        c2 = inv @ mean_f
+        c1 = ones_f @ c4
+        c3 = ones_f @ c2
+        c = -c1 * c2 + c3 * c4
+        bounds = np.where(c > 0, self.upper[free], self.lower[free])
+        l3 = inv @ (cov_fb @ w_b) if len(w_b) else np.zeros(len(free))
+        l2 = l3.sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lambdas = ((1 - w_b.sum() + l2) * c4 - c1 * (bounds + l3)) / c
+        lambdas[_degenerate(c, c1 * c2, c3 * c4)] = np.nan
+        return lambdas, bounds
+
+    def _release_lambdas(self, free, w):
+        """
+        每个边界资产加入自由资产集合时的lambda（向量化）
+
+        利用分块求逆：在自由资产协方差逆矩阵上加一行一列，对所有候选资产一次性计算，
+        返回 (候选资产下标数组, lambda数组)，无法释放的资产lambda为NaN
+        """
+        n_assets = len(self.mean)
+        mask = np.ones(n_assets, dtype=bool)
+        mask[free] = False
+        bounded = np.flatnonzero(mask)
+        inv = _inverse(self.cov[np.ix_(free, free)])
+        ones_f = np.ones(len(free))
+        mean_f = self.mean[free]
+        w_b = w[bounded]
+        # s_k = sum_{j in B} cov[k, j] w_j
+        s = self.cov[:, bounded] @ w_b
+
+        cross = self.cov[np.ix_(free, bounded)]              # F x B，每列为候选资产的 b
+        u = inv @ cross                                        # F x B
+        schur = self.cov[bounded, bounded] - np.einsum('fb,fb->b', cross, u)
+        u_sum = u.sum(axis=0)
+        inv_ones = inv @ ones_f
+        inv_mean = inv @ mean_f
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_mean = (u.T @ mean_f - self.mean[bounded]) / schur
+            t_ones = (u_sum - 1) / schur
+            c1 = ones_f @ inv_ones + (u_sum - 1) * t_ones
+            c3 = ones_f @ inv_mean + (u_sum - 1) * t_mean
+            c2 = -t_mean
+            c4 = -t_ones
+            c = -c1 * c2 + c3 * c4
+
+            # 候选资产i加入后其余边界资产对应的 y = cov[F', B'] w_B'
+            y_free = s[free][:, None] - cross * w_b[None, :]
+            y_own = s[bounded] - self.cov[bounded, bounded] * w_b
+            t_y = (np.einsum('fb,fb->b', u, y_free) - y_own) / schur
+            l3 = -t_y
+            l2 = inv_ones @ y_free + (u_sum - 1) * t_y
+            l1 = w_b.sum() - w_b
+            lambdas = ((1 - l1 + l2) * c4 - c1 * (w_b + l3)) / c
+        lambdas[_degenerate(c, c1 * c2, c3 * c4) | (np.abs(schur) < TOLERANCE)] = np.nan
+        return bounded, lambdas
+
+    def solve(self):
+        """求出所有拐点，返回 (权重矩阵 K x N, lambda数组)，按收益率从高到低排列"""
+        n_assets = len(self.mean)
+        free, w = self._initial()
+        self.weights.append(w)
+        self.lambdas.append(None)
+
+        # 上一步改变状态的资产；多个事件发生在同一lambda时允许相等，
+        # 但该资产只能在严格更小的lambda处再次改变状态（例如从上限一路降到下限），避免原地循环
+        last_changed = None
+        while True:
+            previous = self.lambdas[-1]
+            current = self.weights[-1]
+            limit = None if previous is None else previous + TOLERANCE * max(1.0, abs(previous))
+            strict = None if previous is None else previous - TOLERANCE * max(1.0, abs(previous))
+
+            # 情况a：某个自由资产到达边界
+            lambda_in, i_in, bound_in = None, None, None
+            if len(free) > 1:
+                lambdas, bounds = self._bound_lambdas(free, current)
+                for j, i in enumerate(free):
+                    lam = lambdas[j]
+                    if np.isnan(lam):
+                        continue
+                    bound = strict if i == last_changed else limit
+                    if (bound is None or lam < bound) and (lambda_in is None or lam > lambda_in):
+                        lambda_in, i_in, bound_in = float(lam), i, bounds[j]
+
+            # 情况b：某个边界资产变为自由资产
+            lambda_out, i_out = None, None
+            if len(free) < n_assets:
+                candidates, lambdas = self._release_lambdas(free, current)
+                for i, lam in zip(candidates, lambdas):
+                    if np.isnan(lam):
+                        continue
+                    bound = strict if i == last_changed else limit
+                    if (bound is None or lam < bound) and (lambda_out is None or lam > lambda_out):
+                        lambda_out, i_out = float(lam), int(i)
+
+            w = current.copy()
+            if (lambda_in is None or lambda_in < 0) and (lambda_out is None or lambda_out < 0):
+                # 没有新的拐点：最后求最小方差组合 (lambda = 0)
+                lam = 0.0
+            elif lambda_in is not None and (lambda_out is None or lambda_in > lambda_out):
+                lam = min(lambda_in, previous) if previous is not None else lambda_in
+                free.remove(i_in)
+                w[i_in] = bound_in
+                last_changed = i_in
+            else:
+                lam = min(lambda_out, previous) if previous is not None else lambda_out
+                free.append(i_out)
+                last_changed = i_out
+
+            if lam == 0.0:
+                free, w = self._min_variance(free, w)
+            else:
+                cov_f, cov_fb, mean_f, w_b = self._matrices(free, w)
+                w[free] = self._free_weights(_inverse(cov_f), cov_fb, mean_f, w_b, lam)
+            self.weights.append(w)
+            self.lambdas.append(lam)
+            if lam == 0.0:
+                break
+
+        return self._purge()
+
+    def _min_variance(self, free, w, movable=None, max_iter=None):
+        """
+        从可行组合w出发，用原始积极集法求最小方差组合，返回 (自由资产, 权重)
+
+        期望收益率退化（如相等）时临界线在lambda > 0处不再产生新拐点，
+        最小方差组合可能需要释放更多边界资产，这里继续迭代直到满足KKT条件。
+        movable给出时只有其中的资产可以被释放，其余资产固定在当前权重上。
+        """
+        n_assets = len(self.mean)
+        movable = range(n_assets) if movable is None else movable
+        max_iter = max_iter or 4 * n_assets + 10
+        zeros = np.zeros(n_assets)
+        for _ in range(max_iter):
+            cov_f, cov_fb, _, w_b = self._matrices(free, w)
+            target = self._free_weights(_inverse(cov_f), cov_fb, zeros[free], w_b, 0.0)
+            step = target - w[free]
+
+            # 最大可行步长，遇到边界时该资产固定在边界上
+            ratio, blocking, bound = 1.0, None, None
+            for j, i in enumerate(free):
+                if step[j] < -TOLERANCE:
+                    limit = (self.lower[i] - w[i]) / step[j]
+                    edge = self.lower[i]
+                elif step[j] > TOLERANCE:
+                    limit = (self.upper[i] - w[i]) / step[j]
+                    edge = self.upper[i]
+                else:
+                    continue
+                if limit < ratio:
+                    ratio, blocking, bound = limit, i, edge
+            w = w.copy()
+            w[free] = w[free] + max(ratio, 0.0) * step
+            if blocking is not None:
+                w[blocking] = bound
+                free = [i for i in free if i != blocking]
+                continue
+
+            # 检查边界资产的KKT条件，违反最严重的资产释放为自由资产
+            gradient = self.cov @ w
+            gamma = gradient[free].mean()
+            violation, releasing = TOLERANCE, None
+            for i in movable:
+                if i in free:
+                    continue
+                if w[i] <= self.lower[i] + TOLERANCE and self.lower[i] < self.upper[i]:
+                    amount = gamma - gradient[i]
+                elif w[i] >= self.upper[i] - TOLERANCE and self.lower[i] < self.upper[i]:
+                    amount = gradient[i] - gamma
+                else:
+                    continue
+                if amount > violation:
+                    violation, releasing = amount, i
+            if releasing is None:
+                break
+            free = free + [int(releasing)]
+        return free, w
+
+    def _purge(self):
+        """去掉数值误差导致不满足约束的拐点，以及重复或收益率不单调递减的多余拐点"""
+        weights = []
+        lambdas = []
+        for w, lam in zip(self.weights, self.lambdas):
+            if abs(w.sum() - 1) > 1e-8:
+                continue
+            if np.any(w < self.lower - 1e-8) or np.any(w > self.upper + 1e-8):
+                continue
+            ret = w @ self.mean
+            if weights and (ret > weights[-1] @ self.mean + TOLERANCE
+                            or np.allclose(w, weights[-1], atol=1e-12)):
+                continue
+            weights.append(w)
+            lambdas.append(np.inf if lam is None else lam)
+        return np.array(weights), np.array(lambdas)
+
+
+def _segment_max_sharpe(w0, w1, mean, cov, risk_free_rate):
+    """
+    在线段 w(a) = w0 + a (w1 - w0), a in [0, 1] 上求夏普比率最大的点
+
+    收益率关于a线性、方差关于a二次，夏普比率的驻点有闭式解
+    """
+    d = w1 - w0
+    r0 = w0 @ mean - risk_free_rate
+    r1 = d @ mean
+    v0 = w0 @ cov @ w0
+    c = w0 @ cov @ d
+    v2 = d @ cov @ d
+    candidates = [0.0, 1.0]
+    denominator = r1 * c - r0 * v2
+    if abs(denominator) > TOLERANCE:
+        a = (r0 * c - r1 * v0) / denominator
+        if 0.0 < a < 1.0:
+            candidates.append(a)
+    best = None
+    for a in candidates:
+        w = w0 + a * d
+        volatility = np.sqrt(max(w @ cov @ w, 0.0))
+        if volatility <= 0:
+            continue
+        sharpe = (w @ mean - risk_free_rate) / volatility
+        if best is None or sharpe > best[0]:
+            best = (sharpe, w)
+    return best
+
+
+def _bounds(n_assets, long_only, bounds):
+    if bounds is not None:
+        bounds = np.asarray(bounds, dtype=np.float64)
+        if bounds.shape != (n_assets, 2):
+            raise ValueError('权重上下限须为每个资产一个 [下限, 上限]')
+        lower, upper = bounds[:, 0].copy(), bounds[:, 1].copy()
+    elif long_only:
+        lower, upper = np.zeros(n_assets), np.ones(n_assets)
+    else:
+        return None, None
+    if np.any(lower > upper) or lower.sum() > 1 + TOLERANCE or upper.sum() < 1 - TOLERANCE:
+        raise ValueError('权重上下限约束不可行')
+    return lower, upper
+
+
+def _closed_form(mean, cov, risk_free_rate, n_points):
+    """只有预算约束（允许卖空）时的闭式有效前沿"""
+    inv = _inverse(cov)
+    ones = np.ones(len(mean))
+    inv_ones = inv @ ones
+    inv_mean = inv @ mean
+    a = ones @ inv_mean
+    b = mean @ inv_mean
+    c = ones @ inv_ones
+    d = b * c - a * a
+
+    min_variance = inv_ones / c
+    excess = inv @ (mean - risk_free_rate)
+    if abs(ones @ excess) > TOLERANCE and a / c > risk_free_rate:
+        tangency = excess / (ones @ excess)
+    else:
+        # 无风险利率不低于最小方差组合收益率时不存在切点组合
+        tangency = None
+
+    # 前沿上收益率为r的组合权重 w(r) = g + h r
+    g = (b * inv_ones - a * inv_mean) / d
+    h = (c * inv_mean - a * inv_ones) / d
+    r_min = a / c
+    r_max = max(mean.max(), r_min) if tangency is None else max(mean.max(), tangency @ mean)
+    targets = np.linspace(r_min, r_max, n_points)
+    weights = g[None, :] + targets[:, None] * h[None, :]
+    return min_variance, tangency, weights
+
+
+def _critical_line(mean, cov, lower, upper, risk_free_rate, n_points):
+    """带上下限约束时由临界线算法的拐点构造有效前沿"""
+    turning_points, _ = CriticalLine(mean, cov, lower, upper).solve()
+    min_variance = turning_points[-1]
+
+    tangency = None
+    best_sharpe = None
+    for k in range(len(turning_points) - 1):
+        best = _segment_max_sharpe(turning_points[k + 1], turning_points[k], mean, cov, risk_free_rate)
+        if best is not None and (best_sharpe is None or best[0] > best_sharpe):
+            best_sharpe, tangency = best
+    if len(turning_points) == 1:
+        tangency = turning_points[0]
+    if tangency is not None and tangency @ mean <= risk_free_rate:
+        # 前沿收益率不高于无风险利率时不存在切点组合
+        tangency = None
+
+    # 按目标收益率在相邻拐点之间线性插值（拐点收益率从高到低排列）
+    point_returns = turning_points @ mean
+    targets = np.linspace(point_returns[-1], point_returns[0], n_points)
+    ascending = point_returns[::-1]
+    ascending_points = turning_points[::-1]
+    upper_index = np.clip(np.searchsorted(ascending, targets, side='left'), 1, max(len(ascending) - 1, 1))
+    if len(ascending) == 1:
+        weights = np.repeat(ascending_points[:1], n_points, axis=0)
+    else:
+        lo = ascending[upper_index - 1]
+        hi = ascending[upper_index]
+        span = np.where(hi - lo > TOLERANCE, hi - lo, 1.0)
+        alpha = np.clip((targets - lo) / span, 0.0, 1.0)
+        weights = (
+            (1 - alpha)[:, None] * ascending_points[upper_index - 1]
+            + alpha[:, None] * ascending_points[upper_index]
+        )
+    return min_variance, tangency, weights, turning_points
+
+
+def efficient_frontier(expected_returns, covariance_matrix, risk_free_rate=RISK_FREE_RATE,
+                       n_points=DEFAULT_POINTS, long_only=True, bounds=None):
+    """
+    求解有效前沿、最小方差组合、切点组合和资本市场线
+
+    Args:
+        expected_returns: 年化期望收益率 (N)
+        covariance_matrix: 年化协方差矩阵 (N x N)
+        risk_free_rate: 年化无风险利率
+        n_points: 前沿上的采样点数
+        long_only: 是否只做多（bounds为None时生效），False时允许卖空并使用闭式解
+        bounds: 可选的每个资产权重 [下限, 上限]，给出时使用临界线算法
+
+    Returns:
+        dict: method/frontier/minVariance/tangency/capitalMarketLine/turningPoints
+    """
+    mean = np.asarray(expected_returns, dtype=np.float64)
+    cov = np.asarray(covariance_matrix, dtype=np.float64)
+    n_assets = len(mean)
+    if n_assets == 0 or cov.shape != (n_assets, n_assets):
+        raise ValueError('期望收益率与协方差矩阵维度不一致')
+    n_points = max(int(n_points), 2)
+
+    lower, upper = _bounds(n_assets, long_only, bounds)
+    if lower is None:
+        method = 'closed_form'
+        min_variance, tangency, weights = _closed_form(mean, cov, risk_free_rate, n_points)
+        turning_points = np.empty((0, n_assets))
+    else:
+        method = 'critical_line'
+        min_variance, tangency, weights, turning_points = _critical_line(
+            mean, cov, lower, upper, risk_free_rate, n_points
+        )
+
+    returns = weights @ mean
+    volatilities = np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', weights, cov, weights), 0.0))
+
+    min_variance_point = _portfolio_point(min_variance, mean, cov, risk_free_rate)
+    tangency_point = None
+    capital_market_line = None
+    if tangency is not None:
+        tangency_point = _portfolio_point(tangency, mean, cov, risk_free_rate)
+        slope = tangency_point['sharpeRatio']
+        cml_volatilities = np.linspace(0.0, max(volatilities.max(), tangency_point['volatility']), n_points)
+        capital_market_line = {
+            'riskFreeRate': risk_free_rate,
+            'slope': slope,
+            'volatilities': cml_volatilities,
+            'returns': risk_free_rate + slope * cml_volatilities
+        }
+
+    return {
+        'method': method,
+        'frontier': {
+            'returns': returns,
+            'volatilities': volatilities,
+            'weights': weights
+        },
+        'minVariance': min_variance_point,
+        'tangency': tangency_point,
+        'capitalMarketLine': capital_market_line,
+        'turningPoints': turning_points
+    }
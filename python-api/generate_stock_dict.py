@@ -5,11 +5,13 @@
 从baostock获取完整的股票列表，生成股票名称到代码的映射字典
 """
 
-import baostock as bs
-import pandas as pd
+import os
+import sys
 import json
-import pickle
+import argparse
 from datetime import datetime
+import baostock as bs
+from stock_dict import STOCK_DICT_PATH, StockDictionary, write_stock_dictionary, record_refresh_result
 
 def generate_stock_dict():
     """生成完整的股票代码字典"""
@@ -18,7 +20,7 @@ def generate_stock_dict():
     # 登陆系统
     lg = bs.login()
     if lg.error_code != '0':
-        print(f'登录失败: {lg.error_msg}')
+        print(f'登录失败: {lg.error_msg}', file=sys.stderr)
         return None
     
     print('登录成功！正在获取股票列表...')
@@ -30,18 +32,11 @@ def generate_stock_dict():
         
         print(f'共获取到 {len(stock_df)} 支股票')
         
-        # 生成股票名称到代码的映射字典
-        name_to_code_dict = {}
-        code_to_name_dict = {}
-        
-        for index, row in stock_df.iterrows():
-            code = row["code"]
-            name = row["code_name"]
-            
-            # 股票名称到代码的映射
-            name_to_code_dict[name] = code
-            # 股票代码到名称的映射
-            code_to_name_dict[code] = name
+        # 生成股票名称与代码的双向映射（整列转换，不逐行遍历）
+        codes = stock_df["code"].tolist()
+        names = stock_df["code_name"].tolist()
+        name_to_code_dict = dict(zip(names, codes))
+        code_to_name_dict = dict(zip(codes, names))
         
         # 创建完整的字典数据
         complete_dict = {
@@ -55,66 +50,56 @@ def generate_stock_dict():
         return complete_dict
         
     except Exception as e:
-        print(f"获取股票数据时出错: {e}")
+        print(f"获取股票数据时出错: {e}", file=sys.stderr)
         return None
     finally:
         # 登出系统
         bs.logout()
         print("已登出baostock系统")
 
-def save_stock_dict(stock_dict, format_type='json'):
-    """保存股票字典到文件"""
+def save_stock_dict(stock_dict, output=STOCK_DICT_PATH):
+    """
+    保存股票字典：二进制字典（运行时读取）和紧凑JSON（便于查看和重建）
+
+    两个文件都先写临时文件再原子替换，正在读取的进程不会读到半个文件。
+    """
     if stock_dict is None:
         print("股票字典为空，无法保存")
         return False
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
     try:
-        if format_type == 'json':
-            # 保存为JSON格式
-            filename = f"stock_dict_{timestamp}.json"
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(stock_dict, f, ensure_ascii=False, indent=2)
-            print(f"股票字典已保存为JSON格式: {filename}")
-            
-            # 同时保存一个最新版本
-            latest_filename = "stock_dict_latest.json"
-            with open(latest_filename, 'w', encoding='utf-8') as f:
-                json.dump(stock_dict, f, ensure_ascii=False, indent=2)
-            print(f"最新版本已保存: {latest_filename}")
-            
-        elif format_type == 'pickle':
-            # 保存为pickle格式（更快的读取速度）
-            filename = f"stock_dict_{timestamp}.pkl"
-            with open(filename, 'wb') as f:
-                pickle.dump(stock_dict, f)
-            print(f"股票字典已保存为pickle格式: {filename}")
-            
-            # 同时保存一个最新版本
-            latest_filename = "stock_dict_latest.pkl"
-            with open(latest_filename, 'wb') as f:
-                pickle.dump(stock_dict, f)
-            print(f"最新版本已保存: {latest_filename}")
+        write_stock_dictionary(stock_dict, output)
+        print(f"二进制股票字典已保存: {output}")
+        
+        json_path = os.path.join(os.path.dirname(os.path.abspath(output)), "stock_dict_latest.json")
+        tmp_path = f"{json_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stock_dict, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, json_path)
+        print(f"JSON股票字典已保存: {json_path}")
         
         return True
         
     except Exception as e:
-        print(f"保存股票字典时出错: {e}")
+        print(f"保存股票字典时出错: {e}", file=sys.stderr)
         return False
 
-def load_stock_dict(filename=None, format_type='json'):
-    """从文件加载股票字典"""
-    if filename is None:
-        filename = f"stock_dict_latest.{format_type if format_type == 'json' else 'pkl'}"
-    
+def load_stock_dict(filename=STOCK_DICT_PATH):
+    """从文件加载股票字典（支持二进制字典和JSON）"""
     try:
-        if format_type == 'json':
+        if filename.endswith('.json'):
             with open(filename, 'r', encoding='utf-8') as f:
                 stock_dict = json.load(f)
-        elif format_type == 'pickle':
-            with open(filename, 'rb') as f:
-                stock_dict = pickle.load(f)
+        else:
+            dictionary = StockDictionary(filename)
+            name_to_code = dictionary.name_to_code()
+            stock_dict = {
+                "name_to_code": name_to_code,
+                "code_to_name": {code: name for name, code in name_to_code.items()},
+                "total_count": dictionary.total_count,
+                "generated_time": dictionary.generated_time,
+                "data_source": dictionary.data_source
+            }
         
         print(f"成功加载股票字典: {filename}")
         print(f"包含 {stock_dict.get('total_count', 0)} 支股票")
@@ -173,6 +158,11 @@ def print_sample_data(stock_dict, sample_size=20):
         print(f"{code}: {name}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='股票代码字典生成器')
+    parser.add_argument('--output', default=STOCK_DICT_PATH, help='二进制字典输出路径')
+    parser.add_argument('--quiet', action='store_true', help='只生成字典，不打印样本和搜索测试')
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("股票代码字典生成器")
     print("=" * 60)
@@ -180,11 +170,14 @@ if __name__ == "__main__":
     # 生成股票字典
     stock_dict = generate_stock_dict()
     
-    if stock_dict:
-        # 保存为JSON和pickle两种格式
-        save_stock_dict(stock_dict, 'json')
-        save_stock_dict(stock_dict, 'pickle')
-        
+    saved = bool(stock_dict) and save_stock_dict(stock_dict, args.output)
+    # 记录结果供后台刷新退避使用；失败时以非零退出码结束
+    record_refresh_result(saved, args.output)
+    if not saved:
+        print("股票字典生成失败", file=sys.stderr)
+        sys.exit(1)
+    
+    if stock_dict and not args.quiet:
         # 打印样本数据
         print_sample_data(stock_dict)
         
@@ -5,107 +5,61 @@
 """
 import sys
 import json
-import numpy as np
-import pandas as pd
-import baostock as bs
-from datetime import datetime, timedelta
 import warnings
+import contextlib
+from data_access import login_baostock, logout_baostock, get_index_data, iter_index_data
 
 warnings.filterwarnings('ignore')
 
-def login_baostock():
-    """登录baostock系统"""
-    try:
-        lg = bs.login()
-        if lg.error_code != '0':
-            return False
-        return True
-    except Exception as e:
-        return False
-
-def logout_baostock():
-    """登出baostock系统"""
-    try:
-        bs.logout()
-    except Exception as e:
-        pass
+def build_index_response(index_data):
+    """将指数数据转换为输出给API的JSON对象"""
+    if not index_data:
+        return {
+            'success': False,
+            'error': '没有获取到任何指数数据',
+            'data': {}
+        }
+    return {
+        'success': True,
+        'data': index_data,
+        'message': f'成功获取 {len(index_data)} 个指数的数据'
+    }
 
-def get_index_data(index_codes, start_date=None, end_date=None):
+def stream_index_frames(index_codes, emit, start_date=None, end_date=None):
     """
-    获取多个指数的历史数据
-    
-    Args:
-        index_codes: 指数代码列表 (如: ['sh.000001', 'sz.399300'])
-        start_date: 开始日期 (如: 2023-01-01)
-        end_date: 结束日期 (如: 2024-01-01)
-    
-    Returns:
-        dict: 包含各指数历史数据的字典
+    流式输出指数数据：每个指数完成后调用 emit('index', {'code', 'data'})，返回最终结果
+
+    各指数数据已逐个输出，最终结果中只保留获取成功的指数代码。
     """
-    if not start_date:
-        start_date = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d')
-    if not end_date:
-        end_date = datetime.now().strftime('%Y-%m-%d')
-    
-    index_data = {}
-    
-    for index_code in index_codes:
-        try:
-            # 查询指数历史数据
-            rs = bs.query_history_k_data_plus(
-                index_code,
-                "date,code,open,high,low,close,preclose,volume,amount,pctChg",
-                start_date=start_date, 
-                end_date=end_date, 
-                frequency="d"
+    codes = []
+    for index_code, data in iter_index_data(index_codes, start_date, end_date):
+        emit('index', {'code': index_code, 'data': data})
+        codes.append(index_code)
+    if not codes:
+        return build_index_response({})
+    return {
+        'success': True,
+        'codes': codes,
+        'message': f'成功获取 {len(codes)} 个指数的数据'
+    }
+
+def run_worker():
+    """常驻进程模式：保持baostock会话，循环处理指数数据请求"""
+    from worker import serve
+
+    def handle_index(params, emit):
+        index_codes = params.get('indexCodes')
+        if not isinstance(index_codes, list) or len(index_codes) == 0:
+            return {'success': False, 'error': '指数代码列表不能为空'}
+        if params.get('stream'):
+            return stream_index_frames(
+                index_codes, emit, params.get('startDate'), params.get('endDate')
             )
-            
-            if rs.error_code != '0':
-                continue
-            
-            # 获取数据列表
-            data_list = []
-            while (rs.error_code == '0') & rs.next():
-                data_list.append(rs.get_row_data())
-            
-            if not data_list:
-                continue
-            
-            # 转换为DataFrame
-            df = pd.DataFrame(data_list, columns=rs.fields)
-            
-            # 数据类型转换
-            df['date'] = pd.to_datetime(df['date'])
-            numeric_columns = ['open', 'high', 'low', 'close', 'preclose', 'volume', 'amount', 'pctChg']
-            for col in numeric_columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # 去除空值
-            df = df.dropna()
-            
-            # 按日期排序
-            df = df.sort_values('date').reset_index(drop=True)
-            
-            if len(df) > 0:
-                # 计算归一化收益率（以第一个交易日为基准）
-                base_price = df['close'].iloc[0]
-                normalized_returns = ((df['close'] / base_price - 1) * 100).tolist()
-                
-                index_data[index_code] = {
-                    'dates': df['date'].dt.strftime('%Y-%m-%d').tolist(),
-                    'prices': df['close'].tolist(),
-                    'returns': normalized_returns,
-                    'data_points': len(df)
-                }
-                
-                pass
-            else:
-                pass
-                
-        except Exception as e:
-            continue
-    
-    return index_data
+        return build_index_response(get_index_data(
+            index_codes, params.get('startDate'), params.get('endDate')
+        ))
+
+    serve({'get_index_data': handle_index})
 
 def main():
     """主函数 - 处理命令行参数"""
@@ -117,6 +71,10 @@ def main():
             }, ensure_ascii=False))
             sys.exit(1)
         
+        if sys.argv[1] == '--worker':
+            run_worker()
+            return
+        
         # 解析JSON参数
         index_codes_json = sys.argv[1]
         index_codes = json.loads(index_codes_json)
@@ -128,8 +86,10 @@ def main():
             }, ensure_ascii=False))
             sys.exit(1)
         
-        # 登录baostock
-        if not login_baostock():
+        # 登录baostock（baostock的登录/登出提示写到stderr，stdout只输出JSON结果）
+        with contextlib.redirect_stdout(sys.stderr):
+            logged_in = login_baostock()
+        if not logged_in:
             print(json.dumps({
                 'success': False,
                 'error': 'baostock登录失败'
@@ -138,26 +98,16 @@ def main():
         
         try:
             # 获取指数数据
-            index_data = get_index_data(index_codes)
-            
-            if not index_data:
-                result = {
-                    'success': False,
-                    'error': '没有获取到任何指数数据',
-                    'data': {}
-                }
-            else:
-                result = {
-                    'success': True,
-                    'data': index_data,
-                    'message': f'成功获取 {len(index_data)} 个指数的数据'
-                }
+            with contextlib.redirect_stdout(sys.stderr):
+                index_data = get_index_data(index_codes)
+            result = build_index_response(index_data)
             
             # 输出JSON结果
             print(json.dumps(result, ensure_ascii=False, default=str))
             
         finally:
-            logout_baostock()
+            with contextlib.redirect_stdout(sys.stderr):
+                logout_baostock()
         
     except json.JSONDecodeError:
         print(json.dumps({
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+baostock结果集解析 - 将逐行返回的字符串直接解析为类型化数组
+
+baostock的结果集逐行返回字符串列表。原来的做法是先收集全部行，再构建object列的
+DataFrame，最后逐列 pd.to_numeric 转换；这里按块读取行，每块直接解析进预先分配的
+类型化数组（容量不足时倍增），不构建中间的字符串DataFrame，解析完的行立即释放。
+
+字段类型：
+    date             int32  距1970-01-01的天数
+    time             int64  距1970-01-01的分钟数（baostock的time形如 20240102093500000）
+    volume           int64  有空值（或小数）时为float64，空值为NaN
+    其余数值字段      float64，空值为NaN
+    code等文本字段    object
+"""
+from operator import itemgetter
+import numpy as np
+
+CHUNK_SIZE = 8192
+
+DATE_FIELDS = ('date', 'calendar_date', 'dividOperateDate')
+TIME_FIELDS = ('time',)
+INT_FIELDS = ('volume',)
+TEXT_FIELDS = ('code', 'code_name', 'tradeStatus', 'tradestatus', 'isST', 'adjustflag',
+               'is_trading_day', 'ipoDate', 'outDate', 'type', 'status')
+
+NAN = float('nan')
+
+
+def field_kind(field):
+    """字段的解析类型：'date'、'time'、'int'、'float' 或 'text'"""
+    if field in DATE_FIELDS:
+        return 'date'
+    if field in TIME_FIELDS:
+        return 'time'
+    if field in INT_FIELDS:
+        return 'int'
+    if field in TEXT_FIELDS:
+        return 'text'
+    return 'float'
+
+
+def _parse_floats(values):
+    """字符串序列解析为float64，空字符串为NaN"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        return np.array([float(v) if v else NAN for v in values], dtype=np.float64)
+
+
+def _parse_dates(values):
+    """'YYYY-MM-DD' 解析为距1970-01-01的天数，空值为int32最小值"""
+    try:
+        parsed = np.array(values, dtype='datetime64[D]')
+    except ValueError:
+        parsed = np.array([v if v else 'NaT' for v in values], dtype='datetime64[D]')
+    # numpy把空字符串直接解析为NaT，不会抛异常，两条路径都要替换NaT
+    days = parsed.astype(np.int64)
+    days[np.isnat(parsed)] = np.iinfo(np.int32).min
+    return days
+
+
+def _parse_times(values):
+    """'YYYYMMDDHHMMSSsss' 解析为距1970-01-01的分钟数，空值为0"""
+    stamps = np.array([int(v) if v else 0 for v in values], dtype=np.int64)
+    ymd = stamps // 10 ** 9
+    hhmm = stamps // 10 ** 5 % 10 ** 4
+    months = (ymd // 10000 - 1970) * 12 + ymd // 100 % 100 - 1
+    days = months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + ymd % 100 - 1
+    return np.where(stamps > 0, days * 1440 + hhmm // 100 * 60 + hhmm % 100, 0)
+
+
+_PARSERS = {'date': _parse_dates, 'time': _parse_times, 'int': _parse_floats, 'float': _parse_floats}
+# 解析缓冲区的类型；int字段先按float64解析，全部为整数时再转换为int64
+_BUFFER_DTYPES = {'date': np.int32, 'time': np.int64, 'int': np.float64, 'float': np.float64,
+                  'text': object}
+
+
+class _Columns:
+    """按字段预先分配、容量倍增的列缓冲区"""
+
+    def __init__(self, fields, capacity):
+        self.fields = list(fields)
+        self.kinds = [field_kind(f) for f in self.fields]
+        self.size = 0
+        self.buffers = [np.empty(capacity, dtype=_BUFFER_DTYPES[k]) for k in self.kinds]
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        capacity = len(self.buffers[0]) if self.buffers else 0
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity = max(capacity * 2, CHUNK_SIZE)
+        grown = []
+        for buf in self.buffers:
+            new = np.empty(capacity, dtype=buf.dtype)
+            new[:self.size] = buf[:self.size]
+            grown.append(new)
+        self.buffers = grown
+
+    def append(self, rows):
+        if not rows:
+            return
+        self._reserve(len(rows))
+        stop = self.size + len(rows)
+        for j, (kind, buf) in enumerate(zip(self.kinds, self.buffers)):
+            values = list(map(itemgetter(j), rows))
+            if kind == 'text':
+                buf[self.size:stop] = values
+            else:
+                buf[self.size:stop] = _PARSERS[kind](values)
+        self.size = stop
+
+    def result(self):
+        columns = {}
+        for field, kind, buf in zip(self.fields, self.kinds, self.buffers):
+            column = buf[:self.size]
+            # 有空值或小数时保留float64，避免截断
+            if kind == 'int' and np.array_equal(column, np.trunc(column)):
+                column = column.astype(np.int64)
+            columns[field] = column
+        return columns
+
+
+def read_result_set(rs, chunk_size=CHUNK_SIZE):
+    """
+    读取baostock结果集并解析为类型化数组
+
+    Args:
+        rs: baostock查询返回的结果集（调用方已检查error_code）
+        chunk_size: 每次解析的行数
+
+    Returns:
+        dict: 字段名 -> ndarray（按rs.fields顺序），结果为空时各数组长度为0
+    """
+    columns = _Columns(rs.fields, chunk_size)
+    chunk = []
+    while (rs.error_code == '0') & rs.next():
+        chunk.append(rs.get_row_data())
+        if len(chunk) >= chunk_size:
+            columns.append(chunk)
+            chunk = []
+    columns.append(chunk)
+    return columns.result()
+
+
+def valid_rows(columns, fields):
+    """各字段都没有空值的行（布尔掩码）"""
+    mask = np.ones(len(next(iter(columns.values()), ())), dtype=bool)
+    for field in fields:
+        column = columns[field]
+        if column.dtype.kind == 'f':
+            ok = ~np.isnan(column)
+        elif field_kind(field) == 'date':
+            ok = column != np.iinfo(np.int32).min
+        else:
+            continue
+        mask &= ok
+    return mask
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志工具 - 诊断信息统一写到stderr，stdout只保留结构化响应
+
+设置环境变量 MINDPULSE_LOG_FORMAT=json 时每条日志输出为一行JSON，便于日志系统采集。
+"""
+import os
+import sys
+import json
+import time
+import logging
+
+ROOT_LOGGER = 'mindpulse'
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志格式化为一行JSON"""
+
+    def format(self, record):
+        return json.dumps({
+            'ts': round(time.time(), 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }, ensure_ascii=False)
+
+
+def get_logger(name):
+    """获取写到stderr的日志记录器"""
+    root = logging.getLogger(ROOT_LOGGER)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        if os.environ.get('MINDPULSE_LOG_FORMAT') == 'json':
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter('%(message)s'))
+        root.addHandler(handler)
+        root.setLevel(os.environ.get('MINDPULSE_LOG_LEVEL', 'INFO'))
+        root.propagate = False
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+金融指标 - 基于价格面板 (T x N) 的向量化指标计算
+
+全窗口指标（年化收益率、波动率、夏普比率、最大回撤）对所有资产一次性计算，
+滚动指标（滚动波动率、滚动夏普比率、滚动回撤）利用累积和与分块前缀/后缀最大值
+在 O(T) 内得到整条序列，不再逐个价格循环。
+"""
+import numpy as np
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.03
+
+
+def _as_panel(prices):
+    """将价格序列或面板统一为二维float64数组 (T x N)"""
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1:
+        prices = prices[:, None]
+    return prices
+
+
+def _returns(prices):
+    """逐期简单收益率 (T-1 x N)，价格缺失处为NaN"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.diff(prices, axis=0) / prices[:-1]
+
+
+def max_drawdowns(prices):
+    """
+    各资产的最大回撤（正数表示回撤幅度），缺失价格不参与计算
+
+    Args:
+        prices: 价格面板 (T x N)
+
+    Returns:
+        np.ndarray: 长度为N的最大回撤
+    """
+    prices = _as_panel(prices)
+    if len(prices) == 0:
+        return np.zeros(prices.shape[1])
+    # fmax在遇到NaN时取另一个值，缺失价格不会中断历史高点
+    peaks = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = (peaks - prices) / peaks
+    drawdowns = np.where(np.isnan(drawdowns), 0.0, drawdowns)
+    return np.maximum(drawdowns.max(axis=0), 0.0)
+
+
+def panel_metrics(prices, periods_per_year=TRADING_DAYS, risk_free_rate=RISK_FREE_RATE):
+    """
+    对价格面板中的每个资产计算全窗口指标
+
+    年化收益率按首尾价格和总期数几何年化，波动率为日收益率标准差（ddof=0）年化，
+    夏普比率 = (年化收益率 - 无风险利率) / 波动率。数据不足的资产各指标为0。
+
+    Args:
+        prices: 价格面板 (T x N) 或单个价格序列
+        periods_per_year: 每年期数
+        risk_free_rate: 年化无风险利率
+
+    Returns:
+        dict: returnRate/volatility/sharpeRatio/maxDrawdown，各为长度N的数组
+    """
+    prices = _as_panel(prices)
+    n_assets = prices.shape[1]
+    zeros = {
+        'returnRate': np.zeros(n_assets),
+        'volatility': np.zeros(n_assets),
+        'sharpeRatio': np.zeros(n_assets),
+        'maxDrawdown': np.zeros(n_assets)
+    }
+    if len(prices) < 2:
+        return zeros
+
+    returns = _returns(prices)
+    valid = ~np.isnan(returns)
+    counts = valid.sum(axis=0)
+    has_returns = counts > 0
+
+    # 首尾有效价格
+    observed = ~np.isnan(prices)
+    first = prices[observed.argmax(axis=0), np.arange(n_assets)]
+    last = prices[len(prices) - 1 - observed[::-1].argmax(axis=0), np.arange(n_assets)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = (last - first) / first
+        annualized_return = (1 + total_return) ** (periods_per_year / len(prices)) - 1
+
+        filled = np.where(valid, returns, 0.0)
+        mean = filled.sum(axis=0) / counts
+        variance = (np.where(valid, returns - mean, 0.0) ** 2).sum(axis=0) / counts
+        volatility = np.sqrt(variance) * np.sqrt(periods_per_year)
+        sharpe_ratio = np.where(
+            volatility > 0, (annualized_return - risk_free_rate) / volatility, 0.0
+        )
+
+    return {
+        'returnRate': np.where(has_returns, annualized_return, 0.0),
+        'volatility': np.where(has_returns, volatility, 0.0),
+        'sharpeRatio': np.where(has_returns, sharpe_ratio, 0.0),
+        'maxDrawdown': np.where(has_returns, max_drawdowns(prices), 0.0)
+    }
+
+
+def _rolling_sum(values, window):
+    """沿第0轴的滑动窗口求和，前window-1行为NaN"""
+    cumsum = np.cumsum(values, axis=0)
+    result = np.full(values.shape, np.nan)
+    result[window - 1:] = cumsum[window - 1:]
+    result[window:] -= cumsum[:-window]
+    return result
+
+
+def rolling_max(values, window):
+    """
+    沿第0轴的滑动窗口最大值（van Herk/Gil-Werman分块算法，O(T)）
+
+    窗口不足window行时取已有数据的最大值，NaN不参与比较。
+
+    Args:
+        values: 二维数组 (T x N)
+        window: 窗口长度
+
+    Returns:
+        np.ndarray: 与values同形状的滑动最大值
+    """
+    values = _as_panel(values)
+    length, n_cols = values.shape
+    # 前面补window-1行-inf使前几个窗口退化为扩展窗口，末尾补齐为window的整数倍
+    total = length + window - 1
+    padded_length = -(-total // window) * window
+    padded = np.full((padded_length, n_cols), -np.inf)
+    padded[window - 1:total] = np.where(np.isnan(values), -np.inf, values)
+
+    blocks = padded.reshape(-1, window, n_cols)
+    prefix = np.maximum.accumulate(blocks, axis=1).reshape(padded_length, n_cols)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded_length, n_cols)
+
+    # 以位置 t 结尾的窗口 [t-window+1, t] 的最大值 = max(suffix[t-window+1], prefix[t])
+    end = np.arange(window - 1, total)
+    result = np.maximum(suffix[end - window + 1], prefix[end])
+    return np.where(np.isinf(result), np.nan, result)
+
+
+def rolling_metrics(prices, window, periods_per_year=TRADING_DAYS,
+                    risk_free_rate=RISK_FREE_RATE):
+    """
+    计算滚动窗口指标序列，时间复杂度 O(T x N)
+
+    第 t 行的波动率和夏普比率使用截至第 t 个价格的最近window个收益率（ddof=0，年化），
+    夏普比率以窗口内平均收益率算术年化；回撤为当前价格相对最近window个价格
+    最高点的回撤幅度。数据不足一个完整窗口的位置为NaN。
+
+    Args:
+        prices: 价格面板 (T x N) 或单个价格序列
+        window: 窗口长度（收益率个数）
+        periods_per_year: 每年期数
+        risk_free_rate: 年化无风险利率
+
+    Returns:
+        dict: volatility/sharpeRatio/drawdown，各为 (T x N) 数组
+    """
+    if window < 2:
+        raise ValueError('滚动窗口长度至少为2')
+    prices = _as_panel(prices)
+    length, n_assets = prices.shape
+    nan_panel = np.full((length, n_assets), np.nan)
+    if length <= window:
+        return {'volatility': nan_panel, 'sharpeRatio': nan_panel.copy(), 'drawdown': nan_panel.copy()}
+
+    returns = _returns(prices)
+    valid = ~np.isnan(returns)
+    # 先减去全样本均值再累积，降低平方和相减时的舍入误差
+    with np.errstate(invalid='ignore'):
+        center = np.where(valid.any(axis=0), np.nanmean(np.where(valid, returns, np.nan), axis=0), 0.0)
+    shifted = np.where(valid, returns - center, 0.0)
+
+    counts = _rolling_sum(valid.astype(np.float64), window)
+    sums = _rolling_sum(shifted, window)
+    squares = _rolling_sum(shifted ** 2, window)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = sums / counts
+        variance = np.maximum(squares / counts - mean ** 2, 0.0)
+        volatility = np.sqrt(variance * periods_per_year)
+        annualized_mean = (mean + center) * periods_per_year
+        sharpe_ratio = np.where(volatility > 0, (annualized_mean - risk_free_rate) / volatility, np.nan)
+    insufficient = counts < 2
+    volatility[insufficient] = np.nan
+    sharpe_ratio[insufficient] = np.nan
+
+    # 收益率第 i 行对应价格第 i+1 行
+    rolling_volatility = nan_panel.copy()
+    rolling_volatility[1:] = volatility
+    rolling_sharpe = nan_panel.copy()
+    rolling_sharpe[1:] = sharpe_ratio
+
+    peaks = rolling_max(prices, window + 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = (peaks - prices) / peaks
+    drawdown[:window] = np.nan
+
+    return {
+        'volatility': rolling_volatility,
+        'sharpeRatio': rolling_sharpe,
+        'drawdown': drawdown
+    }
@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+组合优化 - 可热启动的有效集（active set）二次规划
+
+求解
+    min  1/2 w'Qw - c'w
+    s.t. a'w = b,  Gw <= h,  lower <= w <= upper,  sum|w - w_ref| <= τ（可选的换手率约束）
+目标函数的梯度 Qw - c 和约束的Jacobian（a、G 的各行）都是解析给出的，
+不需要有限差分。从初始权重（通常为上一次的最优权重）得到的可行点出发，
+工作集为处于边界的资产和起作用的不等式约束；每次迭代在自由资产上求解一个
+等式约束子问题（KKT方程组），遇到新的约束则加入工作集，乘子符号错误的约束移出工作集。
+相邻两次求解的最优解通常只差几个约束，热启动时只需少量迭代。
+
+换手率约束不引入额外变量：每个资产在参考权重 w_ref 处分为两段，段内 |w_i - w_ref_i| 是线性的，
+w_ref 作为与上下限同样处理的"拐点"边界，资产可以停在拐点上。
+
+优化目标：
+    min_variance   - 最小方差
+    mean_variance  - max μ'w - γ/2 w'Σw
+    max_sharpe     - 最大夏普比率；只有只做多约束时用 y = w / k 齐次化为一个二次规划，
+                     有其他约束时在 mean_variance 的解路径上求γ使 (μ'w - rf) / w'Σw = γ
+    max_return     - 在目标波动率下最大化收益率，求γ使组合波动率等于目标波动率；
+                     目标波动率高于约束下最大收益率组合的波动率时返回该组合
+两者都从上一次的γ出发找到变号区间，再用Illinois法求根。
+"""
+import numpy as np
+
+from metrics import RISK_FREE_RATE
+
+OPTIMIZE_METHODS = ('min_variance', 'mean_variance', 'max_sharpe')
+OBJECTIVES = OPTIMIZE_METHODS + ('max_return',)
+DEFAULT_RISK_AVERSION = 3.0
+TOLERANCE = 1e-10
+# 可行性检查的容忍度
+FEASIBILITY_TOLERANCE = 1e-9
+# 交替投影得到的初始点允许的约束违反量
+START_TOLERANCE = 1e-5
+# 搜索风险厌恶系数γ的范围（对数）
+LOG_RISK_AVERSION_RANGE = (np.log(1e-4), np.log(1e6))
+SEARCH_ITERATIONS = 60
+# 搜索γ时 log γ 的收敛区间宽度和初始步长
+SEARCH_TOLERANCE = 1e-9
+BRACKET_STEP = 0.05
+
+FREE, LOWER, UPPER, KINK = 0, -1, 1, 2
+
+
+class ConvergenceError(ValueError):
+    """有效集迭代在max_iter次内没有收敛；weights为最后一次迭代的（可行）权重"""
+
+    def __init__(self, weights, iterations):
+        super().__init__(f'二次规划在{iterations}次迭代内未收敛')
+        self.weights = weights
+        self.iterations = iterations
+
+
+def project(w, a, b, lower, upper, iterations=100):
+    """
+    将w投影到 {a'x = b, lower <= x <= upper}：x = clip(w - θa)，对θ二分
+
+    a'x关于θ单调不增，约束不可行时抛出ValueError
+    """
+    def total(theta):
+        return a @ np.clip(w - theta * a, lower, upper)
+
+    lo, hi = -1.0, 1.0
+    while total(lo) < b:
+        lo *= 2
+        if lo < -1e12:
+            raise ValueError('权重约束不可行')
+    while total(hi) > b:
+        hi *= 2
+        if hi > 1e12:
+            raise ValueError('权重约束不可行')
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        if total(mid) > b:
+            lo = mid
+        else:
+            hi = mid
+    return np.clip(w - 0.5 * (lo + hi) * a, lower, upper)
+
+
+def _project_l1(w, center, radius):
+    """将w投影到以center为中心、半径为radius的L1球"""
+    v = w - center
+    if np.abs(v).sum() <= radius:
+        return w
+    u = np.sort(np.abs(v))[::-1]
+    cumulative = np.cumsum(u) - radius
+    rho = np.flatnonzero(u * np.arange(1, len(u) + 1) > cumulative)[-1]
+    theta = cumulative[rho] / (rho + 1)
+    return center + np.sign(v) * np.maximum(np.abs(v) - theta, 0.0)
+
+
+def _violation(w, a, b, lower, upper, G, h, anchor, turnover):
+    """约束的最大违反量"""
+    violation = max(abs(a @ w - b), np.max(lower - w, initial=0.0), np.max(w - upper, initial=0.0))
+    if len(h):
+        violation = max(violation, np.max(G @ w - h))
+    if turnover is not None:
+        violation = max(violation, np.abs(w - anchor).sum() - turnover)
+    return violation
+
+
+def _feasible_start(w0, a, b, lower, upper, G, h, anchor, turnover):
+    """
+    求一个可行的初始点：依次尝试热启动权重、换手率参考权重及其投影，
+    都不可行时用Dykstra交替投影逼近 w0 在可行域上的投影
+
+    交替投影在可行域很窄时收敛较慢，只要求上下限和预算约束精确满足、
+    其余约束违反量不超过 START_TOLERANCE，剩余的违反量由 solve_qp 的第一步修正
+    """
+    n_assets = len(a)
+    if w0 is None:
+        w0 = anchor if anchor is not None else np.full(n_assets, b / a.sum() if a.sum() != 0 else 0.0)
+    w0 = np.asarray(w0, dtype=np.float64)
+    candidates = [w0] + ([anchor] if anchor is not None else [])
+    for candidate in candidates:
+        for w in (candidate, project(candidate, a, b, lower, upper)):
+            if _violation(w, a, b, lower, upper, G, h, anchor, turnover) <= FEASIBILITY_TOLERANCE:
+                return w.copy()
+
+    sets = []
+    for g_row, h_value in zip(G, h):
+        norm = g_row @ g_row
+        if norm > 0:
+            sets.append(lambda x, g_row=g_row, h_value=h_value, norm=norm:
+                        x - max(g_row @ x - h_value, 0.0) / norm * g_row)
+    if turnover is not None:
+        sets.append(lambda x: _project_l1(x, anchor, turnover))
+    # 最后投影到上下限和预算约束，每轮结束时这两类约束精确满足
+    sets.append(lambda x: project(x, a, b, lower, upper))
+
+    w = w0.copy()
+    corrections = [np.zeros(n_assets) for _ in sets]
+    for cycle in range(5000):
+        for k, projection in enumerate(sets):
+            shifted = w + corrections[k]
+            w = projection(shifted)
+            corrections[k] = shifted - w
+        if cycle % 10 == 0 and _violation(w, a, b, lower, upper, G, h, anchor,
+                                          turnover) <= START_TOLERANCE:
+            return w
+    raise ValueError('组合约束不可行')
+
+
+def _vertex_multiplier(g, a, state):
+    """所有资产都被固定时选取等式约束的乘子，使尽量多的边界乘子非负"""
+    lo, hi = -np.inf, np.inf
+    for i in np.flatnonzero(state != FREE):
+        if a[i] == 0:
+            continue
+        bound = -g[i] / a[i]
+        # 下界资产要求 g + νa >= 0，上界资产要求 g + νa <= 0，拐点上的资产两者都要求
+        if state[i] == KINK or (state[i] == LOWER) == (a[i] > 0):
+            lo = max(lo, bound)
+        if state[i] == KINK or (state[i] == LOWER) != (a[i] > 0):
+            hi = min(hi, bound)
+    if np.isfinite(lo):
+        return lo
+    return hi if np.isfinite(hi) else 0.0
+
+
+def solve_qp(Q, c, a, b, lower, upper, w0=None, G=None, h=None, anchor=None, turnover=None,
+             max_iter=None):
+    """
+    有效集法求解 min 1/2 w'Qw - c'w
+        s.t. a'w = b, Gw <= h, lower <= w <= upper, sum|w - anchor| <= turnover
+
+    Args:
+        Q: 半正定矩阵 (N x N)
+        c: 线性项 (N)
+        a, b: 等式约束 a'w = b
+        lower, upper: 权重上下限 (N)，上限可以为inf
+        w0: 热启动的初始权重，默认等权（有换手率约束时默认为anchor）
+        G, h: 不等式约束 Gw <= h，G为 (M x N)
+        anchor, turnover: 换手率约束的参考权重和上限，turnover为None时不限制
+        max_iter: 最大迭代次数，默认 10N + 100
+
+    Returns:
+        tuple: (最优权重, 迭代次数)
+
+    Raises:
+        ConvergenceError: max_iter次迭代内没有得到KKT点
+    """
+    n_assets = len(c)
+    G = np.empty((0, n_assets)) if G is None else np.asarray(G, dtype=np.float64).reshape(-1, n_assets)
+    h = np.empty(0) if h is None else np.asarray(h, dtype=np.float64).reshape(-1)
+    limited = turnover is not None
+    if limited:
+        anchor = np.asarray(anchor, dtype=np.float64)
+        turnover = float(turnover)
+    w = _feasible_start(w0, a, b, lower, upper, G, h, anchor, turnover)
+    if max_iter is None:
+        max_iter = 10 * n_assets + 100
+
+    # 资产状态：FREE 自由，LOWER/UPPER 在上下限，KINK 在换手率参考权重上
+    state = np.full(n_assets, FREE, dtype=np.int8)
+    state[w <= lower + TOLERANCE] = LOWER
+    state[w >= upper - TOLERANCE] = UPPER
+    # 自由资产所在的段：1 表示 w >= anchor，-1 表示 w <= anchor
+    side = np.ones(n_assets)
+    if limited:
+        side = np.where(w < anchor, -1.0, 1.0)
+        kink = (state == FREE) & (np.abs(w - anchor) <= TOLERANCE)
+        state[kink] = KINK
+        w[kink] = anchor[kink]
+        # 不等式约束的最后一行为按当前分段线性化的换手率约束
+        G = np.vstack([G, np.zeros(n_assets)])
+        h = np.r_[h, 0.0]
+    n_rows = len(h)
+
+    def update_turnover_row():
+        coefficients = np.where(state == KINK, 0.0, side)
+        G[-1] = coefficients
+        h[-1] = turnover + coefficients @ anchor
+
+    if limited:
+        update_turnover_row()
+    active = (h - G @ w) <= FEASIBILITY_TOLERANCE * (1 + np.abs(h))
+
+    for iteration in range(1, max_iter + 1):
+        g = Q @ w - c
+        free = np.flatnonzero(state == FREE)
+        rows = np.flatnonzero(active)
+        step = None
+        if len(free):
+            k = len(free)
+            constraints = np.vstack([a[free], G[np.ix_(rows, free)]])
+            m = len(constraints)
+            kkt = np.zeros((k + m, k + m))
+            kkt[:k, :k] = Q[np.ix_(free, free)]
+            kkt[:k, k:] = constraints.T
+            kkt[k:, :k] = constraints
+            # 约束行的右端为当前残差，初始点的微小不可行在第一步中被修正
+            rhs = np.r_[-g[free], b - a @ w, h[rows] - G[rows] @ w]
+            try:
+                solution = np.linalg.solve(kkt, rhs)
+            except np.linalg.LinAlgError:
+                solution = np.linalg.lstsq(kkt, rhs, rcond=None)[0]
+            step, nu, row_multipliers = solution[:k], solution[k], solution[k + 1:]
+        else:
+            # 所有资产都被固定时不等式约束由固定的资产决定，先全部移出工作集
+            active[:] = False
+            rows = np.empty(0, dtype=np.int64)
+            nu = _vertex_multiplier(g, a, state)
+            row_multipliers = np.empty(0)
+
+        if step is None or np.abs(step).max() <= TOLERANCE * (1 + np.abs(w[free]).max()):
+            # 子问题已最优：检查乘子，全部非负即为KKT点
+            residual = g + nu * a + G[rows].T @ row_multipliers
+            pull = 0.0
+            if limited and active[-1]:
+                pull = row_multipliers[-1]
+            candidates = np.full(n_assets, np.inf)
+            candidates[state == LOWER] = residual[state == LOWER]
+            candidates[state == UPPER] = -residual[state == UPPER]
+            # 拐点上的资产：向上移动的方向导数为 r + t，向下为 t - r，两者都须非负
+            at_kink = state == KINK
+            up = residual + pull
+            down = pull - residual
+            candidates[at_kink] = np.minimum(up, down)[at_kink]
+            j = int(np.argmin(candidates))
+            r = int(np.argmin(row_multipliers)) if len(rows) else None
+            threshold = -TOLERANCE * (1 + np.abs(g).max())
+            if r is not None and row_multipliers[r] < min(candidates[j], threshold):
+                active[rows[r]] = False
+                continue
+            if candidates[j] >= threshold:
+                return w, iteration
+            if state[j] == LOWER:
+                side[j] = 1.0 if not limited or lower[j] >= anchor[j] else -1.0
+            elif state[j] == UPPER:
+                side[j] = -1.0 if not limited or upper[j] <= anchor[j] else 1.0
+            else:
+                side[j] = 1.0 if up[j] < down[j] else -1.0
+            state[j] = FREE
+            if limited:
+                update_turnover_row()
+            continue
+
+        # 沿子问题方向前进，直到第一个资产碰到边界/拐点或第一个不等式约束起作用
+        seg_lower = lower[free].copy()
+        seg_upper = upper[free].copy()
+        if limited:
+            ref = anchor[free]
+            seg_lower = np.where(side[free] > 0, np.maximum(seg_lower, ref), seg_lower)
+            seg_upper = np.where(side[free] < 0, np.minimum(seg_upper, ref), seg_upper)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            to_lower = np.where(step < -TOLERANCE, (seg_lower - w[free]) / step, np.inf)
+            to_upper = np.where(step > TOLERANCE, (seg_upper - w[free]) / step, np.inf)
+        alpha, blocking = 1.0, None
+        i_lower, i_upper = int(np.argmin(to_lower)), int(np.argmin(to_upper))
+        if to_lower[i_lower] < alpha:
+            alpha, blocking = to_lower[i_lower], ('lower', i_lower)
+        if to_upper[i_upper] < alpha:
+            alpha, blocking = to_upper[i_upper], ('upper', i_upper)
+        if n_rows:
+            direction = G[:, free] @ step
+            slack = h - G @ w
+            with np.errstate(divide='ignore', invalid='ignore'):
+                to_row = np.where(~active & (direction > TOLERANCE), slack / direction, np.inf)
+            r = int(np.argmin(to_row))
+            if to_row[r] < alpha:
+                alpha, blocking = to_row[r], ('row', r)
+
+        w[free] += max(alpha, 0.0) * step
+        if blocking is None:
+            continue
+        kind, index = blocking
+        if kind == 'row':
+            active[index] = True
+            continue
+        i = free[index]
+        if kind == 'lower':
+            at_bound = seg_lower[index] == lower[i]
+            w[i] = seg_lower[index]
+            state[i] = LOWER if at_bound else KINK
+        else:
+            at_bound = seg_upper[index] == upper[i]
+            w[i] = seg_upper[index]
+            state[i] = UPPER if at_bound else KINK
+        if limited:
+            update_turnover_row()
+    raise ConvergenceError(w, max_iter)
+
+
+def optimize_weights(expected_returns, covariance_matrix, method='min_variance', w0=None,
+                     lower=None, upper=None, risk_aversion=DEFAULT_RISK_AVERSION,
+                     risk_free_rate=RISK_FREE_RATE):
+    """
+    只有预算约束和权重上下限时求解一次组合权重，可用上一次的权重热启动
+
+    Args:
+        expected_returns: 年化期望收益率 (N)
+        covariance_matrix: 年化协方差矩阵 (N x N)
+        method: 'min_variance'、'mean_variance'（max μ'w - γ/2 w'Σw）或 'max_sharpe'
+        w0: 热启动的初始权重
+        lower, upper: 权重上下限，默认只做多 [0, 1]；max_sharpe只支持只做多
+        risk_aversion: mean_variance的风险厌恶系数γ
+
+    Returns:
+        tuple: (权重, 迭代次数)；max_sharpe不存在切点组合（所有资产期望收益率不高于
+            无风险利率）时退化为最小方差组合
+
+    Raises:
+        ConvergenceError: 二次规划没有收敛
+    """
+    if method not in OPTIMIZE_METHODS:
+        raise ValueError(f'不支持的优化目标: {method}')
+    mean = np.asarray(expected_returns, dtype=np.float64)
+    cov = np.asarray(covariance_matrix, dtype=np.float64)
+    n_assets = len(mean)
+    lower = np.zeros(n_assets) if lower is None else np.asarray(lower, dtype=np.float64)
+    upper = np.ones(n_assets) if upper is None else np.asarray(upper, dtype=np.float64)
+    ones = np.ones(n_assets)
+
+    if method == 'max_sharpe':
+        if np.any(lower != 0) or np.any(upper < 1):
+            raise ValueError('max_sharpe只支持只做多约束')
+        excess = mean - risk_free_rate
+        if excess.max() > TOLERANCE:
+            start = None
+            if w0 is not None and np.asarray(w0) @ excess > TOLERANCE:
+                start = np.asarray(w0, dtype=np.float64) / (np.asarray(w0) @ excess)
+            y, iterations = solve_qp(cov, np.zeros(n_assets), excess, 1.0, np.zeros(n_assets),
+                                     np.full(n_assets, np.inf), start)
+            if y.sum() > TOLERANCE:
+                return y / y.sum(), iterations
+        method = 'min_variance'
+
+    if method == 'mean_variance':
+        return solve_qp(risk_aversion * cov, mean, ones, 1.0, lower, upper, w0)
+    return solve_qp(cov, np.zeros(n_assets), ones, 1.0, lower, upper, w0)
+
+
+def sector_constraints(sectors, sector_caps=None, sector_floors=None):
+    """
+    行业权重上下限转换为不等式约束 Gw <= h
+
+    Args:
+        sectors: 每个资产所属的行业标签 (N)
+        sector_caps: {行业: 权重上限}
+        sector_floors: {行业: 权重下限}
+
+    Returns:
+        tuple: (G (M x N), h (M))
+    """
+    labels = np.asarray([str(s) for s in sectors])
+    rows, limits = [], []
+    for sector, cap in (sector_caps or {}).items():
+        rows.append((labels == str(sector)).astype(np.float64))
+        limits.append(float(cap))
+    for sector, floor in (sector_floors or {}).items():
+        rows.append(-(labels == str(sector)).astype(np.float64))
+        limits.append(-float(floor))
+    if not rows:
+        return np.empty((0, len(labels))), np.empty(0)
+    return np.array(rows), np.array(limits)
+
+
+def _log_risk_aversion(risk_aversion):
+    """搜索γ的起点，限制在 LOG_RISK_AVERSION_RANGE 内"""
+    if risk_aversion is None or risk_aversion <= 0:
+        risk_aversion = DEFAULT_RISK_AVERSION
+    return float(np.clip(np.log(risk_aversion), *LOG_RISK_AVERSION_RANGE))
+
+
+def _decreasing_root(f, t0):
+    """
+    求关于t单调递减的函数f的零点：从t0出发倍增步长找到变号区间，再用Illinois法
+    （修正的试位法）收敛，超出 LOG_RISK_AVERSION_RANGE 仍不变号时返回端点
+    """
+    limit_lo, limit_hi = LOG_RISK_AVERSION_RANGE
+    step = BRACKET_STEP
+    value = f(t0)
+    if value == 0:
+        return t0
+    lo = hi = t0
+    f_lo = f_hi = value
+    while (f_lo > 0) == (f_hi > 0):
+        if value > 0:
+            if hi >= limit_hi:
+                return hi
+            lo, f_lo = hi, f_hi
+            hi = min(hi + step, limit_hi)
+            f_hi = f(hi)
+        else:
+            if lo <= limit_lo:
+                return lo
+            hi, f_hi = lo, f_lo
+            lo = max(lo - step, limit_lo)
+            f_lo = f(lo)
+        step *= 2
+    if f_hi == 0:
+        return hi
+
+    side = 0
+    for _ in range(SEARCH_ITERATIONS):
+        if hi - lo <= SEARCH_TOLERANCE:
+            break
+        t = (lo * f_hi - hi * f_lo) / (f_hi - f_lo)
+        if not lo < t < hi:
+            t = 0.5 * (lo + hi)
+        value = f(t)
+        if abs(value) <= TOLERANCE:
+            return t
+        # 同一侧连续两次被替换时把另一侧的函数值减半，避免试位法单侧收敛
+        if value > 0:
+            lo, f_lo = t, value
+            if side > 0:
+                f_hi *= 0.5
+            side = 1
+        else:
+            hi, f_hi = t, value
+            if side < 0:
+                f_lo *= 0.5
+            side = -1
+    return hi
+
+
+def _portfolio_summary(weights, mean, cov, risk_free_rate):
+    ret = float(weights @ mean)
+    volatility = float(np.sqrt(max(weights @ cov @ weights, 0.0)))
+    sharpe = (ret - risk_free_rate) / volatility if volatility > 0 else 0.0
+    return {'return': ret, 'volatility': volatility, 'sharpeRatio': sharpe}
+
+
+def optimize_portfolio(expected_returns, covariance_matrix, objective='min_variance', bounds=None,
+                       sectors=None, sector_caps=None, sector_floors=None, current_weights=None,
+                       max_turnover=None, target_return=None, target_volatility=None,
+                       risk_aversion=DEFAULT_RISK_AVERSION, risk_free_rate=RISK_FREE_RATE,
+                       w0=None):
+    """
+    带约束的均值-方差优化
+
+    Args:
+        expected_returns: 年化期望收益率 (N)
+        covariance_matrix: 年化协方差矩阵 (N x N)
+        objective: 优化目标，见 OBJECTIVES；给出 target_volatility 时为 max_return
+        bounds: 每个资产的权重 [下限, 上限]，默认只做多 [0, 1]
+        sectors: 每个资产所属的行业标签，配合 sector_caps / sector_floors 使用
+        sector_caps, sector_floors: {行业: 权重上限/下限}
+        current_weights: 当前持仓权重，换手率约束的参考权重
+        max_turnover: 换手率上限 sum|w - current_weights|
+        target_return: 组合期望收益率下限
+        target_volatility: 目标波动率（年化），在该波动率下最大化收益率
+        risk_aversion: mean_variance的风险厌恶系数γ；max_sharpe和max_return搜索γ的起点，
+            热启动时传入上一次结果的 riskAversion
+        w0: 热启动的初始权重（通常为上一次调用的结果）
+
+    Returns:
+        dict: weights、return、volatility、sharpeRatio、turnover、iterations（所有二次规划的
+            迭代次数之和）、objective，以及搜索得到的 riskAversion
+
+    Raises:
+        ValueError: 约束不可行；二次规划没有收敛时为其子类 ConvergenceError
+    """
+    mean = np.asarray(expected_returns, dtype=np.float64)
+    cov = np.asarray(covariance_matrix, dtype=np.float64)
+    n_assets = len(mean)
+    if n_assets == 0 or cov.shape != (n_assets, n_assets):
+        raise ValueError('期望收益率与协方差矩阵维度不一致')
+    if target_volatility is not None:
+        objective = 'max_return'
+        if target_volatility <= 0:
+            raise ValueError('目标波动率必须为正')
+    if objective not in OBJECTIVES:
+        raise ValueError(f'不支持的优化目标: {objective}')
+    if objective == 'max_return' and target_volatility is None:
+        raise ValueError('max_return需要给出目标波动率')
+
+    if bounds is None:
+        lower, upper = np.zeros(n_assets), np.ones(n_assets)
+    else:
+        bounds = np.asarray(bounds, dtype=np.float64)
+        if bounds.shape != (n_assets, 2):
+            raise ValueError('权重上下限须为每个资产一个 [下限, 上限]')
+        lower, upper = bounds[:, 0].copy(), bounds[:, 1].copy()
+    if np.any(lower > upper) or lower.sum() > 1 + TOLERANCE or upper.sum() < 1 - TOLERANCE:
+        raise ValueError('权重上下限约束不可行')
+
+    G, h = np.empty((0, n_assets)), np.empty(0)
+    if sectors is not None:
+        if len(sectors) != n_assets:
+            raise ValueError('行业标签数量与资产数量不一致')
+        G, h = sector_constraints(sectors, sector_caps, sector_floors)
+    if target_return is not None:
+        # μ'w >= r 写为 -μ'w <= -r
+        G = np.vstack([G, -mean])
+        h = np.r_[h, -float(target_return)]
+    anchor = None
+    if max_turnover is not None:
+        if current_weights is None:
+            raise ValueError('换手率约束需要给出当前持仓权重')
+        anchor = np.asarray(current_weights, dtype=np.float64)
+        if anchor.shape != (n_assets,):
+            raise ValueError('当前持仓权重数量与资产数量不一致')
+        max_turnover = float(max_turnover)
+
+    ones = np.ones(n_assets)
+    zeros = np.zeros(n_assets)
+    total_iterations = 0
+    last = w0
+
+    def solve(gamma, start):
+        nonlocal total_iterations
+        if gamma is None:
+            weights, iterations = solve_qp(cov, zeros, ones, 1.0, lower, upper, start, G, h,
+                                           anchor, max_turnover)
+        else:
+            weights, iterations = solve_qp(gamma * cov, mean, ones, 1.0, lower, upper, start, G, h,
+                                           anchor, max_turnover)
+        total_iterations += iterations
+        return weights
+
+    gamma = None
+    simple = (len(h) == 0 and anchor is None and np.all(lower == 0) and np.all(upper >= 1))
+    if objective == 'min_variance':
+        weights = solve(None, last)
+    elif objective == 'mean_variance':
+        gamma = float(risk_aversion)
+        weights = solve(gamma, last)
+    elif objective == 'max_sharpe' and simple:
+        weights, total_iterations = optimize_weights(mean, cov, 'max_sharpe', last,
+                                                     risk_free_rate=risk_free_rate)
+    elif objective == 'max_sharpe' and (mean - risk_free_rate).max() > TOLERANCE:
+        # 沿 mean_variance 的解路径 w(γ)，夏普比率关于γ的导数与 φ(γ) - γ 同号，
+        # φ = (μ'w - rf) / w'Σw；最优解满足 φ(γ) = γ，对 log γ 求 φ/γ - 1 的零点，每次以上一个解热启动
+        solutions = {}
+
+        def gap(t):
+            nonlocal last
+            last = solutions[t] = solve(np.exp(t), last)
+            return (last @ mean - risk_free_rate) / (last @ cov @ last) / np.exp(t) - 1
+
+        best = _decreasing_root(gap, _log_risk_aversion(risk_aversion))
+        gamma, weights = float(np.exp(best)), solutions[best]
+    elif objective == 'max_sharpe':
+        # 所有资产期望收益率不高于无风险利率时退化为最小方差组合
+        weights = solve(None, last)
+    else:
+        # 组合波动率关于γ单调递减，对 log γ 求 波动率/目标 - 1 的零点
+        solutions = {}
+
+        def gap(t):
+            nonlocal last
+            last = solutions[t] = solve(np.exp(t), last)
+            return np.sqrt(max(last @ cov @ last, 0.0)) / target_volatility - 1
+
+        best = _decreasing_root(gap, _log_risk_aversion(risk_aversion))
+        gamma, weights = float(np.exp(best)), solutions[best]
+        if weights @ cov @ weights > target_volatility ** 2 * (1 + 1e-9):
+            # γ到达搜索上限仍高于目标波动率，与最小方差组合比较
+            weights, gamma = solve(None, weights), None
+            if weights @ cov @ weights > target_volatility ** 2 * (1 + 1e-9):
+                raise ValueError('目标波动率低于约束下的最小波动率')
+
+    result = {
+        'objective': objective,
+        'weights': weights,
+        **_portfolio_summary(weights, mean, cov, risk_free_rate),
+        'turnover': float(np.abs(weights - anchor).sum()) if anchor is not None else None,
+        'iterations': int(total_iterations),
+        'riskAversion': gamma
+    }
+    return result
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+随机组合采样 - 批量生成随机权重并一次性计算收益率和波动率
+
+每批生成 K x N 的权重矩阵，收益率为 W @ mu，方差为 einsum('kn,kn->k', W @ cov, W)，
+按批次生成以限制内存占用；相同的随机种子和批大小得到相同的结果。
+
+采样方式：
+    uniform     - 每个权重取 [0, 1) 均匀随机数后归一化（与原可行集散点图一致）
+    dirichlet   - 权重服从对称Dirichlet分布，alpha越小组合越集中
+    constrained - 在每个资产的 [下限, 上限] 内均匀采样（Dirichlet分配剩余预算后拒绝越界样本）
+"""
+import numpy as np
+
+from metrics import RISK_FREE_RATE
+
+SAMPLING_METHODS = ('uniform', 'dirichlet', 'constrained')
+DEFAULT_SAMPLES = 10000
+DEFAULT_CHUNK_SIZE = 20000
+# 约束采样时单批最多重复拒绝采样的轮数
+MAX_REJECTION_ROUNDS = 100
+
+
+def _constrained_weights(rng, size, lower, upper, alpha):
+    """在上下限内采样权重：下限之外的剩余预算按Dirichlet分配，超过上限的样本重新采样"""
+    n_assets = len(lower)
+    budget = 1.0 - lower.sum()
+    weights = np.empty((size, n_assets))
+    filled = 0
+    for _ in range(MAX_REJECTION_ROUNDS):
+        needed = size - filled
+        # 每轮多采一倍，减少拒绝采样的轮数
+        draws = rng.dirichlet(np.full(n_assets, alpha), max(needed * 2, 64))
+        candidates = lower + budget * draws
+        accepted = candidates[np.all(candidates <= upper + 1e-12, axis=1)][:needed]
+        weights[filled:filled + len(accepted)] = accepted
+        filled += len(accepted)
+        if filled == size:
+            return weights
+    raise ValueError('权重上下限过紧，拒绝采样无法生成足够的组合')
+
+
+def sample_weights(rng, size, n_assets, method='uniform', alpha=1.0, bounds=None):
+    """
+    生成一批随机权重
+
+    Args:
+        rng: numpy随机数生成器
+        size: 组合数 K
+        n_assets: 资产数 N
+        method: 'uniform'、'dirichlet' 或 'constrained'
+        alpha: Dirichlet分布参数
+        bounds: constrained采样时每个资产的 [下限, 上限]
+
+    Returns:
+        np.ndarray: K x N 权重矩阵，每行之和为1
+    """
+    if method == 'uniform':
+        weights = rng.random((size, n_assets))
+        return weights / weights.sum(axis=1, keepdims=True)
+    if method == 'dirichlet':
+        return rng.dirichlet(np.full(n_assets, alpha), size)
+    if method == 'constrained':
+        if bounds is None:
+            lower, upper = np.zeros(n_assets), np.ones(n_assets)
+        else:
+            bounds = np.asarray(bounds, dtype=np.float64)
+            if bounds.shape != (n_assets, 2):
+                raise ValueError('权重上下限须为每个资产一个 [下限, 上限]')
+            lower, upper = bounds[:, 0], bounds[:, 1]
+        if np.any(lower > upper) or lower.sum() > 1 or upper.sum() < 1:
+            raise ValueError('权重上下限约束不可行')
+        return _constrained_weights(rng, size, lower, upper, alpha)
+    raise ValueError(f'不支持的采样方式: {method}')
+
+
+def evaluate_portfolios(weights, expected_returns, covariance_matrix):
+    """
+    批量计算组合收益率和波动率
+
+    Args:
+        weights: K x N 权重矩阵
+        expected_returns: 期望收益率 (N)
+        covariance_matrix: 协方差矩阵 (N x N)
+
+    Returns:
+        tuple: (收益率 (K), 波动率 (K))
+    """
+    returns = weights @ expected_returns
+    variances = np.einsum('kn,kn->k', weights @ covariance_matrix, weights)
+    return returns, np.sqrt(np.maximum(variances, 0.0))
+
+
+def iter_portfolio_samples(expected_returns, covariance_matrix, n_samples=DEFAULT_SAMPLES,
+                           method='uniform', alpha=1.0, bounds=None, seed=None,
+                           chunk_size=DEFAULT_CHUNK_SIZE, risk_free_rate=RISK_FREE_RATE,
+                           include_weights=False):
+    """
+    按批次生成随机组合，每批产出一个结果字典
+
+    Yields:
+        dict: returns/volatilities/sharpeRatios（各为长度不超过chunk_size的数组），
+            include_weights为真时包含weights
+    """
+    mean = np.asarray(expected_returns, dtype=np.float64)
+    cov = np.asarray(covariance_matrix, dtype=np.float64)
+    n_assets = len(mean)
+    if n_assets == 0 or cov.shape != (n_assets, n_assets):
+        raise ValueError('期望收益率与协方差矩阵维度不一致')
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f'不支持的采样方式: {method}')
+
+    rng = np.random.default_rng(seed)
+    chunk_size = max(int(chunk_size), 1)
+    remaining = int(n_samples)
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        weights = sample_weights(rng, size, n_assets, method, alpha, bounds)
+        returns, volatilities = evaluate_portfolios(weights, mean, cov)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(volatilities > 0, (returns - risk_free_rate) / volatilities, 0.0)
+        chunk = {
+            'returns': returns,
+            'volatilities': volatilities,
+            'sharpeRatios': sharpe
+        }
+        if include_weights:
+            chunk['weights'] = weights
+        yield chunk
+        remaining -= size
+
+
+def sample_portfolios(expected_returns, covariance_matrix, n_samples=DEFAULT_SAMPLES,
+                      method='uniform', alpha=1.0, bounds=None, seed=None,
+                      chunk_size=DEFAULT_CHUNK_SIZE, risk_free_rate=RISK_FREE_RATE,
+                      include_weights=False):
+    """
+    生成随机组合点云（可行集散点）
+
+    Args:
+        expected_returns: 年化期望收益率 (N)
+        covariance_matrix: 年化协方差矩阵 (N x N)
+        n_samples: 组合数
+        method: 'uniform'、'dirichlet' 或 'constrained'
+        alpha: Dirichlet分布参数
+        bounds: constrained采样时每个资产的 [下限, 上限]
+        seed: 随机种子
+        chunk_size: 每批组合数，限制权重矩阵的内存占用
+        risk_free_rate: 计算夏普比率的无风险利率
+        include_weights: 是否返回权重矩阵
+
+    Returns:
+        dict: returns/volatilities/sharpeRatios（长度为n_samples的数组），可选weights
+    """
+    chunks = list(iter_portfolio_samples(
+        expected_returns, covariance_matrix, n_samples, method, alpha, bounds, seed,
+        chunk_size, risk_free_rate, include_weights
+    ))
+    keys = ('returns', 'volatilities', 'sharpeRatios') + (('weights',) if include_weights else ())
+    if not chunks:
+        n_assets = len(expected_returns)
+        return {key: np.empty((0, n_assets) if key == 'weights' else 0) for key in keys}
+    return {key: np.concatenate([chunk[key] for chunk in chunks]) for key in keys}
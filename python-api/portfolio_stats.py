@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+投资组合统计量 - 基于对齐后的收益率矩阵 (T x N) 一次性计算
+
+期望收益率、协方差和相关系数矩阵均由单次矩阵运算得到，
+并可选Ledoit-Wolf收缩估计，用于资产数量较多、样本相对不足的场景。
+"""
+import numpy as np
+
+TRADING_DAYS = 252
+
+# 样本不足时使用的默认值，与原逐元素计算逻辑保持一致
+DEFAULT_VARIANCE = 0.04
+DEFAULT_COVARIANCE = 0.01
+
+
+def simple_returns(prices):
+    """
+    由价格矩阵计算简单收益率
+
+    Args:
+        prices: (T x N) 价格矩阵
+
+    Returns:
+        ndarray: (T-1 x N) 收益率矩阵，前一日价格非正时收益率记为0
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    prev = prices[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.where(prev > 0, (prices[1:] - prev) / prev, 0.0)
+    return returns
+
+
+def ledoit_wolf_shrinkage(returns):
+    """
+    计算Ledoit-Wolf收缩强度（收缩目标为等方差单位阵）
+
+    Args:
+        returns: (T x N) 收益率矩阵
+
+    Returns:
+        float: 收缩强度，取值 [0, 1]
+    """
+    x = np.asarray(returns, dtype=np.float64)
+    n_samples, n_assets = x.shape
+    if n_samples < 2 or n_assets == 0:
+        return 0.0
+
+    x = x - x.mean(axis=0)
+    x2 = x ** 2
+    emp_cov_trace = x2.sum(axis=0) / n_samples
+    mu = emp_cov_trace.sum() / n_assets
+
+    beta_ = np.sum(x2.T @ x2)
+    delta_ = np.sum((x.T @ x) ** 2) / n_samples ** 2
+    beta = (beta_ / n_samples - delta_) / (n_assets * n_samples)
+    delta = (delta_ - 2.0 * mu * emp_cov_trace.sum() + n_assets * mu ** 2) / n_assets
+
+    beta = min(beta, delta)
+    if delta <= 0 or beta <= 0:
+        return 0.0
+    return float(beta / delta)
+
+
+def shrink_covariance(covariance, shrinkage):
+    """将协方差矩阵向等方差单位阵收缩"""
+    covariance = np.asarray(covariance, dtype=np.float64)
+    n_assets = covariance.shape[0]
+    mu = np.trace(covariance) / n_assets if n_assets else 0.0
+    shrunk = (1.0 - shrinkage) * covariance
+    shrunk.flat[::n_assets + 1] += shrinkage * mu
+    return shrunk
+
+
+def correlation_from_covariance(covariance):
+    """由协方差矩阵计算相关系数矩阵，方差为0的资产与自身相关系数为1、与其他资产为0"""
+    covariance = np.asarray(covariance, dtype=np.float64)
+    std = np.sqrt(np.abs(np.diag(covariance)))
+    valid = std > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / np.outer(std, std)
+    correlation[~np.outer(valid, valid)] = 0.0
+    invalid_diag = np.flatnonzero(~valid)
+    correlation[invalid_diag, invalid_diag] = 1.0
+    return correlation
+
+
+def compute_return_statistics(returns, shrinkage=None, periods_per_year=TRADING_DAYS):
+    """
+    计算年化期望收益率、协方差矩阵和相关系数矩阵
+
+    Args:
+        returns: (T x N) 收益率矩阵
+        shrinkage: 协方差收缩方式：None不收缩，'ledoit_wolf'自动估计收缩强度，
+            或直接给出 [0, 1] 之间的收缩强度
+        periods_per_year: 年化使用的周期数
+
+    Returns:
+        dict: expectedReturns (N,)、covarianceMatrix (N x N)、correlationMatrix (N x N)、shrinkage
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if returns.ndim != 2:
+        raise ValueError('收益率矩阵必须是二维数组 (T x N)')
+    n_samples, n_assets = returns.shape
+
+    if n_samples == 0:
+        expected_returns = np.zeros(n_assets)
+    else:
+        expected_returns = returns.mean(axis=0) * periods_per_year
+
+    intensity = 0.0
+    if n_samples > 1:
+        covariance = np.cov(returns, rowvar=False).reshape(n_assets, n_assets) * periods_per_year
+        if shrinkage == 'ledoit_wolf':
+            intensity = ledoit_wolf_shrinkage(returns)
+        elif shrinkage is not None:
+            intensity = float(np.clip(float(shrinkage), 0.0, 1.0))
+        if intensity > 0:
+            covariance = shrink_covariance(covariance, intensity)
+    else:
+        covariance = np.full((n_assets, n_assets), DEFAULT_COVARIANCE)
+        np.fill_diagonal(covariance, DEFAULT_VARIANCE)
+
+    return {
+        'expectedReturns': expected_returns,
+        'covarianceMatrix': covariance,
+        'correlationMatrix': correlation_from_covariance(covariance),
+        'shrinkage': intensity
+    }
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+名称解析结果缓存 - 持久化到sqlite，多个进程共用
+
+按原始输入名称缓存 search_stock_by_name_enhanced 的匹配结果（不做规范化：全角、空格不同的
+写法可能解析出不同的结果，共用一个条目会让先出现的写法决定其余写法的结果）：
+    - 找到的结果保存 NAME_CACHE_TTL 秒；
+    - 未找到的结果（如加密货币代码、错别字）保存较短的 NAME_CACHE_NEGATIVE_TTL 秒，
+      字典刷新后能较快重新查找；
+    - 查询失败等临时错误不缓存；
+    - 条目数超过 NAME_CACHE_SIZE 时淘汰最久未使用的条目；命中时只在记录的使用时间
+      早于 NAME_CACHE_TOUCH_INTERVAL 秒前才更新，避免每次命中都写库提交。
+缓存不可用（如文件无法写入）时只记录日志，不影响名称解析。
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from log_utils import get_logger
+
+logger = get_logger('resolution_cache')
+
+NAME_CACHE_PATH = os.environ.get(
+    'NAME_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'name_cache.sqlite3')
+)
+NAME_CACHE_TTL = float(os.environ.get('NAME_CACHE_TTL', str(7 * 86400)))
+NAME_CACHE_NEGATIVE_TTL = float(os.environ.get('NAME_CACHE_NEGATIVE_TTL', '3600'))
+NAME_CACHE_SIZE = int(os.environ.get('NAME_CACHE_SIZE', '10000'))
+# 命中时更新last_used的最短间隔（秒），LRU淘汰的时间精度即为该间隔
+NAME_CACHE_TOUCH_INTERVAL = float(os.environ.get('NAME_CACHE_TOUCH_INTERVAL', '3600'))
+
+# 只缓存确定的结果，error/no_data 等临时错误下次重新查找
+NEGATIVE_MATCH_TYPES = ('not_found',)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS resolution (
+    key TEXT PRIMARY KEY,
+    stock_code TEXT,
+    match_type TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    result TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS resolution_last_used ON resolution (last_used);
+'''
+
+_CONN = None
+_LOCK = threading.Lock()
+_STATS = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+
+
+def _connection():
+    global _CONN
+    if _CONN is None:
+        directory = os.path.dirname(NAME_CACHE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(NAME_CACHE_PATH, timeout=5, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+        _CONN = conn
+    return _CONN
+
+
+def get_cached(name):
+    """
+    查找缓存的解析结果
+
+    Args:
+        name: 用户输入的资产名称
+
+    Returns:
+        dict: 缓存的匹配结果，未命中或已过期返回None
+    """
+    key = str(name)
+    now = time.time()
+    with _LOCK:
+        try:
+            conn = _connection()
+            row = conn.execute(
+                'SELECT result, expires_at, last_used FROM resolution WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                _STATS['misses'] += 1
+                return None
+            if row[1] <= now:
+                conn.execute('DELETE FROM resolution WHERE key = ?', (key,))
+                conn.commit()
+                _STATS['expired'] += 1
+                _STATS['misses'] += 1
+                return None
+            if now - row[2] >= NAME_CACHE_TOUCH_INTERVAL:
+                conn.execute('UPDATE resolution SET last_used = ? WHERE key = ?', (now, key))
+                conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f'读取名称解析缓存失败: {e}')
+            return None
+        _STATS['hits'] += 1
+    return json.loads(row[0])
+
+
+def put_cached(name, result):
+    """
+    保存解析结果，找到的结果与未找到的结果使用不同的有效期
+
+    Returns:
+        bool: 是否写入缓存
+    """
+    match_type = result.get('match_type')
+    if result.get('found'):
+        ttl = NAME_CACHE_TTL
+    elif match_type in NEGATIVE_MATCH_TYPES:
+        ttl = NAME_CACHE_NEGATIVE_TTL
+    else:
+        return False
+    if ttl <= 0:
+        return False
+
+    key = str(name)
+    now = time.time()
+    with _LOCK:
+        try:
+            conn = _connection()
+            conn.execute(
+                'INSERT OR REPLACE INTO resolution '
+                '(key, stock_code, match_type, confidence, result, expires_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, result.get('stock_code'), match_type, float(result.get('confidence', 0.0)),
+                 json.dumps(result, ensure_ascii=False), now + ttl, now)
+            )
+            # 超过容量时按最近使用时间淘汰
+            evicted = conn.execute(
+                'DELETE FROM resolution WHERE key IN ('
+                'SELECT key FROM resolution ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                (NAME_CACHE_SIZE,)
+            ).rowcount
+            conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f'写入名称解析缓存失败: {e}')
+            return False
+        _STATS['stores'] += 1
+        _STATS['evictions'] += max(evicted, 0)
+    return True
+
+
+def cache_stats():
+    """本进程的命中、未命中、写入和淘汰次数，以及缓存中的条目数"""
+    with _LOCK:
+        stats = dict(_STATS)
+        try:
+            stats['size'] = _connection().execute('SELECT COUNT(*) FROM resolution').fetchone()[0]
+        except (sqlite3.Error, OSError):
+            stats['size'] = None
+    lookups = stats['hits'] + stats['misses']
+    stats['hitRate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def clear_cache():
+    """清空名称解析缓存"""
+    with _LOCK:
+        try:
+            conn = _connection()
+            conn.execute('DELETE FROM resolution')
+            conn.commit()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f'清空名称解析缓存失败: {e}')
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+风险分析 - 基于对齐后的收益率面板 (T x N) 计算组合层面的VaR / CVaR
+
+VaR和CVaR均以正数表示损失，单位为持有期收益率：
+    historical     - 历史模拟，对所有列（各资产和组合）一次 np.partition 取出尾部，
+                     多个置信水平共用一次部分排序，不做全排序
+    parametric     - 正态假设，VaR = -(μh + z σ√h)
+    cornishFisher  - 用偏度和超额峰度修正正态分位数
+    monteCarlo     - 按Cholesky因子生成相关的多元正态日收益率，逐日复利得到持有期收益率；
+                     按批生成以限制内存，路径数较多时分配到多个进程
+
+风险贡献由协方差矩阵得到：边际风险 Σw/σ，成分风险 w·Σw/σ（之和为组合波动率），
+成分VaR为正态VaR按成分风险的分解（之和为parametric VaR）。
+"""
+import os
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from portfolio_stats import simple_returns
+
+DEFAULT_LEVELS = (0.95, 0.99)
+# 每批模拟的随机数个数上限（路径数 x 持有期 x 资产数），限制单批内存
+MC_CHUNK_DRAWS = 4_000_000
+# 随机数总数超过该值时才启用多进程
+MC_PARALLEL_DRAWS = 20_000_000
+MAX_MC_PATHS = 10_000_000
+
+_NORMAL = NormalDist()
+
+
+def _levels(levels):
+    levels = np.atleast_1d(np.asarray(levels, dtype=np.float64))
+    if levels.size == 0 or np.any((levels <= 0) | (levels >= 1)):
+        raise ValueError('置信水平必须在 (0, 1) 之间')
+    return levels
+
+
+def _tail_counts(n_samples, levels):
+    """各置信水平下尾部的样本数 k = ceil((1 - 置信水平) x T)，至少为1"""
+    return np.maximum(np.ceil((1 - levels) * n_samples - 1e-9).astype(np.int64), 1)
+
+
+def historical_var(returns, levels=DEFAULT_LEVELS):
+    """
+    历史模拟VaR和CVaR，对每一列分别计算
+
+    Args:
+        returns: 收益率 (T) 或 (T x M)，不能有缺失值
+        levels: 置信水平列表
+
+    Returns:
+        tuple: (VaR (L x M), CVaR (L x M))；returns为一维时为 (L) 和 (L)
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    vector = returns.ndim == 1
+    panel = returns[:, None] if vector else returns
+    levels = _levels(levels)
+    n_samples = len(panel)
+    if n_samples == 0:
+        raise ValueError('收益率序列为空')
+
+    counts = _tail_counts(n_samples, levels)
+    # 一次部分排序同时确定所有置信水平的分位点，最小的k个收益率位于前k行
+    kth = np.unique(counts - 1)
+    tail = np.partition(panel, kth, axis=0)[:counts.max()]
+    # 前k行已是最小的k个，但彼此无序：VaR取第k小（分位点位置上的值），CVaR取前k行的均值
+    var = -tail[counts - 1]
+    cvar = -np.cumsum(tail, axis=0)[counts - 1] / counts[:, None]
+    if vector:
+        return var[:, 0], cvar[:, 0]
+    return var, cvar
+
+
+def _moments(series):
+    """均值、标准差（ddof=1）、偏度和超额峰度"""
+    mean = series.mean()
+    centered = series - mean
+    std = series.std(ddof=1) if len(series) > 1 else 0.0
+    m2 = np.mean(centered ** 2)
+    if m2 <= 0:
+        return mean, std, 0.0, 0.0
+    skewness = np.mean(centered ** 3) / m2 ** 1.5
+    kurtosis = np.mean(centered ** 4) / m2 ** 2 - 3.0
+    return mean, std, skewness, kurtosis
+
+
+def parametric_var(mean, std, levels=DEFAULT_LEVELS, horizon=1):
+    """
+    正态VaR和CVaR
+
+    Args:
+        mean, std: 单期收益率的均值和标准差
+        horizon: 持有期（期数），均值按h、标准差按√h缩放
+
+    Returns:
+        tuple: (VaR (L), CVaR (L))
+    """
+    levels = _levels(levels)
+    z = np.array([_NORMAL.inv_cdf(1 - level) for level in levels])
+    density = np.array([_NORMAL.pdf(value) for value in z])
+    scale = std * np.sqrt(horizon)
+    var = -(mean * horizon + z * scale)
+    cvar = -mean * horizon + scale * density / (1 - levels)
+    return var, cvar
+
+
+def cornish_fisher_var(mean, std, skewness, kurtosis, levels=DEFAULT_LEVELS, horizon=1):
+    """
+    Cornish-Fisher修正VaR
+
+    偏度按 1/√h、超额峰度按 1/h 缩放到持有期（独立同分布假设）
+
+    Returns:
+        np.ndarray: VaR (L)
+    """
+    levels = _levels(levels)
+    z = np.array([_NORMAL.inv_cdf(1 - level) for level in levels])
+    s = skewness / np.sqrt(horizon)
+    k = kurtosis / horizon
+    z_cf = (z + (z ** 2 - 1) * s / 6 + (z ** 3 - 3 * z) * k / 24
+            - (2 * z ** 3 - 5 * z) * s ** 2 / 36)
+    return -(mean * horizon + z_cf * std * np.sqrt(horizon))
+
+
+def risk_contributions(weights, covariance_matrix, mean=None, levels=DEFAULT_LEVELS, horizon=1):
+    """
+    组合波动率的边际和成分风险贡献，以及正态VaR的成分分解
+
+    Args:
+        weights: 组合权重 (N)
+        covariance_matrix: 单期协方差矩阵 (N x N)
+        mean: 单期期望收益率 (N)，提供时成分VaR包含均值项
+
+    Returns:
+        dict: volatility、marginal (N)、component (N)、percent (N)、componentVaR (L x N)
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    cov = np.asarray(covariance_matrix, dtype=np.float64)
+    levels = _levels(levels)
+    cov_w = cov @ weights
+    volatility = float(np.sqrt(max(weights @ cov_w, 0.0)))
+    marginal = cov_w / volatility if volatility > 0 else np.zeros_like(weights)
+    component = weights * marginal
+    percent = component / volatility if volatility > 0 else np.zeros_like(weights)
+
+    z = np.array([_NORMAL.inv_cdf(1 - level) for level in levels])
+    mean = np.zeros_like(weights) if mean is None else np.asarray(mean, dtype=np.float64)
+    component_var = -(weights * mean * horizon)[None, :] - z[:, None] * np.sqrt(horizon) * component[None, :]
+    return {
+        'volatility': volatility,
+        'marginal': marginal,
+        'component': component,
+        'percent': percent,
+        'componentVaR': component_var
+    }
+
+
+def _cholesky(cov):
+    """协方差矩阵的Cholesky因子，非正定时按特征分解截断负特征值"""
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(cov)
+        return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+
+_MC_STATE = None
+
+
+def _init_simulation(state):
+    global _MC_STATE
+    _MC_STATE = state
+
+
+def _simulate_chunk(task):
+    """模拟一批路径，返回各路径的组合持有期收益率"""
+    size, seed = task
+    mean, factor, weights, horizon = _MC_STATE
+    rng = np.random.default_rng(seed)
+    n_assets = len(mean)
+    growth = np.ones((size, n_assets))
+    for _ in range(horizon):
+        draws = rng.standard_normal((size, n_assets)) @ factor.T + mean
+        growth *= 1 + draws
+    return (growth - 1) @ weights
+
+
+def monte_carlo_var(mean, covariance_matrix, weights, n_paths, levels=DEFAULT_LEVELS, horizon=1,
+                    seed=None, chunk_size=None, max_workers=None):
+    """
+    蒙特卡洛VaR和CVaR
+
+    每批路径使用由seed派生的独立随机数流，结果与进程数无关；
+    相同的seed和chunk_size得到相同的结果。
+
+    Args:
+        mean: 单期期望收益率 (N)
+        covariance_matrix: 单期协方差矩阵 (N x N)
+        weights: 组合权重 (N)
+        n_paths: 路径数
+        horizon: 持有期（期数），各期收益率逐期复利
+        chunk_size: 每批路径数，默认按 MC_CHUNK_DRAWS 限制单批内存
+        max_workers: 最大进程数，默认CPU核数；随机数总数不超过 MC_PARALLEL_DRAWS 时在当前进程执行
+
+    Returns:
+        tuple: (VaR (L), CVaR (L))
+    """
+    mean = np.asarray(mean, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    n_paths = int(n_paths)
+    horizon = int(horizon)
+    if n_paths <= 0 or n_paths > MAX_MC_PATHS:
+        raise ValueError(f'路径数须在 1 到 {MAX_MC_PATHS} 之间')
+    if horizon <= 0:
+        raise ValueError('持有期必须为正整数')
+    n_assets = len(mean)
+    if chunk_size is None:
+        chunk_size = max(MC_CHUNK_DRAWS // n_assets, 1)
+    chunk_size = max(int(chunk_size), 1)
+
+    state = (mean, _cholesky(np.asarray(covariance_matrix, dtype=np.float64)), weights, horizon)
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = list(zip(sizes, seeds))
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    if max_workers <= 1 or len(tasks) <= 1 or n_paths * horizon * n_assets <= MC_PARALLEL_DRAWS:
+        _init_simulation(state)
+        outcomes = [_simulate_chunk(task) for task in tasks]
+    else:
+        # 均值、Cholesky因子和权重在每个进程初始化时传递一次
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)),
+                                 initializer=_init_simulation, initargs=(state,)) as pool:
+            outcomes = list(pool.map(_simulate_chunk, tasks))
+    return historical_var(np.concatenate(outcomes), levels)
+
+
+def _horizon_returns(returns, horizon):
+    """重叠的h期累计收益率（逐期复利）"""
+    if horizon == 1:
+        return returns
+    growth = np.cumprod(1 + returns, axis=0)
+    growth = np.vstack([np.ones((1, returns.shape[1])), growth])
+    return growth[horizon:] / growth[:-horizon] - 1
+
+
+def risk_report(prices, weights=None, levels=DEFAULT_LEVELS, horizon=1, mc_paths=0, seed=None,
+                chunk_size=None, max_workers=None):
+    """
+    组合风险分析
+
+    Args:
+        prices: 对齐后的价格面板 (T x N)
+        weights: 组合权重 (N)，默认等权
+        levels: 置信水平列表
+        horizon: 持有期（期数）
+        mc_paths: 蒙特卡洛路径数，为0时不计算蒙特卡洛VaR
+        seed、chunk_size、max_workers: 见 monte_carlo_var
+
+    Returns:
+        dict: levels、horizon、moments、portfolio（historical/parametric/cornishFisher/monteCarlo
+            各置信水平的var与cvar）、assetRisk（各资产的历史VaR与CVaR）、contributions
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim != 2 or prices.shape[1] == 0:
+        raise ValueError('价格面板必须是二维数组 (T x N)')
+    if not np.all(np.isfinite(prices)):
+        raise ValueError('价格面板不能包含缺失值')
+    n_assets = prices.shape[1]
+    levels = _levels(levels)
+    horizon = int(horizon)
+    if horizon <= 0:
+        raise ValueError('持有期必须为正整数')
+    if weights is None:
+        weights = np.full(n_assets, 1.0 / n_assets)
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.shape != (n_assets,):
+        raise ValueError('组合权重数量与资产数量不一致')
+
+    returns = simple_returns(prices)
+    if len(returns) < horizon + 1:
+        raise ValueError('价格序列长度不足以覆盖持有期')
+    mean = returns.mean(axis=0)
+    cov = np.cov(returns, rowvar=False).reshape(n_assets, n_assets)
+
+    # 组合作为最后一列，与各资产一起做一次部分排序（组合按固定权重逐期再平衡）
+    panel = np.column_stack([returns, returns @ weights])
+    var, cvar = historical_var(_horizon_returns(panel, horizon), levels)
+    p_mean, p_std, skewness, kurtosis = _moments(panel[:, -1])
+    normal_var, normal_cvar = parametric_var(p_mean, p_std, levels, horizon)
+
+    portfolio = {
+        'historical': {'var': var[:, -1], 'cvar': cvar[:, -1]},
+        'parametric': {'var': normal_var, 'cvar': normal_cvar},
+        'cornishFisher': {'var': cornish_fisher_var(p_mean, p_std, skewness, kurtosis, levels, horizon)},
+        'monteCarlo': None
+    }
+    if mc_paths:
+        mc_var, mc_cvar = monte_carlo_var(mean, cov, weights, mc_paths, levels, horizon, seed,
+                                          chunk_size, max_workers)
+        portfolio['monteCarlo'] = {'var': mc_var, 'cvar': mc_cvar, 'paths': int(mc_paths)}
+
+    return {
+        'levels': levels,
+        'horizon': horizon,
+        'moments': {
+            'mean': float(p_mean),
+            'volatility': float(p_std),
+            'skewness': float(skewness),
+            'kurtosis': float(kurtosis)
+        },
+        'portfolio': portfolio,
+        'assetRisk': {'var': var[:, :-1], 'cvar': cvar[:, :-1]},
+        'contributions': risk_contributions(weights, cov, mean, levels, horizon)
+    }
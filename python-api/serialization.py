@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出序列化 - K线数据的行式/列式构建和响应编码
+
+行式（默认）：historicalPrices 为每根K线一个字典，与前端现有格式一致。
+列式（可选）：historicalColumns 为每个字段一个数组，直接由DataFrame列生成，
+不再逐行构建字典，也不重复输出字段名。
+
+编码方式：
+    json    - 标准库json（默认）
+    orjson  - 使用orjson（若已安装）加速编码，输出仍为JSON
+    msgpack - MessagePack二进制编码（需要安装msgpack）
+"""
+import json
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+OUTPUT_FORMATS = ('rows', 'columnar')
+ENCODINGS = ('json', 'orjson', 'msgpack')
+
+
+def build_price_columns(df):
+    """
+    由K线DataFrame构建列式价格数据，开高低价缺失时以收盘价代替，成交量缺失记为0
+
+    Returns:
+        dict: dates/open/high/low/close/volume 各一个数组
+    """
+    close = df['close'].to_numpy(dtype=np.float64)
+    columns = {
+        'dates': df['date'].dt.strftime('%Y-%m-%d').tolist(),
+        'open': None,
+        'high': None,
+        'low': None,
+        'close': close.tolist(),
+        'volume': df['volume'].fillna(0).to_numpy(dtype=np.float64).astype(np.int64).tolist()
+    }
+    for col in ('open', 'high', 'low'):
+        values = df[col].to_numpy(dtype=np.float64)
+        columns[col] = np.where(np.isnan(values), close, values).tolist()
+    return columns
+
+
+def build_price_rows(df):
+    """
+    由K线DataFrame构建行式价格数据（每根K线一个字典）
+
+    Returns:
+        list: [{'date', 'open', 'high', 'low', 'close', 'price', 'volume'}]
+    """
+    columns = build_price_columns(df)
+    return [
+        {
+            'date': date,
+            'open': o,
+            'high': h,
+            'low': l,
+            'close': c,
+            'price': c,  # 保持兼容性
+            'volume': v
+        }
+        for date, o, h, l, c, v in zip(
+            columns['dates'], columns['open'], columns['high'],
+            columns['low'], columns['close'], columns['volume']
+        )
+    ]
+
+
+def _default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def dumps_json(obj):
+    """编码为JSON字符串，已安装orjson时使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, default=_default)
+
+
+def check_encoding(encoding):
+    """检查编码方式是否可用，不可用时抛出ValueError"""
+    if encoding not in ENCODINGS:
+        raise ValueError(f'不支持的编码方式: {encoding}')
+    if encoding == 'orjson' and orjson is None:
+        raise ValueError('未安装orjson，无法使用orjson编码')
+    if encoding == 'msgpack' and msgpack is None:
+        raise ValueError('未安装msgpack，无法使用msgpack编码')
+
+
+def encode_response(obj, encoding='json'):
+    """
+    按指定方式编码响应
+
+    Args:
+        obj: 响应对象
+        encoding: 'json'、'orjson' 或 'msgpack'
+
+    Returns:
+        bytes: 编码后的数据
+    """
+    check_encoding(encoding)
+    if encoding == 'orjson':
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    if encoding == 'msgpack':
+        return msgpack.packb(obj, default=_default, use_bin_type=True)
+    return json.dumps(obj, ensure_ascii=False, default=_default).encode('utf-8')
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字符串相似度计算 - 位并行最长公共子序列（LCS）
+
+相似度定义与原calculate_string_similarity一致：
+    LCS长度 / max(len(s1), len(s2))，比较前转小写并去除空格。
+
+单次比较使用Python大整数实现的Hyyrö位并行算法；批量比较把名称库预先编码为
+(最大长度 x 名称数) 的码点矩阵，对查询串的位向量在所有名称上同时迭代，
+一次调用即可对整个名称库打分。
+"""
+import numpy as np
+
+# 查询串超过该长度时无法放入uint64位向量，退回逐个计算
+_WORD_BITS = 64
+
+
+def normalize_name(name):
+    """转换为小写并去除空格"""
+    return name.lower().replace(' ', '')
+
+
+def lcs_length(x, y):
+    """
+    位并行计算最长公共子序列长度（Hyyrö算法）
+
+    对x的每个字符建立匹配位掩码，然后按y的每个字符更新位向量V，
+    最终V中为0的位数即LCS长度。复杂度 O(len(y) * ceil(len(x) / 字长))。
+    """
+    m = len(x)
+    if m == 0 or not y:
+        return 0
+
+    masks = {}
+    for i, ch in enumerate(x):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+
+    full = (1 << m) - 1
+    v = full
+    for ch in y:
+        u = v & masks.get(ch, 0)
+        v = ((v + u) | (v - u)) & full
+    return m - bin(v).count('1')
+
+
+def calculate_string_similarity(str1, str2):
+    """
+    计算两个字符串的相似度
+    """
+    if not str1 or not str2:
+        return 0.0
+
+    s1 = normalize_name(str1)
+    s2 = normalize_name(str2)
+
+    max_len = max(len(s1), len(s2))
+    if max_len == 0:
+        return 1.0
+
+    return lcs_length(s1, s2) / max_len
+
+
+def _popcount(values):
+    """uint64数组逐元素计算置位数"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    bits = np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1)
+    return bits.sum(axis=1).astype(np.int64)
+
+
+class SimilarityIndex:
+    """预编码的名称库，支持一次对全部名称计算相似度"""
+
+    def __init__(self, names):
+        self.names = list(names)
+        normalized = [normalize_name(n) if isinstance(n, str) and n else '' for n in self.names]
+        self._normalized = normalized
+        # 原始名称为空的条目不参与比较
+        self._valid = np.array([isinstance(n, str) and bool(n) for n in self.names], dtype=bool)
+        self.lengths = np.array([len(n) for n in normalized], dtype=np.int64)
+
+        width = int(self.lengths.max()) if len(normalized) else 0
+        # 码点整体+1，0表示填充位
+        codes = np.zeros((width, len(normalized)), dtype=np.int64)
+        for k, name in enumerate(normalized):
+            if name:
+                codes[:len(name), k] = np.frombuffer(name.encode('utf-32-le'), dtype=np.uint32) + 1
+        self._codes = codes
+        self._max_code = int(codes.max()) if codes.size else 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def lcs_lengths(self, query):
+        """返回查询串与每个名称的LCS长度数组"""
+        q = normalize_name(query)
+        m = len(q)
+        if m == 0 or len(self.names) == 0:
+            return np.zeros(len(self.names), dtype=np.int64)
+
+        if m > _WORD_BITS:
+            return np.array([lcs_length(q, name) for name in self._normalized], dtype=np.int64)
+
+        # 每个码点对应的查询串匹配位掩码，未出现的码点（含填充位0）为0
+        lut = np.zeros(self._max_code + 1, dtype=np.uint64)
+        for i, ch in enumerate(q):
+            code = ord(ch) + 1
+            if code <= self._max_code:
+                lut[code] |= np.uint64(1 << i)
+
+        full = np.uint64((1 << m) - 1) if m < _WORD_BITS else np.uint64(0xFFFFFFFFFFFFFFFF)
+        v = np.full(len(self.names), full, dtype=np.uint64)
+        for column in self._codes:
+            u = v & lut[column]
+            v = (v + u) | (v - u)
+        return m - _popcount(v & full)
+
+    def scores(self, query):
+        """返回查询串与每个名称的相似度数组"""
+        if not query:
+            return np.zeros(len(self.names))
+        m = len(normalize_name(query))
+        lcs = self.lcs_lengths(query)
+        max_len = np.maximum(self.lengths, m)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = np.where(max_len > 0, lcs / np.maximum(max_len, 1), 1.0)
+        return np.where(self._valid, result, 0.0)
+
+    def top_k(self, query, k=5, threshold=0.0):
+        """
+        返回相似度最高的k个候选
+
+        Args:
+            query: 查询串
+            k: 返回的候选数量
+            threshold: 只返回相似度严格大于该值的候选
+
+        Returns:
+            list: [(名称下标, 相似度)]，按相似度降序，相同相似度按下标升序
+        """
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores > threshold)
+        if len(candidates) == 0:
+            return []
+        # 先按下标、再按分数稳定排序，保证相同分数时靠前的名称优先
+        order = candidates[np.argsort(-scores[candidates], kind='stable')][:k]
+        return [(int(i), float(scores[i])) for i in order]
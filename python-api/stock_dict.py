@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+二进制股票字典 - 可mmap读取的紧凑格式，首次使用时加载，过期后后台刷新
+
+文件格式（stock_dict_latest.bin）：
+    8字节魔数 b'MPSD0001' + 4字节头部长度（小端） + JSON头部 + 按8字节对齐的各数组段
+    头部记录生成时间、数据源以及每个数组段的 [偏移, dtype, 长度]。
+
+数组段：
+    name_blob/name_offsets    名称UTF-8拼接及偏移（保持name_to_code原有顺序）
+    name_codes                每个名称对应的代码下标
+    code_blob/code_offsets    代码拼接及偏移（保持code_to_name原有顺序）
+    code_names                每个代码对应的名称下标
+    name_sorted/code_sorted   按UTF-8字节排序的下标，用于二分查找
+    clean_blob/clean_offsets  去掉常见后缀后的名称（预先计算的搜索键）
+
+读取时只做mmap和少量头部解析，不解析JSON字典；写入先写临时文件再原子替换，
+正在读取旧文件的进程不受影响。
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import subprocess
+import threading
+from datetime import datetime
+import numpy as np
+from log_utils import get_logger
+from stock_resolver import strip_keywords
+from bar_store import file_lock
+
+logger = get_logger('stock_dict')
+
+MAGIC = b'MPSD0001'
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STOCK_DICT_PATH = os.environ.get('STOCK_DICT_PATH', os.path.join(BASE_DIR, 'stock_dict_latest.bin'))
+STOCK_DICT_JSON = os.path.join(BASE_DIR, 'stock_dict_latest.json')
+# 字典生成时间超过该秒数视为过期，触发后台刷新
+STOCK_DICT_MAX_AGE = float(os.environ.get('STOCK_DICT_MAX_AGE', str(7 * 86400)))
+# 检查字典文件是否被替换的最短间隔（秒）
+CHECK_INTERVAL = 60
+# 刷新失败后的重试间隔（秒），连续失败时逐次翻倍，最长REFRESH_BACKOFF_MAX
+REFRESH_BACKOFF = float(os.environ.get('STOCK_DICT_REFRESH_BACKOFF', '600'))
+REFRESH_BACKOFF_MAX = 86400
+# 刷新进程超过该秒数仍未记录结果，视为异常退出（按失败计）
+REFRESH_TIMEOUT = 1800
+
+_SECTIONS = ('name_blob', 'name_offsets', 'name_codes', 'code_blob', 'code_offsets',
+             'code_names', 'name_sorted', 'code_sorted', 'clean_blob', 'clean_offsets')
+
+
+def _encode_strings(strings):
+    """字符串列表编码为 (UTF-8拼接, 偏移数组)"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int32)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def write_stock_dictionary(stock_dict, path=STOCK_DICT_PATH):
+    """
+    将 {'name_to_code', 'code_to_name', 'generated_time', 'data_source'} 写为二进制字典
+
+    先写临时文件再用os.replace原子替换。
+    """
+    name_to_code = stock_dict.get('name_to_code', {})
+    code_to_name = stock_dict.get('code_to_name', {})
+    names = [name for name in name_to_code if name]
+    codes = list(dict.fromkeys(list(code_to_name) + [name_to_code[name] for name in names]))
+    name_index = {name: i for i, name in enumerate(names)}
+    code_index = {code: i for i, code in enumerate(codes)}
+
+    name_blob, name_offsets = _encode_strings(names)
+    code_blob, code_offsets = _encode_strings(codes)
+    clean_blob, clean_offsets = _encode_strings([strip_keywords(name) for name in names])
+    arrays = {
+        'name_blob': name_blob,
+        'name_offsets': name_offsets,
+        'name_codes': np.array([code_index[name_to_code[name]] for name in names], dtype=np.int32),
+        'code_blob': code_blob,
+        'code_offsets': code_offsets,
+        'code_names': np.array([name_index.get(code_to_name.get(code), -1) for code in codes],
+                               dtype=np.int32),
+        'name_sorted': np.array(sorted(range(len(names)), key=lambda i: names[i].encode('utf-8')),
+                                dtype=np.int32),
+        'code_sorted': np.array(sorted(range(len(codes)), key=lambda i: codes[i].encode('utf-8')),
+                                dtype=np.int32),
+        'clean_blob': clean_blob,
+        'clean_offsets': clean_offsets
+    }
+
+    # 先确定头部长度再计算各段偏移（偏移相对文件开头，按8字节对齐）
+    header = {
+        'generated_time': stock_dict.get('generated_time'),
+        'data_source': stock_dict.get('data_source', 'baostock'),
+        'total_count': stock_dict.get('total_count', len(codes)),
+        'sections': {name: [0, arrays[name].dtype.str, len(arrays[name])] for name in _SECTIONS}
+    }
+    placeholder = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    # 偏移数字变长后头部会变长，预留空间
+    header_size = len(placeholder) + 16 * len(_SECTIONS)
+    offset = (len(MAGIC) + 4 + header_size + 7) // 8 * 8
+    for name in _SECTIONS:
+        header['sections'][name][0] = offset
+        offset = (offset + arrays[name].nbytes + 7) // 8 * 8
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8').ljust(header_size)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', header_size))
+        f.write(header_bytes)
+        for name in _SECTIONS:
+            f.seek(header['sections'][name][0])
+            f.write(arrays[name].tobytes())
+        f.truncate(offset)
+    os.replace(tmp_path, path)
+    return path
+
+
+class StockDictionary:
+    """mmap读取的二进制股票字典，支持名称与代码双向查找"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mtime = os.fstat(f.fileno()).st_mtime
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'不是有效的股票字典文件: {path}')
+        header_size = struct.unpack_from('<I', self._mmap, len(MAGIC))[0]
+        start = len(MAGIC) + 4
+        header = json.loads(self._mmap[start:start + header_size].decode('utf-8').rstrip())
+        self.generated_time = header.get('generated_time')
+        self.data_source = header.get('data_source')
+        self.total_count = header.get('total_count')
+        for name, (offset, dtype, length) in header['sections'].items():
+            setattr(self, f'_{name}', np.frombuffer(self._mmap, dtype=dtype, count=length, offset=offset))
+        self._names = None
+
+    def __len__(self):
+        return len(self._name_codes)
+
+    @staticmethod
+    def _bytes_at(blob, offsets, i):
+        return blob[offsets[i]:offsets[i + 1]].tobytes()
+
+    def _search(self, blob, offsets, order, key):
+        """在按字节排序的下标order中二分查找key，返回下标或None"""
+        target = key.encode('utf-8')
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes_at(blob, offsets, order[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and self._bytes_at(blob, offsets, order[lo]) == target:
+            return int(order[lo])
+        return None
+
+    def code_for(self, name):
+        """名称 -> 代码，不存在时返回None"""
+        i = self._search(self._name_blob, self._name_offsets, self._name_sorted, name)
+        if i is None:
+            return None
+        return self._bytes_at(self._code_blob, self._code_offsets, self._name_codes[i]).decode('utf-8')
+
+    def name_for(self, code):
+        """代码 -> 名称，不存在时返回None"""
+        i = self._search(self._code_blob, self._code_offsets, self._code_sorted, code)
+        if i is None or self._code_names[i] < 0:
+            return None
+        return self._bytes_at(self._name_blob, self._name_offsets, self._code_names[i]).decode('utf-8')
+
+    @staticmethod
+    def _decode_all(blob, offsets):
+        data = blob.tobytes()
+        bounds = offsets.tolist()
+        return [data[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+    def names(self):
+        """按原字典顺序的全部名称"""
+        if self._names is None:
+            self._names = self._decode_all(self._name_blob, self._name_offsets)
+        return self._names
+
+    def clean_names(self):
+        """预先计算的去后缀名称，与names()一一对应"""
+        return self._decode_all(self._clean_blob, self._clean_offsets)
+
+    def name_to_code(self):
+        """按原字典顺序的 名称 -> 代码 映射"""
+        codes = self._decode_all(self._code_blob, self._code_offsets)
+        return dict(zip(self.names(), (codes[i] for i in self._name_codes.tolist())))
+
+    def age_seconds(self):
+        """字典生成至今的秒数，生成时间未知时返回None"""
+        if not self.generated_time:
+            return None
+        try:
+            generated = datetime.strptime(self.generated_time, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return None
+        return (datetime.now() - generated).total_seconds()
+
+
+_CURRENT = None
+_CHECKED_AT = 0.0
+_REFRESH = None
+_REFRESH_LOG = None
+_LOCK = threading.Lock()
+
+
+def _convert_json(path):
+    """二进制字典不存在时由JSON字典转换生成"""
+    if not os.path.exists(STOCK_DICT_JSON):
+        return False
+    with open(STOCK_DICT_JSON, 'r', encoding='utf-8') as f:
+        stock_dict = json.load(f)
+    write_stock_dictionary(stock_dict, path)
+    logger.info(f'已由JSON字典生成二进制股票字典: {path}')
+    return True
+
+
+def _refresh_state_path(path):
+    """记录最近一次刷新尝试及结果的状态文件"""
+    return f'{path}.refresh.json'
+
+
+def _read_refresh_state(path):
+    try:
+        with open(_refresh_state_path(path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_refresh_state(path, state):
+    state_path = _refresh_state_path(path)
+    tmp_path = f'{state_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def _refresh_due(state, now):
+    """
+    根据状态判断是否可以发起新的刷新
+
+    正在刷新（未超时）时不重复发起；上次失败时按连续失败次数指数退避。
+    """
+    status = state.get('status')
+    failures = state.get('failures', 0)
+    finished_at = state.get('finished_at', 0)
+    if status == 'running':
+        started_at = state.get('started_at', 0)
+        if now - started_at < REFRESH_TIMEOUT:
+            return False
+        # 刷新进程没有记录结果就退出了，按一次失败计算退避
+        failures += 1
+        finished_at = started_at + REFRESH_TIMEOUT
+    elif status != 'failed':
+        return True
+    backoff = min(REFRESH_BACKOFF * 2 ** max(failures - 1, 0), REFRESH_BACKOFF_MAX)
+    return now - finished_at >= backoff
+
+
+def record_refresh_result(success, path=STOCK_DICT_PATH):
+    """
+    记录一次刷新的结果（由generate_stock_dict.py在结束时调用）
+
+    成功时清零失败计数，失败时累加，供后续刷新计算退避时间。
+    """
+    with file_lock(path):
+        state = _read_refresh_state(path)
+        failures = state.get('failures', 0)
+        _write_refresh_state(path, {
+            'status': 'ok' if success else 'failed',
+            'started_at': state.get('started_at'),
+            'finished_at': time.time(),
+            'failures': 0 if success else failures + 1
+        })
+
+
+def _reap_refresh():
+    """回收已结束的刷新进程，非零退出码记录到日志"""
+    global _REFRESH
+    if _REFRESH is None or _REFRESH.poll() is None:
+        return
+    if _REFRESH.returncode != 0:
+        logger.warning(f'股票字典刷新失败（退出码 {_REFRESH.returncode}），详见 {_REFRESH_LOG}')
+    _REFRESH = None
+
+
+def _start_refresh(path=STOCK_DICT_PATH):
+    """
+    在独立进程中重新生成字典（baostock会话不是线程安全的，不与当前进程共享）
+
+    状态文件的读写和进程启动都在文件锁内完成，多个进程同时发现字典过期时只有一个会刷新；
+    刷新失败后按指数退避重试，不会每次检查都重新拉取。
+    """
+    global _REFRESH, _REFRESH_LOG
+    _reap_refresh()
+    if _REFRESH is not None:
+        return
+    with file_lock(path):
+        state = _read_refresh_state(path)
+        now = time.time()
+        if not _refresh_due(state, now):
+            return
+        failures = state.get('failures', 0)
+        if state.get('status') == 'running':
+            failures += 1
+        script = os.path.join(BASE_DIR, 'generate_stock_dict.py')
+        logger.info('股票字典已过期，后台刷新中...')
+        # stdout不能继承：常驻进程的stdout是协议通道；stderr写入日志文件便于排查
+        _REFRESH_LOG = f'{path}.refresh.log'
+        with open(_REFRESH_LOG, 'a') as log_file:
+            _REFRESH = subprocess.Popen(
+                [sys.executable, script, '--output', path, '--quiet'],
+                cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=log_file, stdin=subprocess.DEVNULL
+            )
+        _write_refresh_state(path, {
+            'status': 'running',
+            'started_at': now,
+            'finished_at': state.get('finished_at'),
+            'failures': failures,
+            'pid': _REFRESH.pid
+        })
+
+
+def get_stock_dictionary(path=STOCK_DICT_PATH, refresh=True):
+    """
+    获取当前的股票字典（首次调用时加载）
+
+    每隔CHECK_INTERVAL秒检查一次文件是否被替换，替换后加载新文件；
+    字典过期时启动后台进程刷新（失败后指数退避），刷新完成前继续使用旧字典。
+
+    Returns:
+        StockDictionary: 字典不存在且无法生成时返回None
+    """
+    global _CURRENT, _CHECKED_AT
+    now = time.monotonic()
+    with _LOCK:
+        if _CURRENT is not None and now - _CHECKED_AT < CHECK_INTERVAL:
+            return _CURRENT
+        _CHECKED_AT = now
+        try:
+            if not os.path.exists(path) and not _convert_json(path):
+                logger.warning(f'股票字典文件不存在: {path}')
+                return _CURRENT
+            if _CURRENT is None or os.path.getmtime(path) != _CURRENT.mtime:
+                _CURRENT = StockDictionary(path)
+                logger.info(f'成功加载股票字典: {len(_CURRENT)} 支股票映射')
+        except Exception as e:
+            logger.error(f'加载股票字典时出错: {e}')
+            return _CURRENT
+
+        age = _CURRENT.age_seconds()
+        if refresh and age is not None and age > STOCK_DICT_MAX_AGE:
+            try:
+                _start_refresh(path)
+            except Exception as e:
+                logger.error(f'启动股票字典刷新失败: {e}')
+        return _CURRENT
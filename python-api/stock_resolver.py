@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股票名称解析索引 - 基于股票字典的内存索引，不访问网络
+
+由generate_stock_dict.py生成的name_to_code字典构建，支持精确、前缀、
+子串（n-gram倒排索引）、去后缀关键词和字符修正查找。
+匹配规则与search_stock_by_name_enhanced原有的逐条扫描一致：
+多个名称同时命中时返回字典中最靠前的一个。
+"""
+import bisect
+
+# 字典关键词匹配时去掉的后缀
+DICT_KEYWORD_SUFFIXES = ('控股', '集团', '股份')
+
+# 常见的字符混淆，例如："华运控股" -> "华远控股"
+CHAR_REPLACEMENTS = [
+    ('运', '远'),  # 华运 -> 华远
+    ('华运', '华远'),  # 直接替换
+    ('银行', ''),   # 去掉银行后缀再匹配
+    ('集团', ''),   # 去掉集团后缀再匹配
+]
+
+
+def strip_keywords(name, suffixes=DICT_KEYWORD_SUFFIXES):
+    """去掉名称中的常见后缀关键词"""
+    for suffix in suffixes:
+        name = name.replace(suffix, '')
+    return name.strip()
+
+
+def _build_gram_index(names):
+    """构建单字和双字的倒排索引，倒排列表按字典顺序（rank）递增"""
+    index = {}
+    for rank, name in enumerate(names):
+        grams = set(name)
+        grams.update(name[i:i + 2] for i in range(len(name) - 1))
+        for gram in grams:
+            index.setdefault(gram, []).append(rank)
+    return index
+
+
+class StockNameResolver:
+    """股票名称解析器，所有查找都在内存中完成"""
+
+    def __init__(self, name_to_code, clean_names=None):
+        """
+        Args:
+            name_to_code: 名称 -> 代码，顺序决定同分候选的先后
+            clean_names: 可选，预先计算的去后缀名称（与name_to_code中的非空名称一一对应）
+        """
+        self.names = [name for name in name_to_code if name]
+        self.codes = [name_to_code[name] for name in self.names]
+        self.rank_of = {}
+        for rank, name in enumerate(self.names):
+            self.rank_of.setdefault(name, rank)
+
+        # 前缀查找使用排序后的名称
+        self._sorted = sorted(range(len(self.names)), key=lambda r: self.names[r])
+        self._sorted_names = [self.names[r] for r in self._sorted]
+
+        self._grams = _build_gram_index(self.names)
+        if clean_names is None or len(clean_names) != len(self.names):
+            clean_names = [strip_keywords(name) for name in self.names]
+        self._clean_names = list(clean_names)
+        self._clean_grams = _build_gram_index(self._clean_names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def exact(self, name):
+        """精确查找，返回rank或None"""
+        return self.rank_of.get(name)
+
+    def prefix(self, prefix, limit=10):
+        """前缀查找，按名称排序返回最多limit个rank"""
+        lo = bisect.bisect_left(self._sorted_names, prefix)
+        ranks = []
+        for i in range(lo, len(self._sorted_names)):
+            if not self._sorted_names[i].startswith(prefix) or len(ranks) >= limit:
+                break
+            ranks.append(self._sorted[i])
+        return ranks
+
+    def _first_containing(self, fragment, names, grams):
+        if not fragment:
+            return 0 if names else None
+        if len(fragment) == 1:
+            postings = grams.get(fragment, [])
+            return postings[0] if postings else None
+
+        # 以最短的双字倒排列表作为候选集，逐个验证
+        shortest = None
+        for i in range(len(fragment) - 1):
+            postings = grams.get(fragment[i:i + 2])
+            if not postings:
+                return None
+            if shortest is None or len(postings) < len(shortest):
+                shortest = postings
+        for rank in shortest:
+            if fragment in names[rank]:
+                return rank
+        return None
+
+    def first_containing(self, fragment):
+        """返回名称包含fragment的最靠前的rank"""
+        return self._first_containing(fragment, self.names, self._grams)
+
+    def first_containing_keyword(self, keyword):
+        """返回去后缀后的名称包含keyword的最靠前的rank"""
+        return self._first_containing(keyword, self._clean_names, self._clean_grams)
+
+    def first_contained_in(self, text):
+        """返回名称是text子串的最靠前的rank"""
+        best = None
+        for i in range(len(text)):
+            for j in range(i + 1, len(text) + 1):
+                rank = self.rank_of.get(text[i:j])
+                if rank is not None and (best is None or rank < best):
+                    best = rank
+        return best
+
+    def _match(self, rank, match_type, confidence, note):
+        return {
+            'found': True,
+            'stock_code': self.codes[rank],
+            'matched_name': self.names[rank],
+            'match_type': match_type,
+            'confidence': confidence,
+            'note': note
+        }
+
+    def resolve(self, asset_name):
+        """
+        在字典中解析资产名称
+
+        Args:
+            asset_name: 用户输入的资产名称
+
+        Returns:
+            dict: 与search_stock_by_name_enhanced格式一致的匹配结果，未找到返回None
+        """
+        rank = self.exact(asset_name)
+        if rank is not None:
+            return self._match(rank, 'exact_mapping', 1.0, '精确映射匹配')
+
+        # 原逐条扫描中，靠前的股票优先；同一股票按规则顺序优先
+        candidates = []
+
+        if '华运' in asset_name:
+            rank = self.first_containing('华远')
+            if rank is not None:
+                candidates.append((rank, 0, 'dictionary_fuzzy', 0.9, '字典模糊匹配: {} -> {}'))
+
+        contains_ranks = [r for r in (self.first_containing(asset_name),
+                                      self.first_contained_in(asset_name)) if r is not None]
+        if contains_ranks:
+            candidates.append((min(contains_ranks), 1, 'dictionary_contains', 0.8, '字典包含匹配: {} -> {}'))
+
+        clean_asset_name = strip_keywords(asset_name)
+        if len(clean_asset_name) >= 2:
+            rank = self.first_containing_keyword(clean_asset_name)
+            if rank is not None:
+                candidates.append((rank, 2, 'dictionary_keyword', 0.7, '字典关键词匹配: {} -> {}'))
+
+        if candidates:
+            rank, _, match_type, confidence, note = min(candidates)
+            source = clean_asset_name if match_type == 'dictionary_keyword' else asset_name
+            return self._match(rank, match_type, confidence, note.format(source, self.names[rank]))
+
+        return self.resolve_corrected(asset_name)
+
+    def resolve_corrected(self, asset_name):
+        """对常见的字符混淆进行修正后再查找"""
+        for old_char, new_char in CHAR_REPLACEMENTS:
+            if old_char not in asset_name:
+                continue
+            corrected_name = asset_name.replace(old_char, new_char)
+            if not corrected_name or corrected_name == asset_name:
+                continue
+
+            rank = self.exact(corrected_name)
+            if rank is not None:
+                return self._match(rank, 'character_correction', 0.85,
+                                   f'字符修正匹配: {asset_name} -> {corrected_name}')
+
+            rank = self.first_containing(corrected_name)
+            if rank is not None:
+                return self._match(rank, 'character_correction_contains', 0.75,
+                                   f'字符修正包含匹配: {asset_name} -> {corrected_name} -> {self.names[rank]}')
+        return None
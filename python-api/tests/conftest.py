@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""python-api 的模块都是平铺的顶层模块，测试时把其所在目录加入导入路径"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
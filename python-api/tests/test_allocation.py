@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""风险平价与HRP：风险贡献与预算一致，聚类顺序与scipy的单链接聚类一致"""
+import numpy as np
+import pytest
+
+from allocation import risk_parity_weights, hrp_weights, risk_contributions, allocate
+
+
+def _covariance(seed, n_assets, n_factors=3):
+    rng = np.random.default_rng(seed)
+    loadings = rng.normal(size=(n_assets, n_factors))
+    specific = rng.uniform(0.5, 2.0, n_assets)
+    return (loadings @ loadings.T + np.diag(specific)) * 1e-4
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('method', ['newton', 'newton_cg'])
+def test_equal_risk_contributions(seed, method):
+    cov = _covariance(seed, 40)
+    weights, iterations = risk_parity_weights(cov, method=method)
+    assert weights.sum() == pytest.approx(1.0)
+    assert weights.min() > 0
+    np.testing.assert_allclose(risk_contributions(weights, cov), 1.0 / 40, atol=1e-9)
+    assert iterations < 50
+
+
+def test_budgets_and_methods_agree():
+    cov = _covariance(9, 25)
+    budgets = np.linspace(1.0, 3.0, 25)
+    dense, _ = risk_parity_weights(cov, budgets, method='newton')
+    iterative, _ = risk_parity_weights(cov, budgets, method='newton_cg')
+    np.testing.assert_allclose(risk_contributions(dense, cov), budgets / budgets.sum(), atol=1e-9)
+    np.testing.assert_allclose(dense, iterative, rtol=1e-7)
+
+
+def test_matches_slsqp():
+    """与直接最小化风险贡献偏差的SLSQP解对比"""
+    optimize = pytest.importorskip('scipy.optimize')
+    cov = _covariance(5, 8)
+    budgets = np.array([1, 1, 2, 2, 3, 3, 4, 4], dtype=np.float64)
+    budgets /= budgets.sum()
+
+    def objective(y):
+        return 0.5 * y @ cov @ y - budgets @ np.log(y)
+
+    start = 1.0 / np.sqrt(np.diag(cov))
+    reference = optimize.minimize(objective, start, jac=lambda y: cov @ y - budgets / y,
+                                  bounds=[(1e-8, None)] * 8, method='SLSQP',
+                                  options={'ftol': 1e-15, 'maxiter': 1000})
+    weights, _ = risk_parity_weights(cov, budgets)
+    np.testing.assert_allclose(weights, reference.x / reference.x.sum(), rtol=1e-5)
+
+
+def test_closed_forms():
+    # 不相关资产：权重与波动率成反比
+    volatility = np.array([0.1, 0.2, 0.4])
+    weights, _ = risk_parity_weights(np.diag(volatility ** 2))
+    np.testing.assert_allclose(weights, (1 / volatility) / (1 / volatility).sum(), rtol=1e-10)
+    # 两个资产的等风险贡献与相关系数无关
+    cov = np.array([[0.04, 0.018], [0.018, 0.09]])
+    weights, _ = risk_parity_weights(cov)
+    np.testing.assert_allclose(weights, [0.6, 0.4], rtol=1e-10)
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        risk_parity_weights(np.array([[0.0, 0.0], [0.0, 1.0]]))
+    with pytest.raises(ValueError):
+        risk_parity_weights(np.eye(2), budgets=[1.0, -1.0])
+    with pytest.raises(ValueError):
+        hrp_weights(np.ones((2, 3)))
+
+
+def _reference_bisection(cov, order):
+    """López de Prado的递归二分（按列表逐层二分，簇内按方差倒数加权）"""
+    weights = np.ones(len(order))
+    clusters = [list(order)]
+    while clusters:
+        clusters = [c[j:k] for c in clusters for j, k in ((0, len(c) // 2), (len(c) // 2, len(c)))
+                    if len(c) > 1]
+        for i in range(0, len(clusters), 2):
+            left, right = clusters[i], clusters[i + 1]
+            variances = []
+            for items in (left, right):
+                sub = cov[np.ix_(items, items)]
+                inverse = 1 / np.diag(sub)
+                inverse /= inverse.sum()
+                variances.append(inverse @ sub @ inverse)
+            alpha = 1 - variances[0] / sum(variances)
+            weights[left] *= alpha
+            weights[right] *= 1 - alpha
+    return weights
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_hrp_order_and_weights(seed):
+    hierarchy = pytest.importorskip('scipy.cluster.hierarchy')
+    from scipy.spatial.distance import squareform
+
+    cov = _covariance(20 + seed, 30, n_factors=4)
+    std = np.sqrt(np.diag(cov))
+    correlation = cov / np.outer(std, std)
+    weights, order = hrp_weights(cov)
+    assert sorted(order) == list(range(30))
+
+    # 单链接聚类的每个簇在叶子顺序中都是连续的一段
+    distance = np.sqrt(np.clip((1 - correlation) / 2, 0, 1))
+    linkage = hierarchy.linkage(squareform(distance, checks=False), method='single')
+    position = np.empty(30, dtype=np.int64)
+    position[order] = np.arange(30)
+    members = [[i] for i in range(30)]
+    for left, right, _, _ in linkage:
+        cluster = members[int(left)] + members[int(right)]
+        members.append(cluster)
+        spots = position[cluster]
+        assert spots.max() - spots.min() + 1 == len(cluster)
+
+    np.testing.assert_allclose(weights, _reference_bisection(cov, order), rtol=1e-12)
+    assert weights.sum() == pytest.approx(1.0)
+    assert weights.min() > 0
+
+
+def test_hrp_uncorrelated_equal_variance():
+    weights, _ = hrp_weights(np.eye(8) * 0.04)
+    np.testing.assert_allclose(weights, 1 / 8)
+
+
+def test_allocate():
+    cov = _covariance(1, 10)
+    result = allocate(cov)
+    assert set(result) == {'riskParity', 'hrp'}
+    np.testing.assert_allclose(result['riskParity']['riskContributions'], 0.1, atol=1e-9)
+    assert result['hrp']['riskContributions'].sum() == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('method', ['newton', 'newton_cg'])
+def test_not_converged_raises(method):
+    from optimizer import ConvergenceError
+    cov = _covariance(3, 20)
+    with pytest.raises(ConvergenceError) as info:
+        risk_parity_weights(cov, method=method, max_iter=1)
+    assert info.value.iterations == 1
+    # 携带最后一次迭代的权重
+    assert info.value.weights.sum() == pytest.approx(1.0)
+    assert info.value.weights.min() > 0
+
+
+def test_allocation_response_reports_not_converged(monkeypatch):
+    pytest.importorskip('baostock')
+    import functools
+    import allocation
+    import baostock_data
+
+    monkeypatch.setattr(allocation, 'risk_parity_weights',
+                        functools.partial(risk_parity_weights, max_iter=1))
+    response = baostock_data.build_allocation_response(
+        {'covarianceMatrix': _covariance(3, 20).tolist()})
+    assert response['success'] is False
+    assert '未收敛' in response['error']
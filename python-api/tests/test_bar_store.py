@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""K线本地缓存：.npy存储的读写往返，日期区间和分钟线覆盖范围的增量补齐"""
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip('baostock')
+pd = pytest.importorskip('pandas')
+
+import bar_store  # noqa: E402
+from bar_store import STORED_COLUMNS, MINUTE_STORED_COLUMNS  # noqa: E402
+
+
+class FakeResultSet:
+    def __init__(self, fields, rows):
+        self.fields = fields
+        self.error_code = '0'
+        self.error_msg = 'success'
+        self._rows = rows
+        self._i = -1
+
+    def next(self):
+        self._i += 1
+        return self._i < len(self._rows)
+
+    def get_row_data(self):
+        return self._rows[self._i]
+
+
+def _price(day):
+    return 10 + day.toordinal() % 17 * 0.1
+
+
+def _weekdays(start, end):
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def _minute_ends(step):
+    """各交易时段内的K线结束时间（小时, 分钟）"""
+    for session_open, session_close in ((9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60)):
+        for minute in range(session_open + step, session_close + 1, step):
+            yield minute // 60, minute % 60
+
+
+class FakeBaostock:
+    """按日期生成确定性K线的查询替身，记录每次查询的区间"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, code, fields, start_date, end_date, frequency, adjustflag):
+        self.calls.append((frequency, start_date, end_date))
+        fields = fields.split(',')
+        rows = []
+        for day in _weekdays(date.fromisoformat(start_date), date.fromisoformat(end_date)):
+            price = _price(day)
+            # 分钟线的收盘价只取决于K线结束时间、成交量与K线长度成正比，不同频率之间一致
+            ends = [(15, 0, 1000)] if frequency in ('d', 'w', 'm') else [
+                (h, m, int(frequency) * 100) for h, m in _minute_ends(int(frequency))]
+            for h, m, volume in ends:
+                close = price + (h * 60 + m) * 1e-4
+                stamp = f'{day:%Y%m%d}{h:02d}{m:02d}00000'
+                values = {'date': day.isoformat(), 'time': stamp, 'code': code, 'open': close - 0.05,
+                          'high': close + 0.1, 'low': close - 0.1, 'close': close,
+                          'preclose': price - 0.02, 'volume': volume, 'amount': close * volume,
+                          'pctChg': 0.2, 'adjustflag': adjustflag, 'turn': 1.0}
+                rows.append([str(values[f]) for f in fields])
+        return FakeResultSet(fields, rows)
+
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    monkeypatch.setattr(bar_store, 'BAR_STORE_DIR', str(tmp_path))
+    query = FakeBaostock()
+    monkeypatch.setattr(bar_store.bs, 'query_history_k_data_plus', query)
+    return query
+
+
+def test_matrix_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(bar_store, 'BAR_STORE_DIR', str(tmp_path))
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(len(STORED_COLUMNS), 50))
+    matrix[0] = np.arange(19000, 19050)
+    matrix[3, 7] = np.nan
+    meta = {'start': '2022-01-08', 'end': '2022-02-26'}
+    bar_store._write_store('sh.600000', 'd', '3', matrix, meta)
+    stored, stored_meta = bar_store._read_store('sh.600000', 'd', '3')
+    assert isinstance(stored, np.memmap)
+    np.testing.assert_array_equal(stored, matrix)
+    assert stored_meta == meta
+    # 行数不符的文件视为没有缓存
+    bar_store._save_matrix(bar_store._paths('sh.600001', 'd', '3')[0], matrix[:3])
+    bar_store._save_json(bar_store._paths('sh.600001', 'd', '3')[1], meta)
+    assert bar_store._read_store('sh.600001', 'd', '3') == (None, None)
+
+
+def test_merge_prefers_newer_rows():
+    old = np.vstack([np.array([1.0, 2.0, 3.0]), np.full((len(STORED_COLUMNS) - 1, 3), 1.0)])
+    new = np.vstack([np.array([3.0, 4.0]), np.full((len(STORED_COLUMNS) - 1, 2), 2.0)])
+    merged = bar_store._merge(old, None, new)
+    assert merged[0].tolist() == [1.0, 2.0, 3.0, 4.0]
+    assert merged[1].tolist() == [1.0, 1.0, 2.0, 2.0]
+    assert bar_store._merge(None).shape == (len(STORED_COLUMNS), 0)
+
+
+def test_daily_top_up(fake):
+    first = bar_store.load_bars('sh.600000', '2023-03-01', '2023-03-31')
+    assert fake.calls == [('d', '2023-03-01', '2023-03-31')]
+    assert len(first) == 23
+    expected = [_price(d) + 0.09 for d in _weekdays(date(2023, 3, 1), date(2023, 3, 31))]
+    np.testing.assert_allclose(first['close'].values, expected)
+
+    # 已覆盖的子区间不再查询
+    inner = bar_store.load_bars('sh.600000', '2023-03-10', '2023-03-20')
+    assert len(fake.calls) == 1
+    pd.testing.assert_frame_equal(inner.reset_index(drop=True),
+                                  first[(first['date'] >= '2023-03-10') & (first['date'] <= '2023-03-20')]
+                                  .reset_index(drop=True))
+
+    # 向两端扩展时只补齐缺失的首尾区间
+    wider = bar_store.load_bars('sh.600000', '2023-02-15', '2023-04-10')
+    assert fake.calls[1:] == [('d', '2023-02-15', '2023-02-28'), ('d', '2023-04-01', '2023-04-10')]
+    assert wider['date'].is_monotonic_increasing and wider['date'].is_unique
+    _, meta = bar_store._read_store('sh.600000', 'd', '3')
+    assert meta == {'start': '2023-02-15', 'end': '2023-04-10'}
+    bar_store.load_bars('sh.600000', '2023-02-20', '2023-04-01')
+    assert len(fake.calls) == 3
+
+
+def test_today_is_not_persisted(fake):
+    today = date.today()
+    start = today - timedelta(days=10)
+    bar_store.load_bars('sh.600000', start.isoformat(), today.isoformat())
+    stored, meta = bar_store._read_store('sh.600000', 'd', '3')
+    assert meta['end'] == (today - timedelta(days=1)).isoformat()
+    assert stored[0].max() < (today - date(1970, 1, 1)).days
+
+
+def test_weekly_from_daily(fake):
+    bar_store.load_bars('sh.600000', '2023-01-02', '2023-03-31')
+    weekly = bar_store.load_bars('sh.600000', '2023-01-09', '2023-03-31', frequency='w')
+    assert len(fake.calls) == 1
+
+    daily = bar_store.load_bars('sh.600000', '2023-01-09', '2023-03-31').set_index('date')
+    reference = daily.resample('W-FRI').agg({'open': 'first', 'high': 'max', 'low': 'min',
+                                             'close': 'last', 'volume': 'sum', 'amount': 'sum'})
+    reference = reference.dropna()
+    np.testing.assert_allclose(weekly[['open', 'high', 'low', 'close', 'volume', 'amount']].values,
+                               reference.values)
+
+
+def test_minute_coverage_and_derivation(fake):
+    five = bar_store.load_bars('sh.600000', '2023-01-30', '2023-02-03', frequency='5')
+    assert [c[0] for c in fake.calls] == ['5', '5']
+    assert len(five) == 5 * 48
+    coverage = bar_store._read_coverage('sh.600000', '5', '3')
+    assert coverage == {'2023-01': '2023-01-31', '2023-02': '2023-02-03'}
+
+    # 覆盖范围内再次请求不查询；覆盖日期之后的部分只补齐尾部
+    bar_store.load_bars('sh.600000', '2023-02-01', '2023-02-02', frequency='5')
+    assert len(fake.calls) == 2
+    bar_store.load_bars('sh.600000', '2023-02-01', '2023-02-08', frequency='5')
+    assert fake.calls[2] == ('5', '2023-02-04', '2023-02-08')
+    assert bar_store._read_coverage('sh.600000', '5', '3')['2023-02'] == '2023-02-08'
+
+    # 60分钟线由已缓存的5分钟线合成，与直接查询60分钟线的结果一致
+    derived = bar_store.load_bars('sh.600000', '2023-02-01', '2023-02-08', frequency='60')
+    assert len(fake.calls) == 3
+    direct = FakeBaostock()('sh.600000', bar_store.MINUTE_FIELDS, '2023-02-01', '2023-02-08', '60', '3')
+    columns = bar_store.read_result_set(direct)
+    np.testing.assert_array_equal(derived['time'].values.astype('datetime64[m]').astype(np.int64),
+                                  columns['time'])
+    np.testing.assert_allclose(derived['close'].values, columns['close'])
+    np.testing.assert_array_equal(derived['volume'].values, columns['volume'])
+    assert bar_store._read_partition('sh.600000', '60', '3', '2023-02').shape[0] == len(MINUTE_STORED_COLUMNS)
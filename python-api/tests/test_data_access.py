@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""数据访问层：全市场股票列表快照和名称相似度索引的缓存"""
+import pytest
+
+pytest.importorskip('baostock')
+pytest.importorskip('pandas')
+
+import data_access  # noqa: E402
+
+
+class FakeResultSet:
+    def __init__(self, fields, rows, error_code='0'):
+        self.fields = fields
+        self.error_code = error_code
+        self.error_msg = 'success' if error_code == '0' else 'failed'
+        self._rows = rows
+        self._i = -1
+
+    def next(self):
+        self._i += 1
+        return self._i < len(self._rows)
+
+    def get_row_data(self):
+        return self._rows[self._i]
+
+
+UNIVERSES = {
+    '2024-01-05': [['sh.600000', '1', '浦发银行'], ['sz.000002', '1', '万科A']],
+    '2024-01-08': [['sh.600000', '1', '浦发银行'], ['sz.000002', '1', '万科A'],
+                   ['sh.600519', '1', '贵州茅台']],
+}
+
+
+@pytest.fixture
+def market(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_access, 'UNIVERSE_PATH', str(tmp_path / 'universe.json'))
+    monkeypatch.setattr(data_access, '_UNIVERSE', None)
+    monkeypatch.setattr(data_access, '_UNIVERSE_INDEX', None)
+    state = {'latest': '2024-01-05', 'today': '2024-01-06', 'queries': 0, 'builds': 0}
+
+    def query_trade_dates(start_date, end_date):
+        rows = [[day, '1'] for day in sorted(UNIVERSES) if day <= state['latest']]
+        return FakeResultSet(['calendar_date', 'is_trading_day'], rows)
+
+    def query_all_stock(day):
+        state['queries'] += 1
+        return FakeResultSet(['code', 'tradeStatus', 'code_name'], UNIVERSES.get(day, []))
+
+    class FakeDatetime:
+        @staticmethod
+        def now():
+            return data_access.datetime.strptime(state['today'], '%Y-%m-%d')
+
+        strptime = staticmethod(data_access.datetime.strptime)
+
+    original = data_access.SimilarityIndex
+
+    def counting_index(names):
+        state['builds'] += 1
+        return original(names)
+
+    monkeypatch.setattr(data_access.bs, 'query_trade_dates', query_trade_dates)
+    monkeypatch.setattr(data_access.bs, 'query_all_stock', query_all_stock)
+    monkeypatch.setattr(data_access, 'datetime', FakeDatetime)
+    monkeypatch.setattr(data_access, 'SimilarityIndex', counting_index)
+    return state
+
+
+def test_universe_index_built_once_per_snapshot(market):
+    for _ in range(3):
+        universe = data_access.get_stock_universe()
+        index = data_access.get_universe_index(universe)
+        assert index.top_k('万科', k=1, threshold=0.6) == [(1, pytest.approx(2 / 3))]
+    assert market['queries'] == 1
+    assert market['builds'] == 1
+    assert universe['code_name'].tolist() == ['浦发银行', '万科A']
+
+    # 新的交易日有了新的快照，索引随之重建
+    market.update(latest='2024-01-08', today='2024-01-08')
+    universe = data_access.get_stock_universe()
+    index = data_access.get_universe_index(universe)
+    assert market['builds'] == 2
+    assert index.top_k('贵州茅台', k=1) == [(2, 1.0)]
+    data_access.get_universe_index(data_access.get_stock_universe())
+    assert market['builds'] == 2 and market['queries'] == 2
+
+
+def test_recent_trading_days(monkeypatch):
+    rows = [['2024-01-04', '1'], ['2024-01-05', '1'], ['2024-01-06', '0'], ['2024-01-07', '0'],
+            ['2024-01-08', '1']]
+    monkeypatch.setattr(data_access.bs, 'query_trade_dates',
+                        lambda start_date, end_date: FakeResultSet(['calendar_date', 'is_trading_day'], rows))
+    assert data_access.recent_trading_days('2024-01-08', count=2) == ['2024-01-08', '2024-01-05']
+
+
+def test_row_snapshot_is_refetched(market):
+    """旧版本按行保存的快照不再使用"""
+    import json
+    with open(data_access.UNIVERSE_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'day': '2024-01-05', 'fetched_on': '2024-01-06', 'fields': ['code'],
+                   'rows': [['sh.600000']]}, f)
+    universe = data_access.get_stock_universe()
+    assert market['queries'] == 1
+    assert list(universe.columns) == ['code', 'tradeStatus', 'code_name']
+    assert universe['code'].tolist() == ['sh.600000', 'sz.000002']
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""并行获取：子进程只在会话失效时重新登录"""
+import pytest
+
+pytest.importorskip('baostock')
+pytest.importorskip('pandas')
+
+import bar_store  # noqa: E402
+import fetch_pool  # noqa: E402
+from bar_store import SessionError  # noqa: E402
+
+TASK = ('sh.600000', '2024-01-01', '2024-01-31', '3')
+
+
+class FakeSession:
+    def __init__(self, login_ok=True):
+        self.login_ok = login_ok
+        self.logins = 0
+        self.logouts = 0
+
+    def ensure(self):
+        return True
+
+    def login(self):
+        self.logins += 1
+        return self.login_ok
+
+    def logout(self):
+        self.logouts += 1
+
+
+@pytest.fixture
+def session(monkeypatch):
+    fake = FakeSession()
+    monkeypatch.setattr(fetch_pool, '_SESSION', fake)
+    return fake
+
+
+def _fetcher(monkeypatch, outcomes):
+    calls = []
+
+    def fetch_bars(code, start_date, end_date, frequency, adjustflag):
+        outcome = outcomes[len(calls)]
+        calls.append(code)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(fetch_pool, 'fetch_bars', fetch_bars)
+    return calls
+
+
+def test_empty_result_is_not_retried(session, monkeypatch):
+    calls = _fetcher(monkeypatch, [None])
+    assert fetch_pool._fetch_in_worker(TASK) is None
+    assert calls == ['sh.600000']
+    assert session.logins == 0 and session.logouts == 0
+
+
+def test_other_errors_are_not_retried(session, monkeypatch):
+    calls = _fetcher(monkeypatch, [ValueError('bad data')])
+    assert fetch_pool._fetch_in_worker(TASK) is None
+    assert len(calls) == 1 and session.logins == 0
+
+
+def test_session_error_relogs_in_once(session, monkeypatch):
+    calls = _fetcher(monkeypatch, [SessionError('用户未登录'), 'bars'])
+    assert fetch_pool._fetch_in_worker(TASK) == 'bars'
+    assert len(calls) == 2
+    assert session.logouts == 1 and session.logins == 1
+
+
+def test_failed_relogin_skips(monkeypatch):
+    fake = FakeSession(login_ok=False)
+    monkeypatch.setattr(fetch_pool, '_SESSION', fake)
+    calls = _fetcher(monkeypatch, [SessionError('网络接收错误')])
+    assert fetch_pool._fetch_in_worker(TASK) is None
+    assert len(calls) == 1 and fake.logins == 1
+
+
+class FakeResultSet:
+    fields = ['date', 'close']
+
+    def __init__(self, error_code):
+        self.error_code = error_code
+        self.error_msg = 'error'
+
+    def next(self):
+        return False
+
+
+@pytest.mark.parametrize('error_code, session_error', [
+    ('10001001', True), ('10002007', True), ('10004011', False), ('0', False)])
+def test_query_classifies_session_errors(monkeypatch, error_code, session_error):
+    monkeypatch.setattr(bar_store.bs, 'query_history_k_data_plus',
+                        lambda *args, **kwargs: FakeResultSet(error_code))
+    query = bar_store._query_columns
+    args = ('sh.600000', 'date,close', bar_store.EPOCH, bar_store.EPOCH, 'd', '3')
+    if session_error:
+        with pytest.raises(SessionError):
+            query(*args)
+    elif error_code == '0':
+        assert len(query(*args)['date']) == 0
+    else:
+        assert query(*args) is None
+
+
+@pytest.fixture
+def thread_pool(monkeypatch):
+    """用线程池代替进程池，记录实际提交的资产"""
+    import data_access
+    from concurrent.futures import ThreadPoolExecutor
+
+    pd = pytest.importorskip('pandas')
+    executor = ThreadPoolExecutor(max_workers=2)
+    submitted = []
+
+    def worker(task):
+        submitted.append(task[0])
+        return pd.DataFrame({'close': [float(len(submitted))]})
+
+    monkeypatch.setattr(fetch_pool, '_get_pool', lambda max_workers: executor)
+    monkeypatch.setattr(fetch_pool, '_fetch_in_worker', worker)
+    data_access.clear_cache()
+    yield submitted
+    executor.shutdown(wait=True)
+    data_access.clear_cache()
+
+
+def test_duplicate_codes_fetched_once(thread_pool):
+    codes = ['sh.600000', 'sz.000001', 'sh.600000', 'sh.600519', 'sz.000001']
+    results = fetch_pool.fetch_bars_parallel(codes, '2024-01-01', '2024-01-31', max_workers=2)
+    assert sorted(thread_pool) == ['sh.600000', 'sh.600519', 'sz.000001']
+    assert results[0].equals(results[2]) and results[1].equals(results[4])
+    # 重复位置各自得到独立的副本
+    assert results[0] is not results[2]
+
+    # 第二次请求命中父进程的缓存，不再提交给进程池
+    again = fetch_pool.fetch_bars_parallel(codes[:2], '2024-01-01', '2024-01-31', max_workers=2)
+    assert len(thread_pool) == 3
+    assert again[0].equals(results[0])
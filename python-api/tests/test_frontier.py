@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""有效前沿：临界线算法与SLSQP的结果对比"""
+import numpy as np
+import pytest
+
+from frontier import efficient_frontier
+
+optimize = pytest.importorskip('scipy.optimize')
+
+RISK_FREE_RATE = 0.02
+
+
+def _random_problem(rng, n_assets, decimals=None):
+    factors = rng.normal(size=(n_assets, n_assets))
+    cov = factors @ factors.T / n_assets * 0.05 + np.eye(n_assets) * 0.01
+    mean = rng.normal(0.07, 0.03, n_assets)
+    if decimals is not None:
+        mean = np.round(mean, decimals)
+    return mean, cov
+
+
+def _reference_variance(mean, cov, target, lower, upper):
+    """SLSQP求给定收益率下的最小方差"""
+    n_assets = len(mean)
+    result = optimize.minimize(
+        lambda w: w @ cov @ w, np.full(n_assets, 1.0 / n_assets), jac=lambda w: 2 * cov @ w,
+        bounds=list(zip(lower, upper)), method='SLSQP',
+        constraints=[{'type': 'eq', 'fun': lambda w: w.sum() - 1},
+                     {'type': 'eq', 'fun': lambda w: w @ mean - target}],
+        options={'ftol': 1e-15, 'maxiter': 500}
+    )
+    return result.fun
+
+
+def _reference_sharpe(mean, cov, lower, upper):
+    """SLSQP求最大夏普比率，从多个初始点出发取最优"""
+    n_assets = len(mean)
+    starts = [np.full(n_assets, 1.0 / n_assets)]
+    starts += [np.clip(0.5 * np.eye(n_assets)[i] + 0.5 / n_assets, lower, upper) for i in range(n_assets)]
+    best = -np.inf
+    for start in starts:
+        result = optimize.minimize(
+            lambda w: -(w @ mean - RISK_FREE_RATE) / np.sqrt(w @ cov @ w), start,
+            bounds=list(zip(lower, upper)), method='SLSQP',
+            constraints=[{'type': 'eq', 'fun': lambda w: w.sum() - 1}],
+            options={'ftol': 1e-14, 'maxiter': 500}
+        )
+        if result.success:
+            best = max(best, -result.fun)
+    return best
+
+
+def _check_against_reference(mean, cov, lower, upper):
+    result = efficient_frontier(mean, cov, RISK_FREE_RATE, n_points=12,
+                                bounds=np.column_stack([lower, upper]))
+    frontier = result['frontier']
+    for weights, target in zip(frontier['weights'], frontier['returns']):
+        assert weights.sum() == pytest.approx(1.0, abs=1e-9)
+        assert np.all(weights >= lower - 1e-9) and np.all(weights <= upper + 1e-9)
+        assert weights @ cov @ weights <= _reference_variance(mean, cov, target, lower, upper) + 1e-9
+    assert result['tangency']['sharpeRatio'] >= _reference_sharpe(mean, cov, lower, upper) - 1e-7
+
+
+def test_tied_highest_expected_return():
+    """期望收益率最高的资产不止一个时，起点应为这些资产的最小方差组合"""
+    rng = np.random.default_rng(9)
+    mean = np.array([0.10, 0.10, 0.04, 0.07])
+    for _ in range(3):
+        factors = rng.normal(size=(4, 4))
+        cov = factors @ factors.T * 0.02 + np.eye(4) * 0.01
+        _check_against_reference(mean, cov, np.zeros(4), np.ones(4))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_matches_slsqp_with_ties_and_caps(seed):
+    rng = np.random.default_rng(seed)
+    for trial in range(10):
+        n_assets = int(rng.integers(3, 8))
+        mean, cov = _random_problem(rng, n_assets, decimals=2)
+        if trial % 2 == 0:
+            mean[rng.integers(n_assets)] = mean.max()
+        cap = rng.choice([1.0, 0.5, 0.4])
+        if cap * n_assets < 1:
+            continue
+        _check_against_reference(mean, cov, np.zeros(n_assets), np.full(n_assets, cap))
+
+
+def test_asset_crossing_from_upper_to_lower_bound():
+    """刚从上限释放的资产在后续的lambda处可以一路降到下限（修复前在该问题上偏离参考解）"""
+    mean = np.array([0.0657613907422241, 0.03146789519434459, 0.07247389926514011,
+                     0.11508776459205586, 0.06468191295967049])
+    cov = np.array([
+        [0.12499862326806492, 0.010662214078174512, 0.003556800136243478, 0.04595564085378648,
+         0.047756323593846385],
+        [0.010662214078174512, 0.061801336637810074, -0.00655010780909158, 0.012469898919810997,
+         -0.030473358485132843],
+        [0.003556800136243478, -0.00655010780909158, 0.07122880350207038, 0.016791849637036886,
+         -0.008731036693907889],
+        [0.04595564085378648, 0.012469898919810997, 0.016791849637036886, 0.044233755707286854,
+         0.013122175776768857],
+        [0.047756323593846385, -0.030473358485132843, -0.008731036693907889, 0.013122175776768857,
+         0.06495971704774962],
+    ])
+    _check_against_reference(mean, cov, np.zeros(5), np.full(5, 0.4))
+
+
+def test_closed_form_matches_unconstrained_solution():
+    rng = np.random.default_rng(1)
+    mean, cov = _random_problem(rng, 5)
+    result = efficient_frontier(mean, cov, RISK_FREE_RATE, n_points=5, long_only=False)
+    inverse = np.linalg.inv(cov)
+    ones = np.ones(5)
+    expected = inverse @ ones / (ones @ inverse @ ones)
+    np.testing.assert_allclose(result['minVariance']['weights'], expected, atol=1e-12)
+    excess = inverse @ (mean - RISK_FREE_RATE)
+    np.testing.assert_allclose(result['tangency']['weights'], excess / excess.sum(), atol=1e-10)
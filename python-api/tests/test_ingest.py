@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from ingest import read_result_set, valid_rows
+
+DATE_MISSING = np.iinfo(np.int32).min
+
+
+class FakeResultSet:
+    """逐行返回字符串列表的baostock结果集替身"""
+
+    def __init__(self, fields, rows):
+        self.fields = fields
+        self.error_code = '0'
+        self._rows = list(rows)
+        self._i = -1
+
+    def next(self):
+        self._i += 1
+        return self._i < len(self._rows)
+
+    def get_row_data(self):
+        return self._rows[self._i]
+
+
+def _days(value):
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def test_round_trip_against_reference():
+    pd = pytest.importorskip('pandas')
+    fields = ['date', 'code', 'open', 'close', 'volume', 'pctChg']
+    rows = [[f'2024-01-{d:02d}', 'sh.600000', f'{10 + d * 0.01:.2f}', f'{10 + d * 0.02:.4f}',
+             str(1000 * d), f'{d * 0.1:.6f}'] for d in range(1, 29)]
+    # 小块大小覆盖缓冲区倍增
+    columns = read_result_set(FakeResultSet(fields, rows), chunk_size=5)
+
+    frame = pd.DataFrame(rows, columns=fields)
+    expected_dates = (pd.to_datetime(frame['date']) - pd.Timestamp('1970-01-01')).dt.days
+    np.testing.assert_array_equal(columns['date'], expected_dates.to_numpy())
+    for field in ('open', 'close', 'pctChg'):
+        np.testing.assert_array_equal(columns[field], pd.to_numeric(frame[field]).to_numpy())
+    assert columns['volume'].dtype == np.int64
+    np.testing.assert_array_equal(columns['volume'], pd.to_numeric(frame['volume']).to_numpy())
+    assert list(columns['code']) == ['sh.600000'] * len(rows)
+
+
+def test_blank_dates_are_missing():
+    rows = [['', '1.0'], ['2024-01-02', '2.0'], ['', '']]
+    columns = read_result_set(FakeResultSet(['date', 'close'], rows))
+    assert columns['date'].tolist() == [DATE_MISSING, _days('2024-01-02'), DATE_MISSING]
+    assert valid_rows(columns, ['date', 'close']).tolist() == [False, True, False]
+
+
+def test_all_blank_dates_are_missing():
+    rows = [['', '1.0'], ['', '2.0']]
+    columns = read_result_set(FakeResultSet(['date', 'close'], rows))
+    assert columns['date'].tolist() == [DATE_MISSING, DATE_MISSING]
+    assert not valid_rows(columns, ['date']).any()
+
+
+def test_blank_numbers():
+    rows = [['2024-01-02', '', '100'], ['2024-01-03', '3.5', ''], ['2024-01-04', '4', '1.5']]
+    columns = read_result_set(FakeResultSet(['date', 'close', 'volume'], rows))
+    assert np.isnan(columns['close'][0]) and columns['close'][1:].tolist() == [3.5, 4.0]
+    # 有空值或小数时volume保留float64
+    assert columns['volume'].dtype == np.float64
+    assert np.isnan(columns['volume'][1])
+    assert valid_rows(columns, ['date', 'close', 'volume']).tolist() == [False, False, True]
+
+
+def test_minute_times():
+    rows = [['20240102093500000', '1'], ['20240229150000000', '2'], ['', '3']]
+    columns = read_result_set(FakeResultSet(['time', 'close'], rows))
+    expected = [_days('2024-01-02') * 1440 + 9 * 60 + 35, _days('2024-02-29') * 1440 + 15 * 60, 0]
+    assert columns['time'].tolist() == expected
+
+
+def test_empty_result_set():
+    columns = read_result_set(FakeResultSet(['date', 'close', 'volume'], []))
+    assert all(len(column) == 0 for column in columns.values())
+    assert len(valid_rows(columns, ['date', 'close'])) == 0
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""有效集二次规划：与SLSQP的结果对比，热启动和不收敛的处理"""
+import numpy as np
+import pytest
+
+from optimizer import solve_qp, optimize_weights, optimize_portfolio, ConvergenceError
+
+optimize = pytest.importorskip('scipy.optimize')
+
+RISK_FREE_RATE = 0.02
+
+
+def _random_problem(rng, n_assets):
+    factors = rng.normal(size=(n_assets, n_assets))
+    cov = factors @ factors.T / n_assets * 0.05 + np.eye(n_assets) * 0.01
+    mean = rng.normal(0.07, 0.05, n_assets)
+    return mean, cov
+
+
+def _slsqp(objective, gradient, n_assets, bounds, constraints=()):
+    """SLSQP参考解，从等权和若干随机点出发取最优"""
+    rng = np.random.default_rng(1)
+    starts = [np.full(n_assets, 1.0 / n_assets)] + [rng.dirichlet(np.ones(n_assets)) for _ in range(3)]
+    best = None
+    for start in starts:
+        result = optimize.minimize(
+            objective, start, jac=gradient, bounds=bounds, method='SLSQP',
+            constraints=[{'type': 'eq', 'fun': lambda w: w.sum() - 1}, *constraints],
+            options={'ftol': 1e-15, 'maxiter': 1000}
+        )
+        if result.success and (best is None or result.fun < best.fun):
+            best = result
+    return best
+
+
+def _objective(Q, c):
+    return (lambda w: 0.5 * w @ Q @ w - c @ w), (lambda w: Q @ w - c)
+
+
+@pytest.mark.parametrize('seed', range(6))
+@pytest.mark.parametrize('method', ['min_variance', 'mean_variance'])
+def test_matches_slsqp(seed, method):
+    rng = np.random.default_rng(seed)
+    n_assets = 8
+    mean, cov = _random_problem(rng, n_assets)
+    upper = np.full(n_assets, 0.3)
+    weights, _ = optimize_weights(mean, cov, method, upper=upper, risk_aversion=3.0)
+
+    Q, c = (3.0 * cov, mean) if method == 'mean_variance' else (cov, np.zeros(n_assets))
+    f, grad = _objective(Q, c)
+    reference = _slsqp(f, grad, n_assets, [(0.0, 0.3)] * n_assets)
+    assert weights.sum() == pytest.approx(1.0, abs=1e-12)
+    assert weights.min() >= -1e-12 and weights.max() <= 0.3 + 1e-12
+    assert f(weights) <= reference.fun + 1e-10
+    np.testing.assert_allclose(weights, reference.x, atol=1e-5)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_general_constraints_match_slsqp(seed):
+    """带不等式约束、非零下限的一般形式"""
+    rng = np.random.default_rng(100 + seed)
+    n_assets = 7
+    mean, cov = _random_problem(rng, n_assets)
+    lower = np.full(n_assets, -0.1)
+    upper = np.full(n_assets, 0.4)
+    G = np.zeros((2, n_assets))
+    G[0, :3] = 1.0
+    G[1, 3:] = -1.0
+    h = np.array([0.5, -0.4])
+    Q, c = 2.0 * cov, mean
+    weights, _ = solve_qp(Q, c, np.ones(n_assets), 1.0, lower, upper, G=G, h=h)
+
+    f, grad = _objective(Q, c)
+    reference = _slsqp(f, grad, n_assets, list(zip(lower, upper)),
+                       [{'type': 'ineq', 'fun': lambda w: h - G @ w}])
+    assert np.all(G @ weights <= h + 1e-10)
+    assert f(weights) <= reference.fun + 1e-10
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_max_sharpe_matches_slsqp(seed):
+    rng = np.random.default_rng(200 + seed)
+    n_assets = 8
+    mean, cov = _random_problem(rng, n_assets)
+    mean = np.abs(mean) + 0.03
+    weights, _ = optimize_weights(mean, cov, 'max_sharpe', risk_free_rate=RISK_FREE_RATE)
+
+    def negative_sharpe(w):
+        return -(w @ mean - RISK_FREE_RATE) / np.sqrt(w @ cov @ w)
+
+    reference = _slsqp(negative_sharpe, None, n_assets, [(0.0, 1.0)] * n_assets)
+    assert negative_sharpe(weights) <= reference.fun + 1e-9
+
+
+def test_warm_start_is_cheaper():
+    rng = np.random.default_rng(7)
+    n_assets = 30
+    mean, cov = _random_problem(rng, n_assets)
+    upper = np.full(n_assets, 0.15)
+    cold, cold_iterations = optimize_weights(mean, cov, 'mean_variance', upper=upper)
+    nudged = mean + rng.normal(0, 1e-4, n_assets)
+    warm, warm_iterations = optimize_weights(nudged, cov, 'mean_variance', cold, upper=upper)
+    again, _ = optimize_weights(nudged, cov, 'mean_variance', upper=upper)
+    np.testing.assert_allclose(warm, again, atol=1e-10)
+    assert warm_iterations < cold_iterations
+
+
+def test_max_iter_raises():
+    rng = np.random.default_rng(3)
+    n_assets = 20
+    mean, cov = _random_problem(rng, n_assets)
+    lower, upper = np.zeros(n_assets), np.full(n_assets, 0.1)
+    with pytest.raises(ConvergenceError) as info:
+        solve_qp(3.0 * cov, mean, np.ones(n_assets), 1.0, lower, upper, max_iter=1)
+    # 未收敛时仍给出可行的权重
+    weights = info.value.weights
+    assert info.value.iterations == 1
+    assert weights.sum() == pytest.approx(1.0, abs=1e-9)
+    assert weights.min() >= -1e-12 and weights.max() <= 0.1 + 1e-12
+    # 是ValueError的子类，原有的错误处理仍然适用
+    assert isinstance(info.value, ValueError)
+
+
+SECTORS = ['bank', 'bank', 'tech', 'tech', 'tech', 'energy', 'energy', 'health']
+CAPS = {'tech': 0.4, 'bank': 0.3}
+FLOORS = {'energy': 0.15}
+
+
+def _constrained_problem(seed):
+    rng = np.random.default_rng(300 + seed)
+    mean, cov = _random_problem(rng, len(SECTORS))
+    current = rng.dirichlet(np.ones(len(SECTORS)))
+    return mean, cov, current
+
+
+def _portfolio_constraints(mean, current, target_return=None, turnover=None):
+    labels = np.array(SECTORS)
+    constraints = []
+    for sector, cap in CAPS.items():
+        constraints.append({'type': 'ineq', 'fun': lambda w, s=sector, c=cap: c - w[labels == s].sum()})
+    for sector, floor in FLOORS.items():
+        constraints.append({'type': 'ineq', 'fun': lambda w, s=sector, f=floor: w[labels == s].sum() - f})
+    if target_return is not None:
+        constraints.append({'type': 'ineq', 'fun': lambda w: w @ mean - target_return})
+    if turnover is not None:
+        constraints.append({'type': 'ineq', 'fun': lambda w: turnover - np.abs(w - current).sum()})
+    return constraints
+
+
+def _optimize(mean, cov, current, objective, **options):
+    return optimize_portfolio(mean, cov, objective, bounds=[[0.0, 0.35]] * len(mean),
+                              sectors=SECTORS, sector_caps=CAPS, sector_floors=FLOORS,
+                              current_weights=current, risk_free_rate=RISK_FREE_RATE, **options)
+
+
+def _check_feasible(weights, mean, current, target_return=None, turnover=None):
+    labels = np.array(SECTORS)
+    assert weights.sum() == pytest.approx(1.0, abs=1e-9)
+    assert weights.min() >= -1e-9 and weights.max() <= 0.35 + 1e-9
+    for sector, cap in CAPS.items():
+        assert weights[labels == sector].sum() <= cap + 1e-9
+    for sector, floor in FLOORS.items():
+        assert weights[labels == sector].sum() >= floor - 1e-9
+    if target_return is not None:
+        assert weights @ mean >= target_return - 1e-9
+    if turnover is not None:
+        assert np.abs(weights - current).sum() <= turnover + 1e-9
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('turnover', [None, 0.6])
+def test_constrained_mean_variance_matches_slsqp(seed, turnover):
+    mean, cov, current = _constrained_problem(seed)
+    options = {'max_turnover': turnover} if turnover is not None else {}
+    result = _optimize(mean, cov, current, 'mean_variance', risk_aversion=4.0, **options)
+    weights = result['weights']
+    _check_feasible(weights, mean, current, turnover=turnover)
+
+    f, grad = _objective(4.0 * cov, mean)
+    if turnover is None:
+        reference = _slsqp(f, grad, len(mean), [(0.0, 0.35)] * len(mean),
+                           _portfolio_constraints(mean, current)).fun
+    else:
+        reference = _turnover_reference(f, grad, mean, current, turnover)
+    assert f(weights) <= reference + 1e-8
+
+
+def _turnover_reference(f, grad, mean, current, turnover):
+    """换手率约束不可微，参考解把交易拆成买入p和卖出q两组非负变量：w = current + p - q"""
+    n_assets = len(mean)
+
+    def weights(x):
+        return current + x[:n_assets] - x[n_assets:]
+
+    def jacobian(x):
+        g = grad(weights(x))
+        return np.r_[g, -g]
+
+    constraints = [{'type': 'eq', 'fun': lambda x: weights(x).sum() - 1},
+                   {'type': 'ineq', 'fun': lambda x: turnover - x.sum()},
+                   {'type': 'ineq', 'fun': lambda x: weights(x)},
+                   {'type': 'ineq', 'fun': lambda x: 0.35 - weights(x)}]
+    for constraint in _portfolio_constraints(mean, current):
+        constraints.append({'type': 'ineq', 'fun': lambda x, c=constraint: c['fun'](weights(x))})
+    result = optimize.minimize(lambda x: f(weights(x)), np.zeros(2 * n_assets), jac=jacobian,
+                               bounds=[(0.0, None)] * (2 * n_assets), method='SLSQP',
+                               constraints=constraints, options={'ftol': 1e-15, 'maxiter': 1000})
+    assert result.success
+    return result.fun
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_target_return_matches_slsqp(seed):
+    mean, cov, current = _constrained_problem(seed)
+    target = float(np.quantile(mean, 0.6))
+    result = _optimize(mean, cov, current, 'min_variance', target_return=target)
+    weights = result['weights']
+    if weights @ mean < target - 1e-9:
+        pytest.skip('目标收益率在约束下不可达')
+    _check_feasible(weights, mean, current, target_return=target)
+
+    f, grad = _objective(cov, np.zeros(len(mean)))
+    reference = _slsqp(f, grad, len(mean), [(0.0, 0.35)] * len(mean),
+                       _portfolio_constraints(mean, current, target_return=target))
+    assert f(weights) <= reference.fun + 1e-10
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_constrained_max_sharpe_matches_slsqp(seed):
+    mean, cov, current = _constrained_problem(seed)
+    mean = np.abs(mean) + 0.03
+    result = _optimize(mean, cov, current, 'max_sharpe')
+    weights = result['weights']
+    _check_feasible(weights, mean, current)
+
+    def negative_sharpe(w):
+        return -(w @ mean - RISK_FREE_RATE) / np.sqrt(w @ cov @ w)
+
+    reference = _slsqp(negative_sharpe, None, len(mean), [(0.0, 0.35)] * len(mean),
+                       _portfolio_constraints(mean, current))
+    assert negative_sharpe(weights) <= reference.fun + 1e-7
+    assert result['sharpeRatio'] == pytest.approx(-negative_sharpe(weights))
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_max_return_matches_slsqp(seed):
+    mean, cov, current = _constrained_problem(seed)
+    target = _optimize(mean, cov, current, 'min_variance')['volatility'] * 1.3
+    result = _optimize(mean, cov, current, 'max_return', target_volatility=target)
+    weights = result['weights']
+    _check_feasible(weights, mean, current)
+    assert result['volatility'] <= target * (1 + 1e-8)
+
+    constraints = _portfolio_constraints(mean, current)
+    constraints.append({'type': 'ineq', 'fun': lambda w: target ** 2 - w @ cov @ w})
+    reference = _slsqp(lambda w: -(w @ mean), lambda w: -mean, len(mean),
+                       [(0.0, 0.35)] * len(mean), constraints)
+    assert weights @ mean >= -reference.fun - 1e-7
+
+
+def test_warm_start_reuses_solution():
+    mean, cov, current = _constrained_problem(0)
+    cold = _optimize(mean, cov, current, 'max_sharpe')
+    warm = _optimize(mean, cov, current, 'max_sharpe', w0=cold['weights'],
+                     risk_aversion=cold['riskAversion'])
+    np.testing.assert_allclose(warm['weights'], cold['weights'], atol=1e-8)
+    assert warm['iterations'] < cold['iterations']
+
+
+def test_infeasible_constraints():
+    mean, cov, current = _constrained_problem(0)
+    with pytest.raises(ValueError):
+        optimize_portfolio(mean, cov, bounds=[[0.0, 0.1]] * len(mean))
+    with pytest.raises(ValueError):
+        optimize_portfolio(mean, cov, max_turnover=0.1)
+    with pytest.raises(ValueError):
+        _optimize(mean, cov, current, 'max_return', target_volatility=1e-4)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""收益率统计：Ledoit-Wolf收缩与sklearn对比，协方差、相关系数与直接计算对比"""
+import numpy as np
+import pytest
+
+from portfolio_stats import (simple_returns, ledoit_wolf_shrinkage, shrink_covariance,
+                             correlation_from_covariance, compute_return_statistics)
+
+covariance = pytest.importorskip('sklearn.covariance')
+
+
+def _returns(seed, n_samples, n_assets):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(size=(n_assets, 3))
+    common = rng.normal(0, 0.01, size=(n_samples, 3))
+    return 0.0005 + common @ factors.T + rng.normal(0, 0.01, size=(n_samples, n_assets))
+
+
+@pytest.mark.parametrize('n_samples, n_assets', [(250, 5), (60, 40), (30, 80), (500, 120)])
+def test_ledoit_wolf_matches_sklearn(n_samples, n_assets):
+    returns = _returns(n_samples + n_assets, n_samples, n_assets)
+    intensity = ledoit_wolf_shrinkage(returns)
+    assert intensity == pytest.approx(covariance.ledoit_wolf_shrinkage(returns), rel=1e-10, abs=1e-14)
+
+    estimator = covariance.LedoitWolf().fit(returns)
+    empirical = np.cov(returns, rowvar=False, bias=True)
+    np.testing.assert_allclose(shrink_covariance(empirical, intensity), estimator.covariance_,
+                               rtol=1e-10, atol=1e-16)
+
+
+def test_ledoit_wolf_degenerate():
+    assert ledoit_wolf_shrinkage(np.zeros((1, 3))) == 0.0
+    assert ledoit_wolf_shrinkage(np.zeros((10, 3))) == 0.0
+    assert 0.0 <= ledoit_wolf_shrinkage(_returns(0, 5, 50)) <= 1.0
+
+
+def test_statistics_match_direct():
+    rng = np.random.default_rng(4)
+    prices = 100 * np.cumprod(1 + rng.normal(0.0005, 0.02, size=(300, 6)), axis=0)
+    returns = simple_returns(prices)
+    expected = np.array([[prices[t + 1, j] / prices[t, j] - 1 for j in range(6)] for t in range(299)])
+    np.testing.assert_allclose(returns, expected, rtol=1e-9, atol=1e-15)
+
+    stats = compute_return_statistics(returns, periods_per_year=252)
+    np.testing.assert_allclose(stats['expectedReturns'], expected.mean(axis=0) * 252, rtol=1e-9)
+    np.testing.assert_allclose(stats['covarianceMatrix'], np.cov(expected.T) * 252, rtol=1e-9)
+    np.testing.assert_allclose(stats['correlationMatrix'], np.corrcoef(expected.T), atol=1e-9)
+
+    shrunk = compute_return_statistics(returns, shrinkage='ledoit_wolf', periods_per_year=252)
+    assert shrunk['shrinkage'] == pytest.approx(covariance.ledoit_wolf_shrinkage(returns), rel=1e-10)
+    assert np.trace(shrunk['covarianceMatrix']) == pytest.approx(np.trace(stats['covarianceMatrix']))
+
+
+def test_zero_variance_correlation():
+    cov = np.array([[0.04, 0.0, 0.01], [0.0, 0.0, 0.0], [0.01, 0.0, 0.09]])
+    correlation = correlation_from_covariance(cov)
+    np.testing.assert_allclose(np.diag(correlation), 1.0)
+    assert correlation[1, 0] == 0.0 and correlation[0, 1] == 0.0
+    assert correlation[0, 2] == pytest.approx(0.01 / 0.06)
+
+
+def test_nonpositive_previous_price():
+    returns = simple_returns(np.array([[10.0, 0.0], [11.0, 5.0], [0.0, 6.0]]))
+    np.testing.assert_allclose(returns, [[0.1, 0.0], [-1.0, 0.2]])
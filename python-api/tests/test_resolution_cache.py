@@ -0,0 +1,88 @@
+import sqlite3
+
+import pytest
+
+import resolution_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(resolution_cache, 'NAME_CACHE_PATH', str(tmp_path / 'cache.sqlite3'))
+    monkeypatch.setattr(resolution_cache, '_CONN', None)
+    yield resolution_cache
+    if resolution_cache._CONN is not None:
+        resolution_cache._CONN.close()
+
+
+def _last_used(cache, key):
+    conn = sqlite3.connect(cache.NAME_CACHE_PATH)
+    try:
+        return conn.execute('SELECT last_used FROM resolution WHERE key = ?', (key,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_variants_are_cached_separately(cache):
+    result = {'found': True, 'stock_code': 'sz.000002', 'match_type': 'exact', 'confidence': 1.0}
+    assert cache.put_cached('万科A', result)
+    assert cache.get_cached('万科A') == result
+    # 全角、带空格的写法可能解析出不同的结果，不共用缓存条目
+    assert cache.get_cached('万科Ａ') is None
+    assert cache.get_cached(' 万 科A') is None
+
+
+def test_search_is_transparent(cache, monkeypatch):
+    """两种写法未经缓存时解析结果不同，经过缓存后仍各自得到自己的结果"""
+    pytest.importorskip('baostock')
+    import baostock_data
+
+    answers = {
+        '贵州茅台': {'found': True, 'stock_code': 'sh.600519', 'match_type': 'exact', 'confidence': 1.0},
+        '贵州 茅台': {'found': False, 'stock_code': None, 'match_type': 'not_found', 'confidence': 0.0},
+    }
+    calls = []
+
+    def uncached(name):
+        calls.append(name)
+        return answers[name]
+
+    monkeypatch.setattr(baostock_data, '_search_stock_by_name_uncached', uncached)
+    for _ in range(2):
+        for name, expected in answers.items():
+            assert baostock_data.search_stock_by_name_enhanced(name) == expected
+    # 第二轮全部命中缓存，解析器看到的是原始输入
+    assert calls == ['贵州茅台', '贵州 茅台']
+
+
+def test_negative_and_transient_results(cache):
+    assert cache.put_cached('BTC', {'found': False, 'match_type': 'not_found'})
+    assert cache.get_cached('BTC') == {'found': False, 'match_type': 'not_found'}
+    assert not cache.put_cached('茅台', {'found': False, 'match_type': 'error'})
+    assert cache.get_cached('茅台') is None
+
+
+def test_touch_is_throttled(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    monkeypatch.setattr(cache, 'NAME_CACHE_TOUCH_INTERVAL', 100.0)
+    cache.put_cached('万科A', {'found': True, 'stock_code': 'sz.000002', 'match_type': 'exact'})
+
+    now[0] = 1050.0
+    assert cache.get_cached('万科A') is not None
+    assert _last_used(cache, '万科A') == 1000.0
+
+    now[0] = 1100.0
+    assert cache.get_cached('万科A') is not None
+    assert _last_used(cache, '万科A') == 1100.0
+
+
+def test_eviction_keeps_recent(cache, monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(cache.time, 'time', lambda: now[0])
+    monkeypatch.setattr(cache, 'NAME_CACHE_SIZE', 2)
+    for i, name in enumerate(['甲', '乙', '丙']):
+        now[0] = float(i)
+        cache.put_cached(name, {'found': True, 'stock_code': str(i), 'match_type': 'exact'})
+    assert cache.get_cached('甲') is None
+    assert cache.get_cached('乙') is not None
+    assert cache.get_cached('丙') is not None
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""风险分析：历史VaR/CVaR与全排序结果对比，参数法与scipy.stats对比"""
+import math
+
+import numpy as np
+import pytest
+
+import risk
+from risk import (historical_var, parametric_var, cornish_fisher_var, risk_contributions,
+                  monte_carlo_var, risk_report)
+
+LEVELS = (0.9, 0.95, 0.975, 0.99)
+
+
+def full_sort_var(series, level):
+    """全排序参考实现：k = ceil((1 - level) T)，VaR为第k小的收益率，CVaR为最小k个的均值"""
+    ordered = np.sort(series)
+    k = max(math.ceil(round((1 - level) * len(series), 9)), 1)
+    return -ordered[k - 1], -ordered[:k].mean()
+
+
+@pytest.mark.parametrize('n_samples', [1, 7, 100, 250, 1001])
+def test_historical_matches_full_sort(n_samples):
+    rng = np.random.default_rng(n_samples)
+    panel = rng.standard_t(4, size=(n_samples, 5)) * 0.01
+    # 加入大量重复值
+    panel[:, 4] = np.round(panel[:, 4], 2)
+    var, cvar = historical_var(panel, LEVELS)
+    for i, level in enumerate(LEVELS):
+        for j in range(panel.shape[1]):
+            expected_var, expected_cvar = full_sort_var(panel[:, j], level)
+            assert var[i, j] == pytest.approx(expected_var, abs=1e-15)
+            assert cvar[i, j] == pytest.approx(expected_cvar, rel=1e-12, abs=1e-15)
+
+    vector_var, vector_cvar = historical_var(panel[:, 0], LEVELS)
+    np.testing.assert_array_equal(vector_var, var[:, 0])
+    np.testing.assert_array_equal(vector_cvar, cvar[:, 0])
+
+
+def test_exact_tail_count():
+    # (1 - 0.95) x 100 在浮点下略大于5，尾部仍为5个样本
+    series = -np.arange(100, dtype=np.float64)
+    var, cvar = historical_var(series, [0.95])
+    assert var[0] == 95.0
+    assert cvar[0] == pytest.approx(97.0)
+
+
+def test_invalid_levels():
+    with pytest.raises(ValueError):
+        historical_var(np.zeros(10), [1.0])
+    with pytest.raises(ValueError):
+        historical_var(np.zeros(0), [0.95])
+
+
+def test_parametric_matches_scipy():
+    stats = pytest.importorskip('scipy.stats')
+    mean, std, horizon = 0.0004, 0.015, 10
+    var, cvar = parametric_var(mean, std, LEVELS, horizon)
+    distribution = stats.norm(mean * horizon, std * np.sqrt(horizon))
+    for i, level in enumerate(LEVELS):
+        assert var[i] == pytest.approx(-distribution.ppf(1 - level), rel=1e-9)
+        tail_mean = distribution.expect(lambda x: x, ub=distribution.ppf(1 - level)) / (1 - level)
+        assert cvar[i] == pytest.approx(-tail_mean, rel=1e-7)
+    # 没有偏度和超额峰度时Cornish-Fisher退化为正态
+    np.testing.assert_allclose(cornish_fisher_var(mean, std, 0.0, 0.0, LEVELS, horizon), var)
+
+
+def test_contributions():
+    rng = np.random.default_rng(2)
+    factors = rng.normal(size=(6, 6))
+    cov = factors @ factors.T * 1e-4
+    mean = rng.normal(0.0005, 0.0002, 6)
+    weights = rng.dirichlet(np.ones(6))
+    result = risk_contributions(weights, cov, mean, LEVELS, horizon=5)
+    volatility = np.sqrt(weights @ cov @ weights)
+    assert result['volatility'] == pytest.approx(volatility)
+    assert result['component'].sum() == pytest.approx(volatility)
+    assert result['percent'].sum() == pytest.approx(1.0)
+    # 边际风险为波动率对权重的梯度
+    step = 1e-7
+    for i in range(6):
+        bumped = weights.copy()
+        bumped[i] += step
+        gradient = (np.sqrt(bumped @ cov @ bumped) - volatility) / step
+        assert result['marginal'][i] == pytest.approx(gradient, rel=1e-5)
+    var, _ = parametric_var(weights @ mean, volatility, LEVELS, 5)
+    np.testing.assert_allclose(result['componentVaR'].sum(axis=1), var)
+
+
+def test_monte_carlo_reproducible_and_consistent(monkeypatch):
+    rng = np.random.default_rng(3)
+    factors = rng.normal(size=(4, 4))
+    cov = factors @ factors.T * 1e-4
+    mean = np.full(4, 0.0003)
+    weights = np.full(4, 0.25)
+    serial = monte_carlo_var(mean, cov, weights, 200_000, LEVELS, seed=11, chunk_size=30_000,
+                             max_workers=1)
+    # 强制多进程，结果与进程数无关
+    monkeypatch.setattr(risk, 'MC_PARALLEL_DRAWS', 0)
+    parallel = monte_carlo_var(mean, cov, weights, 200_000, LEVELS, seed=11, chunk_size=30_000,
+                               max_workers=2)
+    np.testing.assert_array_equal(serial[0], parallel[0])
+    np.testing.assert_array_equal(serial[1], parallel[1])
+
+    var, cvar = parametric_var(weights @ mean, np.sqrt(weights @ cov @ weights), LEVELS)
+    np.testing.assert_allclose(serial[0], var, rtol=0.03)
+    np.testing.assert_allclose(serial[1], cvar, rtol=0.03)
+
+
+def test_report_horizon_returns():
+    rng = np.random.default_rng(5)
+    prices = 100 * np.cumprod(1 + rng.normal(0.0003, 0.01, size=(300, 3)), axis=0)
+    weights = np.array([0.5, 0.3, 0.2])
+    report = risk_report(prices, weights, levels=[0.95], horizon=5)
+
+    returns = prices[1:] / prices[:-1] - 1
+    portfolio = returns @ weights
+    compounded = np.array([np.prod(1 + portfolio[t:t + 5]) - 1 for t in range(len(portfolio) - 4)])
+    expected_var, expected_cvar = full_sort_var(compounded, 0.95)
+    assert report['portfolio']['historical']['var'][0] == pytest.approx(expected_var, rel=1e-9)
+    assert report['portfolio']['historical']['cvar'][0] == pytest.approx(expected_cvar, rel=1e-9)
+    asset = np.array([np.prod(1 + returns[t:t + 5, 1]) - 1 for t in range(len(returns) - 4)])
+    assert report['assetRisk']['var'][0, 1] == pytest.approx(full_sort_var(asset, 0.95)[0], rel=1e-9)
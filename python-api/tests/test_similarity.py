@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""位并行LCS：与动态规划的朴素LCS对比"""
+import numpy as np
+import pytest
+
+from similarity import lcs_length, calculate_string_similarity, SimilarityIndex
+
+ALPHABETS = ['ab', 'abcd', '平安银行中国万科A', 'abcdefghijklmnopqrstuvwxyz0123456789']
+
+
+def naive_lcs(x, y):
+    previous = [0] * (len(y) + 1)
+    for ch in x:
+        current = [0]
+        for j, other in enumerate(y):
+            current.append(previous[j] + 1 if ch == other else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def _random_strings(rng, alphabet, count, max_length):
+    return [''.join(rng.choice(list(alphabet), size=rng.integers(0, max_length + 1)))
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize('alphabet', ALPHABETS)
+def test_scalar_matches_naive(alphabet):
+    rng = np.random.default_rng(len(alphabet))
+    strings = _random_strings(rng, alphabet, 60, 90)
+    for x, y in zip(strings[::2], strings[1::2]):
+        assert lcs_length(x, y) == naive_lcs(x, y)
+        assert lcs_length(y, x) == naive_lcs(x, y)
+
+
+@pytest.mark.parametrize('alphabet', ALPHABETS)
+@pytest.mark.parametrize('query_length', [1, 7, 63, 64, 65, 100])
+def test_index_matches_naive(alphabet, query_length):
+    rng = np.random.default_rng(query_length)
+    names = _random_strings(rng, alphabet, 80, 80)
+    index = SimilarityIndex(names)
+    query = ''.join(rng.choice(list(alphabet), size=query_length))
+    expected = [naive_lcs(query, name) for name in names]
+    assert index.lcs_lengths(query).tolist() == expected
+    scores = index.scores(query)
+    for name, score in zip(names, scores):
+        assert score == pytest.approx(calculate_string_similarity(query, name) if name else 0.0)
+
+
+def test_similarity_normalizes_case_and_spaces():
+    assert calculate_string_similarity('Ping An', 'pingan') == 1.0
+    assert calculate_string_similarity('', 'abc') == 0.0
+    assert calculate_string_similarity('  ', ' ') == 1.0
+    assert calculate_string_similarity('平安银行', '平安') == 0.5
+
+
+def test_top_k_order_and_invalid_names():
+    index = SimilarityIndex(['万科A', None, '万科', '', '平安银行', '万科A'])
+    assert index.top_k('万科A', k=3) == [(0, 1.0), (5, 1.0), (2, pytest.approx(2 / 3))]
+    assert index.scores('万科')[[1, 3]].tolist() == [0.0, 0.0]
+    assert index.top_k('万科A', threshold=1.0) == []
+    assert SimilarityIndex([]).top_k('万科') == []
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""滚动前推：增量更新的矩与直接计算一致，优化不收敛时沿用上一期权重"""
+import numpy as np
+import pytest
+
+import walk_forward
+from optimizer import optimize_weights, ConvergenceError
+from portfolio_stats import simple_returns
+
+
+def _prices(seed=0, n_periods=400, n_assets=6):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0004, 0.015, size=(n_periods, n_assets))
+    return 100 * np.cumprod(1 + returns, axis=0)
+
+
+@pytest.mark.parametrize('estimator', ['rolling', 'expanding'])
+def test_moments_match_direct(estimator):
+    prices = _prices()
+    result = walk_forward.walk_forward_schedule(prices, estimator=estimator, window=120,
+                                                min_periods=120, rebalance_every=25)
+    returns = simple_returns(prices)
+    for k, t in enumerate(result['rebalanceIndex']):
+        lo = t - 120 if estimator == 'rolling' else 0
+        window = returns[lo:t]
+        np.testing.assert_allclose(result['expectedReturns'][k], window.mean(axis=0) * 252,
+                                   rtol=1e-10, atol=1e-12)
+        weights, _ = optimize_weights(window.mean(axis=0) * 252, np.cov(window.T) * 252)
+        np.testing.assert_allclose(result['weights'][k], weights, atol=1e-8)
+    assert result['converged'].all()
+
+
+def test_nonconvergence_keeps_previous_weights(monkeypatch):
+    calls = []
+
+    def flaky(mean, cov, method, w0, **kwargs):
+        calls.append(w0)
+        # 第3个调仓日的热启动和冷启动都不收敛
+        if 3 <= len(calls) <= 4:
+            raise ConvergenceError(np.full(len(mean), 1.0 / len(mean)), 7)
+        return optimize_weights(mean, cov, method, w0, **kwargs)
+
+    monkeypatch.setattr(walk_forward, 'optimize_weights', flaky)
+    result = walk_forward.walk_forward_schedule(_prices(), window=120, rebalance_every=25)
+    assert result['converged'].tolist()[:4] == [True, True, False, True]
+    np.testing.assert_array_equal(result['weights'][2], result['weights'][1])
+    assert result['iterations'][2] == 14
+    # 冷启动重试不带初始权重
+    assert calls[2] is not None and calls[3] is None
+
+
+def test_cold_retry_recovers(monkeypatch):
+    calls = []
+
+    def warm_fails(mean, cov, method, w0, **kwargs):
+        calls.append(w0)
+        if w0 is not None and len(calls) == 2:
+            raise ConvergenceError(w0, 5)
+        return optimize_weights(mean, cov, method, w0, **kwargs)
+
+    monkeypatch.setattr(walk_forward, 'optimize_weights', warm_fails)
+    result = walk_forward.walk_forward_schedule(_prices(), window=120, rebalance_every=25)
+    assert result['converged'].all()
+    assert calls[2] is None
+
+
+def test_first_step_nonconvergence_raises(monkeypatch):
+    def never(mean, cov, method, w0, **kwargs):
+        raise ConvergenceError(None, 1)
+
+    monkeypatch.setattr(walk_forward, 'optimize_weights', never)
+    with pytest.raises(ConvergenceError):
+        walk_forward.walk_forward_schedule(_prices(), window=120, rebalance_every=25)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滚动前推（walk-forward）优化 - 每个调仓日用截至当日的数据重新估计并优化
+
+期望收益率和协方差按增量方式更新，不在每个调仓日对整个窗口重新计算：
+    rolling   - 固定长度窗口，调仓间隔内进入窗口的收益率做秩k加法更新，
+                离开窗口的做秩k减法更新（k为调仓间隔）
+    expanding - 扩张窗口，只做加法更新
+    ewma      - 指数加权，旧的矩按衰减因子整体缩放后加入新数据
+累积量为一阶矩和二阶交叉矩（减去首个窗口均值后再累积，避免大数相减损失精度），
+每个调仓日的更新代价为 O(k N^2)，整段为 O(T N^2)，而不是 O(T^2 N^2)。
+
+各调仓日的优化以上一次的最优权重热启动（见 optimizer.solve_qp）。热启动没有收敛时改为
+冷启动重试，仍不收敛则沿用上一期权重，并在 converged 中标记该调仓日。
+输出的调仓计划可直接交给 backtest.run_backtest 计算净值。
+"""
+import numpy as np
+
+from log_utils import get_logger
+from metrics import panel_metrics, TRADING_DAYS, RISK_FREE_RATE
+from portfolio_stats import simple_returns, shrink_covariance
+from optimizer import optimize_weights, ConvergenceError, DEFAULT_RISK_AVERSION
+from backtest import rebalance_points, run_backtest
+
+ESTIMATORS = ('rolling', 'expanding', 'ewma')
+DEFAULT_REBALANCE_EVERY = 21
+DEFAULT_WINDOW = 252
+DEFAULT_HALFLIFE = 63
+
+logger = get_logger('walk_forward')
+
+
+class RollingMoments:
+    """窗口内收益率的一阶矩和二阶交叉矩，支持按块加入和移除"""
+
+    def __init__(self, n_assets):
+        self.count = 0
+        self.shift = None
+        self.total = np.zeros(n_assets)
+        self.cross = np.zeros((n_assets, n_assets))
+
+    def add(self, block):
+        if len(block) == 0:
+            return
+        if self.shift is None:
+            self.shift = block.mean(axis=0)
+        x = block - self.shift
+        self.count += len(x)
+        self.total += x.sum(axis=0)
+        self.cross += x.T @ x
+
+    def remove(self, block):
+        if len(block) == 0:
+            return
+        x = block - self.shift
+        self.count -= len(x)
+        self.total -= x.sum(axis=0)
+        self.cross -= x.T @ x
+
+    def mean(self):
+        return self.shift + self.total / self.count
+
+    def covariance(self):
+        centered = self.total / self.count
+        return (self.cross - self.count * np.outer(centered, centered)) / (self.count - 1)
+
+
+class EwmaMoments:
+    """指数加权的一阶矩和二阶交叉矩，halflife为半衰期（期数）"""
+
+    def __init__(self, n_assets, halflife):
+        self.decay = 0.5 ** (1.0 / halflife)
+        self.count = 0
+        self.weight = 0.0
+        self.shift = None
+        self.total = np.zeros(n_assets)
+        self.cross = np.zeros((n_assets, n_assets))
+
+    def add(self, block):
+        if len(block) == 0:
+            return
+        if self.shift is None:
+            self.shift = block.mean(axis=0)
+        x = block - self.shift
+        k = len(x)
+        # 块内第j行的权重为 decay^(k-1-j)，最新一行权重为1
+        weights = self.decay ** np.arange(k - 1, -1, -1)
+        scale = self.decay ** k
+        self.count += k
+        self.weight = scale * self.weight + weights.sum()
+        self.total = scale * self.total + weights @ x
+        self.cross = scale * self.cross + (x * weights[:, None]).T @ x
+
+    def mean(self):
+        return self.shift + self.total / self.weight
+
+    def covariance(self):
+        centered = self.total / self.weight
+        return self.cross / self.weight - np.outer(centered, centered)
+
+
+def _optimize_step(mean, cov, method, previous, upper, risk_aversion, risk_free_rate):
+    """
+    一个调仓日的优化：先以上一期权重热启动，不收敛时冷启动重试
+
+    Returns:
+        tuple: (权重, 迭代次数, 是否收敛)；两次都不收敛时返回上一期权重
+    """
+    iterations = 0
+    for start in ((previous, None) if previous is not None else (None,)):
+        try:
+            weights, used = optimize_weights(mean, cov, method, start, upper=upper,
+                                             risk_aversion=risk_aversion,
+                                             risk_free_rate=risk_free_rate)
+            return weights, iterations + used, True
+        except ConvergenceError as e:
+            if previous is None:
+                raise
+            iterations += e.iterations
+    return previous, iterations, False
+
+
+def walk_forward_schedule(prices, method='min_variance', rebalance_every=DEFAULT_REBALANCE_EVERY,
+                          estimator='rolling', window=DEFAULT_WINDOW, halflife=DEFAULT_HALFLIFE,
+                          min_periods=None, max_weight=None, risk_aversion=DEFAULT_RISK_AVERSION,
+                          shrinkage=None, risk_free_rate=RISK_FREE_RATE,
+                          periods_per_year=TRADING_DAYS):
+    """
+    生成滚动前推的调仓计划
+
+    Args:
+        prices: 对齐后的价格面板 (T x N)
+        method: 优化目标，见 optimizer.OPTIMIZE_METHODS
+        rebalance_every: 调仓周期（期数）
+        estimator: 估计方式，见 ESTIMATORS
+        window: rolling的窗口长度（期数）
+        halflife: ewma的半衰期（期数）
+        min_periods: 第一次调仓前至少需要的收益率期数，默认rolling为window，其余为60
+        max_weight: 单个资产的权重上限（max_sharpe不支持）
+        risk_aversion: mean_variance的风险厌恶系数
+        shrinkage: 协方差向等方差单位阵收缩的强度（[0, 1] 之间的数值）
+
+    Returns:
+        dict: rebalanceIndex (K)、weights (K x N)、expectedReturns (K x N)、iterations (K)、
+            converged (K，未收敛的调仓日沿用上一期权重)
+
+    Raises:
+        ConvergenceError: 第一个调仓日的优化没有收敛（没有可沿用的权重）
+    """
+    if estimator not in ESTIMATORS:
+        raise ValueError(f'不支持的估计方式: {estimator}')
+    if shrinkage is not None and not isinstance(shrinkage, (int, float)):
+        raise ValueError('滚动前推只支持数值形式的收缩强度')
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim != 2 or prices.shape[1] == 0:
+        raise ValueError('价格面板必须是二维数组 (T x N)')
+    n_periods, n_assets = prices.shape
+    returns = simple_returns(prices)
+
+    window = int(window) if estimator == 'rolling' else None
+    if min_periods is None:
+        min_periods = window if estimator == 'rolling' else 60
+    min_periods = int(min_periods)
+    if min_periods < 2 or (window is not None and window < 2):
+        raise ValueError('回看窗口至少为2期')
+    if min_periods >= n_periods - 1:
+        raise ValueError('价格序列长度不足以覆盖回看窗口')
+
+    points = rebalance_points(n_periods, min_periods, rebalance_every)
+    upper = None
+    if max_weight is not None:
+        if max_weight * n_assets < 1:
+            raise ValueError('权重上限之和小于1，约束不可行')
+        upper = np.full(n_assets, float(max_weight))
+
+    moments = EwmaMoments(n_assets, halflife) if estimator == 'ewma' else RollingMoments(n_assets)
+    schedule = np.empty((len(points), n_assets))
+    expected = np.empty((len(points), n_assets))
+    iterations = np.empty(len(points), dtype=np.int64)
+    converged = np.ones(len(points), dtype=bool)
+    lo = hi = 0
+    previous = None
+    for k, t in enumerate(points):
+        # 窗口为截至调仓日t的收益率 returns[lo:t]，不使用未来数据
+        new_lo = max(t - window, 0) if window is not None else 0
+        if isinstance(moments, RollingMoments) and new_lo >= hi:
+            # 调仓间隔超过窗口长度，与上一个窗口没有重叠时重新累积
+            moments = RollingMoments(n_assets)
+            lo = hi = new_lo
+        moments.add(returns[hi:t])
+        if isinstance(moments, RollingMoments):
+            moments.remove(returns[lo:new_lo])
+        lo, hi = new_lo, t
+
+        mean = moments.mean() * periods_per_year
+        cov = moments.covariance() * periods_per_year
+        if shrinkage:
+            cov = shrink_covariance(cov, float(np.clip(shrinkage, 0.0, 1.0)))
+        weights, iterations[k], converged[k] = _optimize_step(
+            mean, cov, method, previous, upper, risk_aversion, risk_free_rate
+        )
+        if not converged[k]:
+            logger.warning(f'第{t}期的优化没有收敛，沿用上一期权重')
+        schedule[k] = weights
+        expected[k] = mean
+        previous = weights
+
+    return {
+        'rebalanceIndex': points,
+        'weights': schedule,
+        'expectedReturns': expected,
+        'iterations': iterations,
+        'converged': converged
+    }
+
+
+def walk_forward(prices, cost_bps=0.0, risk_free_rate=RISK_FREE_RATE,
+                 periods_per_year=TRADING_DAYS, **options):
+    """
+    滚动前推优化并回测
+
+    Args:
+        prices: 对齐后的价格面板 (T x N)
+        cost_bps: 单边交易费率（基点）
+        options: 传给 walk_forward_schedule 的其余参数
+
+    Returns:
+        dict: walk_forward_schedule 的输出，加上 run_backtest 的 nav、returns、turnover、costs、
+            totalTurnover、totalCost、startIndex，以及与calculate_metrics相同的metrics
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    result = walk_forward_schedule(prices, risk_free_rate=risk_free_rate,
+                                   periods_per_year=periods_per_year, **options)
+    points = result['rebalanceIndex']
+    result.update(run_backtest(prices, points, result['weights'], cost_bps, risk_free_rate,
+                               periods_per_year))
+    nav = result['nav']
+    metrics = panel_metrics(nav, periods_per_year, risk_free_rate)
+    result.update({
+        'returns': nav[1:] / nav[:-1] - 1,
+        'startIndex': int(points[0]),
+        'metrics': {key: float(values[0]) for key, values in metrics.items()}
+    })
+    return result
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻工作进程 - 基于stdin/stdout的JSON行协议
+
+每行一个请求: {"id": 1, "method": "get_index_data", "params": {...}}
+每行一个响应: {"id": 1, "result": {...}}
+处理过程中可先输出若干事件帧: {"id": 1, "event": "asset", "data": {...}}
+
+进程只登录一次baostock并保持字典等数据常驻内存，避免每个请求都
+重新启动解释器、导入numpy/pandas并登录。
+"""
+import sys
+import json
+import time
+import contextlib
+import baostock as bs
+from serialization import dumps_json
+
+# baostock会话空闲超过该秒数后，在处理下一个请求前重新登录
+SESSION_IDLE_SECONDS = 600
+
+
+class BaostockSession:
+    """维护一个常驻的baostock登录会话"""
+
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self.logged_in = False
+        self.last_used = 0.0
+
+    def login(self):
+        try:
+            lg = bs.login()
+            self.logged_in = lg.error_code == '0'
+        except Exception:
+            self.logged_in = False
+        self.last_used = time.time()
+        return self.logged_in
+
+    def logout(self):
+        if self.logged_in:
+            try:
+                bs.logout()
+            except Exception:
+                pass
+        self.logged_in = False
+
+    def ensure(self):
+        """确保会话可用，空闲过久时重新登录"""
+        if self.logged_in and time.time() - self.last_used > self.idle_seconds:
+            self.logout()
+        if not self.logged_in:
+            self.login()
+        self.last_used = time.time()
+        return self.logged_in
+
+
+def _write_frame(stream, frame):
+    stream.write(dumps_json(frame) + '\n')
+    stream.flush()
+
+
+def serve(handlers, instream=None, outstream=None, offline=()):
+    """
+    运行请求循环，直到stdin关闭或收到shutdown请求
+
+    Args:
+        handlers: 方法名到处理函数的映射，处理函数接收 (params, emit) 并返回可JSON序列化的结果，
+            emit(event, data) 用于在最终结果之前输出事件帧
+        instream: 请求输入流，默认sys.stdin
+        outstream: 响应输出流，默认sys.stdout
+        offline: 不需要baostock会话的方法名（纯计算请求），处理前不检查登录状态
+    """
+    instream = instream or sys.stdin
+    outstream = outstream or sys.stdout
+    session = BaostockSession()
+
+    # 处理期间的诊断输出（包括baostock自身的打印）全部转到stderr，
+    # 保证stdout只包含协议帧
+    with contextlib.redirect_stdout(sys.stderr):
+        session.login()
+        try:
+            for line in instream:
+                line = line.strip()
+                if not line:
+                    continue
+
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    request_id = request.get('id')
+                    method = request.get('method')
+                    params = request.get('params') or {}
+                except (json.JSONDecodeError, AttributeError):
+                    _write_frame(outstream, {
+                        'id': request_id,
+                        'result': {'success': False, 'error': '无效的JSON请求'}
+                    })
+                    continue
+
+                if method == 'shutdown':
+                    _write_frame(outstream, {'id': request_id, 'result': {'success': True}})
+                    break
+                if method == 'ping':
+                    _write_frame(outstream, {'id': request_id, 'result': {'success': True}})
+                    continue
+
+                handler = handlers.get(method)
+                if handler is None:
+                    _write_frame(outstream, {
+                        'id': request_id,
+                        'result': {'success': False, 'error': f'未知方法: {method}'}
+                    })
+                    continue
+
+                if method not in offline and not session.ensure():
+                    _write_frame(outstream, {
+                        'id': request_id,
+                        'result': {'success': False, 'error': 'baostock登录失败'}
+                    })
+                    continue
+
+                def emit(event, data, request_id=request_id):
+                    _write_frame(outstream, {'id': request_id, 'event': event, 'data': data})
+
+                try:
+                    result = handler(params, emit)
+                except Exception as e:
+                    result = {'success': False, 'error': f'处理异常: {str(e)}'}
+                _write_frame(outstream, {'id': request_id, 'result': result})
+        finally:
+            session.logout()
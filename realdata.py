@@ -3,8 +3,13 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import baostock as bs
 import numpy as np  # 添加缺失的numpy导入
+import sys
 from pylab import mpl
 
+sys.path.insert(0, 'python-api')
+from bar_store import load_bars
+from ingest import read_result_set, valid_rows
+
 # matplotlib inline
 plt.style.use('ggplot')
 # 登陆系统
@@ -37,15 +42,11 @@ for i in stock_codes:
     start_date='2000-01-02', end_date='2025-06-28', frequency="d")
     print('query_history_k_data_plus respond error_code:'+rs.error_code)
     print('query_history_k_data_plus respond  error_msg:'+rs.error_msg)
-    # 打印结果集
-    data_list = []
-    while (rs.error_code == '0') & rs.next():
-        # 获取一条记录，将记录合并在一起
-        data_list.append(rs.get_row_data())
-    result = pd.DataFrame(data_list, columns=rs.fields)
-    result['date'] = pd.to_datetime(result['date'])
-    result['close'] = result['close'].astype("float")
-    index_list.append(result[['date','close']])
+    # 结果集直接解析为类型化数组（日期为距1970-01-01的天数）
+    columns = read_result_set(rs)
+    ok = valid_rows(columns, ['date', 'close'])
+    result = pd.DataFrame({'date': columns['date'][ok].astype('datetime64[D]'), 'close': columns['close'][ok]})
+    index_list.append(result)
 # 绘图
 plt.figure(figsize=(28,14))
 for i in range(4):
@@ -61,23 +62,15 @@ plt.show()
 # 分钟线指标：date,time,code,open,high,low,close,volume,amount,adjustflag
 stock_codes = ['sh.600009','sh.600019','sh.600837','sh.601398','sh.601857']
 stock_names = ['上海机场','宝钢股份','海通证券','工商银行','中国石油']
+
 stock_datalist = []
 for i, code in enumerate(stock_codes):
-    rs = bs.query_history_k_data_plus(code,
-        "date,close",
-        start_date='2016-01-04', end_date='2018-12-31',
-        frequency="d", adjustflag="3")
-    print('query_history_k_data_plus respond error_code:'+rs.error_code)
-    print('query_history_k_data_plus respond  error_msg:'+rs.error_msg)
+    # 前复权价格：本地缓存不复权K线和复权因子，区间内的分红送转不会造成价格跳空
+    result = load_bars(code, '2016-01-04', '2018-12-31', frequency='d', adjustflag='2')
 
     #### 打印结果集 ####
-    data_list = []
-    while (rs.error_code == '0') & rs.next():
-        # 获取一条记录，将记录合并在一起
-        data_list.append(rs.get_row_data())
-    result = pd.DataFrame(data_list, columns=rs.fields)
     # 重命名close列为对应的股票名称
-    result = result.rename(columns={'close': stock_names[i]})
+    result = result[['date', 'close']].rename(columns={'close': stock_names[i]})
     stock_datalist.append(result)
     print(result)
 
@@ -122,14 +115,12 @@ R_port = np.sum(weight*R_mean)  # 计算随机权重下的投资组合的预期
 print("投资组合的预期收益率:",round(R_port,4))
 vol_port = np.sqrt(np.dot(weight,np.dot(R_cov,weight.T)))   # 计算投资组合的收益率波动率
 print("投资组合收益率波动率：",round(vol_port,4))
-# 1. 绘制可行集
-Rp_list = []   # 初始的投资组合收益率数组
-Vp_list = []   # 初始的投资组合收益波动率数组
-for i in np.arange(1000):   # 生成1000个不同权重的预期收益率和收益波动率
-    x = np.random.random(5)
-    weight = x/np.sum(x)
-    Rp_list.append(np.sum(weight*R_mean))
-    Vp_list.append(np.sqrt(np.dot(weight,np.dot(R_cov,weight.T))))
+# 1. 绘制可行集（批量生成随机权重，一次计算所有组合的收益率和波动率，见 python-api/portfolio_sampler.py）
+from portfolio_sampler import sample_portfolios
+
+cloud = sample_portfolios(R_mean.values, R_cov.values, n_samples=1000)
+Rp_list = cloud['returns']   # 投资组合收益率数组
+Vp_list = cloud['volatilities']   # 投资组合收益波动率数组
 plt.figure(figsize=(8,6))
 plt.scatter(Vp_list,Rp_list,alpha=0.95)
 plt.xlabel(u"波动率",fontsize=13)
@@ -141,38 +132,20 @@ plt.ylim(-0.1,0.2)
 plt.title(u'投资组合收益率与波动率的关系',fontsize=13)
 plt.show()
 
-# 构建有限前沿
-import scipy.optimize as sco
-
-def f(w):  # 构建最优化函数
-    w = np.array(w)
-    Rp_opt = np.sum(w*R_mean)
-    Vp_opt = np.sqrt(np.dot(w,np.dot(R_cov,w.T))) 
-    return np.array([Rp_opt,Vp_opt])
-
-def Vmin_f(w):   # 获得最小波动率
-    return f(w)[1]
-
-cons = ({'type':'eq','fun':lambda x:np.sum(x)-1})   # 假设预期收益率为0.1
-bnds = tuple((0,1) for x in range(len(R_mean)))
-
-result = sco.minimize(Vmin_f,len(R_mean)*[1.0/len(R_mean),],method='SLSQP',bounds=bnds,constraints=cons)
-print("投资组合预期收益率 10% 时上海机场的权重",round(result['x'][0],4))
-print("投资组合预期收益率 10% 时宝钢股份的权重",round(result['x'][1],4))
-print("投资组合预期收益率 10% 时海通证券的权重",round(result['x'][2],4))
-print("投资组合预期收益率 10% 时工商银行的权重",round(result['x'][3],4))
-print("投资组合预期收益率 10% 时中国石油的权重",round(result['x'][4],4))
-Rp_vmin = np.sum(R_mean*result['x'])
-Vp_vmin = result['fun']
+# 构建有效前沿（临界线算法一次求出整条只做多前沿，见 python-api/frontier.py）
+from frontier import efficient_frontier
+
+Rf = 0.02
+frontier = efficient_frontier(R_mean.values, R_cov.values, risk_free_rate=Rf, n_points=100)
+for name, weight in zip(stock_names, frontier['minVariance']['weights']):
+    print(f"全局最小波动率组合中{name}的权重", round(weight,4))
+Rp_vmin = frontier['minVariance']['return']
+Vp_vmin = frontier['minVariance']['volatility']
 print('波动率在可行集是全局最小值的投资组合预期收益率',round(Rp_vmin,4))
 print('在可行集是全局最小值的波动率',round(Vp_vmin,4))
 
-Rp_target = np.linspace(-0.1,0.25,100)   
-Vp_target = []
-for r in Rp_target:
-    cons_new = ({'type':'eq','fun':lambda x:np.sum(x)-1},{'type':'eq','fun':lambda x:f(x)[0]-r})
-    result_new = sco.minimize(Vmin_f,len(R_mean)*[1.0/len(R_mean),],method='SLSQP',bounds=bnds,constraints=cons_new)
-    Vp_target.append(result_new['fun'])
+Rp_target = frontier['frontier']['returns']
+Vp_target = frontier['frontier']['volatilities']
 plt.figure(figsize=(8,6))
 plt.scatter(Vp_list,Rp_list)
 plt.plot(Vp_target,Rp_target,'r-',label=u'有效前沿',lw=2.5)
@@ -187,25 +160,10 @@ plt.title(u'投资组合有效前沿',fontsize=13)
 plt.legend(fontsize=13)
 plt.show()
 
-# 求解资本市场线
-def F(w):
-    Rf = 0.02
-    w = np.array(w)
-    Rp_opt = np.sum(w*R_mean)
-    Vp_opt = np.sqrt(np.dot(w,np.dot(R_cov,w.T)))
-    SR = (Rp_opt-Rf) / Vp_opt    # 计算夏普比率
-    return np.array([Rp_opt,Vp_opt,SR])
-
-def SRmin_F(w):
-    return -F(w)[2]
-
-cons_SR = ({'type':'eq','fun':lambda x:np.sum(x)-1})
-result_SR = sco.minimize(SRmin_F,len(R_mean)*[1.0/len(R_mean),],method='SLSQP',bounds=bnds,constraints=cons_SR)
-
-Rf = 0.02
-slope = -result_SR['fun']   # 资本市场线斜率
-Rm = np.sum(R_mean*result_SR['x'])   #计算预期收益率
-Vm = (Rm-Rf) / slope
+# 求解资本市场线（切点组合即市场组合）
+slope = frontier['tangency']['sharpeRatio']   # 资本市场线斜率
+Rm = frontier['tangency']['return']   #计算预期收益率
+Vm = frontier['tangency']['volatility']
 print('市场组合的预期收益率',round(Rm,4))
 print('市场组合的波动率',round(Vm,4))
 